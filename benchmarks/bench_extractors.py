@@ -0,0 +1,200 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+from tests.fixtures import load_corpus
+from utils.html_utils import NOVEL_PAGE_STRAINER
+from utils.json_utils import read_json, write_json
+from utils.novel_utils import (get_novel_genres, get_novel_image_url,
+                               get_novel_status, get_novel_synopsis,
+                               get_novel_title, get_number_of_volumes,
+                               get_volume_urls)
+
+RESULTS_FILE = os.path.join("benchmarks", "results", "extractors.json")
+BACKENDS = ("lxml", "html.parser", "html5lib")
+EXTRACTORS: Dict[str, Callable] = {
+    "get_novel_title": get_novel_title,
+    "get_novel_image_url": get_novel_image_url,
+    "get_novel_status": get_novel_status,
+    "get_novel_synopsis": get_novel_synopsis,
+    "get_novel_genres": get_novel_genres,
+    "get_number_of_volumes": get_number_of_volumes,
+    "get_volume_urls": get_volume_urls,
+}
+
+Results = Dict[str, Dict[str, float]]
+
+
+def best_time(func: Callable[[], object], repeat: int, number: int) -> float:
+    """
+    Returns the best average time of a function over several rounds.
+
+    Args:
+        func (Callable[[], object]): The function to time.
+        repeat (int): The number of rounds.
+        number (int): The number of calls in every round.
+
+    Returns:
+        float: The fastest round, divided by the number of calls, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def extract_all(url: str, content: bytes, backend: str) -> None:
+    """Parses a page and runs every extractor on it."""
+    soup = BeautifulSoup(content, backend)
+    for extractor in EXTRACTORS.values():
+        extractor(url, soup)
+
+
+def run_benchmarks(corpus: Dict[str, bytes], repeat: int,
+                   number: int) -> Results:
+    """
+    Times parsing, every extractor and full-page extraction per backend.
+
+    Args:
+        corpus (Dict[str, bytes]): The page contents keyed by file name.
+        repeat (int): The number of rounds for every measurement.
+        number (int): The number of calls in every round.
+
+    Returns:
+        Results: The time per page in seconds, keyed by backend and by
+        measurement name.
+    """
+    results: Results = {}
+    for backend in BACKENDS:
+        if builder_registry.lookup(backend) is None:
+            print(f"Skipping backend {backend}: not installed")
+            continue
+
+        soups = {name: BeautifulSoup(content, backend)
+                 for name, content in corpus.items()}
+        timings = {
+            "parse": best_time(
+                lambda: [BeautifulSoup(content, backend)
+                         for content in corpus.values()],
+                repeat, number),
+            "full_page": best_time(
+                lambda: [extract_all(name, content, backend)
+                         for name, content in corpus.items()],
+                repeat, number),
+        }
+        if backend != "html5lib":
+            # html5lib does not support parse_only
+            timings["parse_lean"] = best_time(
+                lambda: [BeautifulSoup(content, backend,
+                                       parse_only=NOVEL_PAGE_STRAINER)
+                         for content in corpus.values()],
+                repeat, number)
+        for extractor_name, extractor in EXTRACTORS.items():
+            timings[extractor_name] = best_time(
+                lambda: [extractor(name, soup)
+                         for name, soup in soups.items()],
+                repeat, number)
+
+        results[backend] = {name: value / len(corpus)
+                            for name, value in timings.items()}
+    return results
+
+
+def compare(results: Results, baseline: Results,
+            threshold: float) -> List[str]:
+    """
+    Finds the measurements that got slower than the baseline allows.
+
+    Args:
+        results (Results): The new measurements.
+        baseline (Results): The recorded baseline.
+        threshold (float): The allowed slowdown, e.g. 0.25 for 25%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions = []
+    for backend, timings in results.items():
+        for name, value in timings.items():
+            reference = baseline.get(backend, {}).get(name)
+            if reference and value > reference * (1 + threshold):
+                regressions.append(
+                    f"{backend}/{name}: {value * 1e6:.1f}us per page, "
+                    f"baseline {reference * 1e6:.1f}us "
+                    f"({(value / reference - 1) * 100:+.0f}%)")
+    return regressions
+
+
+def print_results(results: Results, baseline: Results) -> None:
+    """Prints the measurements next to the baseline."""
+    for backend, timings in results.items():
+        print(f"\n{backend}")
+        for name, value in timings.items():
+            line = f"  {name:<24} {value * 1e6:>10.1f}us per page"
+            reference = baseline.get(backend, {}).get(name)
+            if reference:
+                line += f"  ({(value / reference - 1) * 100:+.0f}%)"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the novel extractors on the saved corpus.")
+    parser.add_argument("--results-file", default=RESULTS_FILE,
+                        help="JSON file holding the baseline timings.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown before failing, e.g. 0.25.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of rounds for every measurement.")
+    parser.add_argument("--number", type=int, default=20,
+                        help="Number of calls in every round.")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Record the measurements as the new baseline.")
+    args = parser.parse_args()
+
+    # The extractors warn about the pages with missing sections
+    logging.disable(logging.WARNING)
+
+    corpus = load_corpus()
+    if not corpus:
+        sys.exit("The corpus is empty, run `python -m tests.fixtures` first")
+    print(f"Benchmarking {len(corpus)} pages...")
+
+    # Timings only compare on the same machine, so baselines are not
+    # committed; a missing one must not let the gate pass
+    baseline: Results = {}
+    if os.path.exists(args.results_file):
+        baseline = read_json(args.results_file)
+    elif not args.save_baseline:
+        sys.exit(f"No baseline in {args.results_file}, record one on this "
+                 "machine with `make bench_baseline` first")
+
+    results = run_benchmarks(corpus, args.repeat, args.number)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        write_json(results, args.results_file, pretty=True)
+        print(f"\nSaved baseline to {args.results_file}")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nSlower than the baseline by more than "
+              f"{args.threshold * 100:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
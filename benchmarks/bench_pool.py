@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from utils.async_utils import run
+from utils.http_utils import POOL, POOL_PROFILES, TIMEOUTS
+from utils.json_utils import write_json
+
+RESULTS_FILE = os.path.join("benchmarks", "results", "pool.json")
+
+Results = Dict[str, Dict[str, float]]
+
+
+def serve(sock: socket.socket, size: int, latency: float) -> None:
+    """
+    Serves pages of size bytes after latency seconds on a bound socket.
+
+    Runs in its own process, so the server does not take CPU time from
+    the measured client.
+    """
+    body = b"x" * size
+
+    async def page(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        return web.Response(body=body, content_type="text/html")
+
+    async def main() -> None:
+        app = web.Application()
+        app.router.add_get("/{name}", page)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.SockSite(runner, sock, backlog=1024).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+async def fetch_all(url: str, requests: int,
+                    concurrency: int) -> Dict[str, float]:
+    """
+    Fetches a URL with the POOL settings and measures the throughput.
+
+    Args:
+        url (str): The URL, a counter is appended to it.
+        requests (int): The number of requests.
+        concurrency (int): The number of requests sent at the same time.
+
+    Returns:
+        Dict[str, float]: The requests and MiB per second, the opened
+        connections and the failed requests.
+    """
+    counts = {"connections": 0, "errors": 0, "bytes": 0}
+
+    async def on_connection(session, context, params) -> None:
+        counts["connections"] += 1
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_end.append(on_connection)
+    pending = iter(range(requests))
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        for n in pending:
+            try:
+                async with session.get(f"{url}{n}") as response:
+                    counts["bytes"] += len(await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                counts["errors"] += 1
+
+    async with aiohttp.ClientSession(
+            timeout=TIMEOUTS.for_aiohttp(), connector=POOL.connector(),
+            trace_configs=[trace]) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests_per_second": requests / elapsed,
+        "mib_per_second": counts["bytes"] / elapsed / 2 ** 20,
+        "connections": counts["connections"],
+        "errors": counts["errors"],
+    }
+
+
+def run_benchmarks(url: str, profiles: List[str], loops: List[str],
+                   requests: int, concurrency: int, repeat: int) -> Results:
+    """
+    Measures every profile on every event loop.
+
+    Args:
+        url (str): The URL to fetch, a counter is appended to it.
+        profiles (List[str]): The names of the POOL_PROFILES to measure.
+        loops (List[str]): "asyncio" and/or "uvloop".
+        requests (int): The number of requests of every round.
+        concurrency (int): The number of requests sent at the same time.
+        repeat (int): The number of rounds, the fastest one is kept.
+
+    Returns:
+        Results: The measurements of the fastest round, keyed by
+        "<profile>/<loop>".
+    """
+    results: Results = {}
+    for profile in profiles:
+        POOL.configure(profile)
+        for loop in loops:
+            rounds = [run(fetch_all(url, requests, concurrency),
+                          loop == "uvloop")
+                      for _ in range(repeat)]
+            results[f"{profile}/{loop}"] = max(
+                rounds, key=lambda result: result["requests_per_second"])
+    return results
+
+
+def print_results(results: Results) -> None:
+    """Prints the measurements, fastest first."""
+    print(f"\n{'profile/loop':<26} {'req/s':>9} {'MiB/s':>8} "
+          f"{'conns':>6} {'errors':>6}")
+    ranked = sorted(results.items(),
+                    key=lambda item: -item[1]["requests_per_second"])
+    for name, result in ranked:
+        print(f"{name:<26} {result['requests_per_second']:>9.0f} "
+              f"{result['mib_per_second']:>8.1f} "
+              f"{result['connections']:>6.0f} {result['errors']:>6.0f}")
+    print(f"\nHighest throughput: {ranked[0][0]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the connection pool profiles of the async "
+                    "engine.")
+    parser.add_argument(
+        "--url",
+        help="Fetch this URL with a counter appended instead of a local "
+             "test server. Mind the load on the server.")
+    parser.add_argument("--profiles", default=",".join(POOL_PROFILES),
+                        help="Comma-separated profiles to measure.")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="Number of requests of every round.")
+    parser.add_argument("--concurrency", type=int, default=50,
+                        help="Number of requests sent at the same time.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of rounds for every measurement.")
+    parser.add_argument("--size-kb", type=int, default=32,
+                        help="Page size of the local test server in KiB.")
+    parser.add_argument("--latency-ms", type=float, default=20.0,
+                        help="Response delay of the local test server.")
+    parser.add_argument("--results-file", default=RESULTS_FILE,
+                        help="JSON file the measurements are written to.")
+    args = parser.parse_args()
+
+    profiles = args.profiles.split(",")
+    unknown = [name for name in profiles if name not in POOL_PROFILES]
+    if unknown:
+        sys.exit(f"Unknown profiles: {', '.join(unknown)}")
+    loops = ["asyncio"]
+    try:
+        import uvloop  # noqa: F401
+
+        loops.append("uvloop")
+    except ImportError:
+        print("Skipping uvloop: not installed")
+
+    server: Optional[multiprocessing.Process] = None
+    url = args.url
+    if url is None:
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        # Requests are queued until the server starts accepting them
+        sock.listen(1024)
+        server = multiprocessing.Process(
+            target=serve, args=(sock, args.size_kb * 1024,
+                                args.latency_ms / 1000), daemon=True)
+        server.start()
+        url = f"http://127.0.0.1:{sock.getsockname()[1]}/page-"
+        sock.close()
+
+    # Failed requests are counted, not logged
+    logging.disable(logging.WARNING)
+    print(f"Benchmarking {len(profiles)} profiles with {args.requests} "
+          f"requests, {args.concurrency} at a time...")
+    try:
+        results = run_benchmarks(url, profiles, loops, args.requests,
+                                 args.concurrency, args.repeat)
+    finally:
+        if server is not None:
+            server.terminate()
+
+    print_results(results)
+    write_json(results, args.results_file, pretty=True)
+    print(f"Saved the measurements to {args.results_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,583 @@
+import argparse
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from modules.sharding import parse_shard
+from utils.json_utils import dumps, read_json, write_json_array
+
+# Heavy dependencies (requests, aiohttp, bs4, lxml) are imported inside the
+# commands that need them, so quick commands such as query start instantly.
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "website_base_url": "https://animestuff.me/",
+    "novel_base_url": "https://animestuff.me/docs/assets/html/",
+    "media_dir": os.path.join("static", "media"),
+    "data_dir": "data",
+    "data_file": os.path.join("data", "novels_data.json"),
+    "novels_file": os.path.join("data", "all_novels_dict.json"),
+    "html_archive_file": "html_files.archive",
+    "seen_file": os.path.join("data", "seen_urls.txt"),
+    "ids_file": os.path.join("data", "novel_ids.json"),
+    "parse_cache_file": os.path.join("data", "parse_cache.jsonl"),
+    "site_dir": "site",
+    "volumes_dir": "volumes",
+    "metrics_file": os.path.join("logs", "metrics.prom"),
+}
+
+
+def load_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Builds the configuration from the defaults, a file and the flags.
+
+    Flags override the values of the configuration file, which override
+    DEFAULT_CONFIG.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        Dict[str, Any]: The configuration.
+
+    Raises:
+        SystemExit: If the configuration file cannot be read or contains
+        unknown keys.
+    """
+    config = dict(DEFAULT_CONFIG)
+
+    if args.config:
+        try:
+            file_config = read_json(args.config)
+        except (IOError, ValueError) as e:
+            sys.exit(f"Error reading config file {args.config}: {e}")
+        unknown = set(file_config) - set(DEFAULT_CONFIG)
+        if unknown:
+            sys.exit(f"Unknown config keys in {args.config}: "
+                     f"{', '.join(sorted(unknown))}")
+        config.update(file_config)
+
+    for key in DEFAULT_CONFIG:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    return config
+
+
+def run_with_instrumentation(args: argparse.Namespace,
+                             config: Dict[str, Any], task) -> None:
+    """
+    Runs a long task with logging, metrics and the optional profiler.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        config (Dict[str, Any]): The configuration.
+        task (Callable[[], None]): The work to run.
+    """
+    from modules.logging_config import log_warning_summary, setup_logging
+    from modules.profiling import PROFILER
+    from utils.metrics import REGISTRY
+    from utils.parse_cache import PARSE_CACHE
+
+    setup_logging()
+    if getattr(args, "profile", False):
+        PROFILER.enable()
+    if not args.no_parse_cache:
+        from utils.novel_utils import EXTRACTOR_VERSION
+
+        PARSE_CACHE.open(config["parse_cache_file"], EXTRACTOR_VERSION)
+    from utils.http_utils import HEDGE_POLICY, TIMEOUTS
+
+    TIMEOUTS.connect = args.connect_timeout
+    TIMEOUTS.read = args.read_timeout
+    TIMEOUTS.total = args.total_timeout
+    try:
+        HEDGE_POLICY.configure(args.hedge, args.hedge_budget)
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.lean_parse or args.max_parse_trees:
+        from utils.html_utils import PARSE_MODE
+
+        try:
+            PARSE_MODE.configure(args.lean_parse, args.max_parse_trees)
+        except ValueError as e:
+            sys.exit(str(e))
+
+    server = None
+    if getattr(args, "metrics_port", None):
+        server = REGISTRY.serve(args.metrics_port)
+
+    try:
+        with PROFILER.stage("run"):
+            task()
+        PROFILER.snapshot("sink")
+    finally:
+        PARSE_CACHE.close()
+        log_warning_summary()
+        REGISTRY.write(config["metrics_file"])
+        PROFILER.save()
+        if server:
+            server.shutdown()
+
+
+def save_duplicates(config: Dict[str, Any]) -> None:
+    """Saves the near-duplicate groups of the data file next to it."""
+    from modules.near_duplicates import duplicates_file, write_duplicates
+
+    if os.path.exists(config["data_file"]):
+        write_duplicates(read_json(config["data_file"]),
+                         duplicates_file(config["data_file"]))
+
+
+def command_crawl(args: argparse.Namespace, config: Dict[str, Any]) -> None:
+    """Crawls the website with the sync or the async engine."""
+    from modules.pipeline import parse_workers
+
+    try:
+        workers = parse_workers(args.workers)
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.write_workers < 1:
+        sys.exit("--write-workers must be positive")
+    if args.loop_monitor:
+        if args.engine != "async":
+            sys.exit("--loop-monitor is only supported by the async engine")
+        from modules.loop_monitor import LOOP_MONITOR
+
+        try:
+            LOOP_MONITOR.configure(True, args.slow_callback_ms / 1000)
+        except ValueError:
+            sys.exit("--slow-callback-ms must be positive")
+
+    os.makedirs(config["media_dir"], exist_ok=True)
+    os.makedirs(config["data_dir"], exist_ok=True)
+
+    if args.deadline is not None and args.deadline <= 0:
+        sys.exit("--deadline must be positive")
+
+    if args.engine == "sync":
+        if args.shard:
+            sys.exit("--shard is only supported by the async engine")
+        if args.deadline is not None:
+            sys.exit("--deadline is only supported by the async engine")
+        if args.pool_profile != "default" or args.uvloop:
+            sys.exit("--pool-profile and --uvloop are only supported by the "
+                     "async engine")
+
+        def task() -> None:
+            from modules.frontier import Frontier
+            from modules.novel_ids import NovelIds
+            from modules.novel_parser import crawl_novels
+
+            frontier = Frontier(config["seen_file"], args.bloom_capacity,
+                                args.resume)
+            ids = NovelIds(config["ids_file"], config["data_file"])
+            crawl_novels(config["website_base_url"], config["novel_base_url"],
+                         config["html_archive_file"], config["media_dir"],
+                         config["novels_file"], config["data_file"], workers,
+                         frontier, ids)
+            save_duplicates(config)
+    else:
+        if args.resume:
+            sys.exit("--resume is only supported by the sync engine")
+        from utils.http_utils import POOL
+
+        try:
+            POOL.configure(args.pool_profile)
+        except ValueError as e:
+            sys.exit(str(e))
+
+        def task() -> None:
+            from modules.async_novel_parser import gather_novels_data
+            from modules.loop_monitor import LOOP_MONITOR
+            from modules.novel_ids import NovelIds
+            from modules.sharding import shard_file
+            from utils.async_utils import run
+            from utils.file_writer import AsyncFileWriter
+
+            output_file = config["data_file"]
+            if args.shard:
+                output_file = shard_file(output_file, args.shard)
+            writer = AsyncFileWriter(args.write_workers,
+                                     batch_bytes=args.write_batch_kb * 1024,
+                                     fsync=args.fsync)
+            ids = NovelIds(config["ids_file"], config["data_file"])
+
+            async def crawl() -> None:
+                async with LOOP_MONITOR.watch():
+                    await gather_novels_data(
+                        config["website_base_url"], config["novel_base_url"],
+                        config["media_dir"], output_file, workers,
+                        args.shard, writer, ids, args.deadline)
+
+            try:
+                run(crawl(), args.uvloop)
+            finally:
+                LOOP_MONITOR.save()
+            if not args.shard:
+                save_duplicates(config)
+
+    run_with_instrumentation(args, config, task)
+
+
+def command_merge(args: argparse.Namespace, config: Dict[str, Any]) -> None:
+    """Merges the partial outputs of a sharded crawl."""
+    from modules.logging_config import setup_logging
+    from modules.novel_ids import NovelIds
+    from modules.sharding import merge_shards
+
+    setup_logging()
+    ids = NovelIds(config["ids_file"], config["data_file"])
+    merged = merge_shards(config["data_file"], args.shards)
+    # The shards do not save the IDs they assigned
+    ids.adopt(merged)
+    ids.save()
+    save_duplicates(config)
+
+
+def command_reparse(args: argparse.Namespace,
+                    config: Dict[str, Any]) -> None:
+    """Extracts the novel data again from the HTML archive."""
+    os.makedirs(config["media_dir"], exist_ok=True)
+
+    def task() -> None:
+        from modules.novel_ids import NovelIds
+        from modules.novel_parser import (get_data_from_html_files,
+                                          import_html_files)
+
+        if args.import_dir:
+            import_html_files(args.import_dir, config["html_archive_file"])
+        get_data_from_html_files(
+            config["novel_base_url"], config["html_archive_file"],
+            config["media_dir"], config["novels_file"], config["data_file"],
+            NovelIds(config["ids_file"], config["data_file"]))
+        save_duplicates(config)
+
+    run_with_instrumentation(args, config, task)
+
+
+def command_export(args: argparse.Namespace, config: Dict[str, Any]) -> None:
+    """Writes the crawl output to another file or format."""
+    records = read_json(config["data_file"])
+
+    if args.format == "columnar":
+        from modules.columnar import write_columnar
+
+        write_columnar(records, args.output)
+    else:
+        write_json_array(records, args.output, pretty=args.pretty)
+    print(f"Exported {len(records)} records to {args.output}")
+
+
+def command_dedupe(args: argparse.Namespace,
+                   config: Dict[str, Any]) -> None:
+    """Finds the novels listed more than once under different URLs."""
+    from modules.near_duplicates import duplicates_file, write_duplicates
+
+    output_file = duplicates_file(config["data_file"])
+    try:
+        groups = write_duplicates(read_json(config["data_file"]),
+                                  output_file, args.threshold, args.bands,
+                                  args.rows)
+    except ValueError as e:
+        sys.exit(str(e))
+    for group in groups:
+        print(f"{group.similarity:.2f} {group.ids}: "
+              f"{' | '.join(group.titles)}")
+    print(f"Saved {len(groups)} duplicate groups to {output_file}")
+
+
+def command_site(args: argparse.Namespace, config: Dict[str, Any]) -> None:
+    """Renders the crawl output to static HTML pages."""
+    from modules.site_generator import build_site
+
+    if args.per_page < 1:
+        sys.exit("--per-page must be positive")
+
+    build = build_site(read_json(config["data_file"]), config["site_dir"],
+                       args.per_page)
+    print(f"Built {config['site_dir']}: {build.written} pages written, "
+          f"{build.unchanged} unchanged, {build.removed} removed")
+
+
+def command_volumes(args: argparse.Namespace,
+                    config: Dict[str, Any]) -> None:
+    """Downloads the volume files of the novels of the crawl output."""
+    import asyncio
+
+    from modules.logging_config import setup_logging
+    from modules.volume_downloader import download_volumes
+
+    if args.workers < 1 or args.per_host < 1:
+        sys.exit("--workers and --per-host must be positive")
+
+    setup_logging()
+    results = asyncio.run(download_volumes(
+        read_json(config["data_file"]), config["volumes_dir"], args.workers,
+        args.per_host, args.retries, args.id))
+    failed = [result for result in results if result.status == "failed"]
+    if failed:
+        sys.exit(f"{len(failed)} of {len(results)} volumes failed, run the "
+                 "command again to resume them")
+
+
+def command_serve(args: argparse.Namespace, config: Dict[str, Any]) -> None:
+    """Serves the front end, or the query API with --api, over HTTP."""
+    if args.api:
+        from aiohttp import web
+
+        from modules.logging_config import setup_logging
+        from modules.query_service import QueryService
+
+        setup_logging()
+        service = QueryService(config["data_file"], args.cache_size,
+                               args.reload_interval)
+        web.run_app(service.create_app(), host=args.host, port=args.port)
+        return
+
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    handler = partial(SimpleHTTPRequestHandler, directory=args.directory)
+    with ThreadingHTTPServer((args.host, args.port), handler) as server:
+        print(f"Serving {args.directory} on http://{args.host}:{args.port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def matches(record: Dict[str, Any], args: argparse.Namespace) -> bool:
+    """Returns whether a record passes the filters of the query command."""
+    if args.id is not None and record["id"] != args.id:
+        return False
+    if args.title and args.title.lower() not in record["title"].lower():
+        return False
+    if args.status and args.status.lower() != record["status"].lower():
+        return False
+    if args.genre:
+        genres = [genre.strip().lower()
+                  for genre in record["genres"].split(",")]
+        if args.genre.lower() not in genres:
+            return False
+    return True
+
+
+def command_query(args: argparse.Namespace, config: Dict[str, Any]) -> None:
+    """Prints the records of the crawl output that match the filters."""
+    records = read_json(config["data_file"])
+
+    found = [record for record in records if matches(record, args)]
+    for record in found[:args.limit]:
+        print(dumps(record).decode("utf-8"))
+    if len(found) > args.limit:
+        print(f"... {len(found) - args.limit} more", file=sys.stderr)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the parser of the command line interface."""
+    # Configuration flags are accepted after every subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--config",
+        help="JSON file with configuration values, overridden by flags.")
+    for key, value in DEFAULT_CONFIG.items():
+        common.add_argument(f"--{key.replace('_', '-')}", dest=key,
+                            help=f"Default: {value}")
+
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Novel website parser.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl = subparsers.add_parser(
+        "crawl", parents=[common], help="Crawl the website.")
+    crawl.add_argument("--engine", choices=("sync", "async"),
+                       default="async", help="The crawl engine.")
+    crawl.add_argument(
+        "--workers",
+        help="Workers per pipeline stage, e.g. fetch=40,media=20.")
+    crawl.add_argument(
+        "--shard", type=parse_shard,
+        help="Only process shard i of N (0 <= i < N), e.g. 0/4, and save "
+             "the partial output next to the data file.")
+    crawl.add_argument(
+        "--resume", action="store_true",
+        help="Read the pages stored by earlier runs from the archive "
+             "instead of fetching them again (sync engine).")
+    crawl.add_argument(
+        "--bloom-capacity", type=int,
+        help="Keep the seen-set of stored URLs in a Bloom filter sized for "
+             "this many URLs instead of an exact list.")
+    crawl.add_argument(
+        "--write-workers", type=int, default=4,
+        help="Threads that write files for the async engine.")
+    crawl.add_argument(
+        "--write-batch-kb", type=int, default=0,
+        help="Collect files smaller than this many KiB and write them "
+             "together (async engine).")
+    crawl.add_argument(
+        "--fsync", action="store_true",
+        help="Sync the written files to disk at checkpoints: after the "
+             "images and after the data file (async engine).")
+    crawl.add_argument(
+        "--deadline", type=float,
+        help="Stop after this many seconds, crawling new novels first, "
+             "then incomplete and then the least recently crawled ones, "
+             "and merge them into the previous output (async engine).")
+    crawl.add_argument(
+        "--loop-monitor", action="store_true",
+        help="Measure the event loop lag and report the callbacks that "
+             "block the loop to logs/ (async engine).")
+    crawl.add_argument(
+        "--slow-callback-ms", type=int, default=100,
+        help="Report callbacks that block the event loop longer than this "
+             "with --loop-monitor.")
+    crawl.add_argument(
+        "--pool-profile", default="default",
+        help="The connection pool settings: default, polite, throughput or "
+             "no-keepalive (async engine).")
+    crawl.add_argument(
+        "--uvloop", action="store_true",
+        help="Run the crawl on uvloop if it is installed (async engine).")
+    crawl.set_defaults(func=command_crawl)
+
+    merge = subparsers.add_parser(
+        "merge", parents=[common],
+        help="Merge the partial outputs of a sharded crawl.")
+    merge.add_argument("shards", type=int, help="The number of shards.")
+    merge.set_defaults(func=command_merge)
+
+    reparse = subparsers.add_parser(
+        "reparse", parents=[common],
+        help="Extract the data again from the HTML archive.")
+    reparse.add_argument(
+        "--import-dir",
+        help="Add the HTML files of this directory to the archive first.")
+    reparse.set_defaults(func=command_reparse)
+
+    for sub in (crawl, reparse):
+        sub.add_argument(
+            "--metrics-port", type=int,
+            help="Serve live metrics on this local port during the run.")
+        sub.add_argument(
+            "--profile", action="store_true",
+            help="Record per-stage cProfile stats and memory snapshots "
+                 "under logs/.")
+        sub.add_argument(
+            "--connect-timeout", type=float, default=10.0,
+            help="Seconds allowed to open a connection.")
+        sub.add_argument(
+            "--read-timeout", type=float, default=30.0,
+            help="Seconds allowed between two reads of a response.")
+        sub.add_argument(
+            "--total-timeout", type=float, default=60.0,
+            help="Seconds allowed for a whole request.")
+        sub.add_argument(
+            "--hedge", action="store_true",
+            help="Send a duplicate of requests slower than the observed "
+                 "p95 and use the first response.")
+        sub.add_argument(
+            "--hedge-budget", type=float, default=0.05,
+            help="The maximum ratio of duplicate to all requests.")
+        sub.add_argument(
+            "--no-parse-cache", action="store_true",
+            help="Parse every page instead of reusing the fields extracted "
+                 "from identical pages by earlier runs.")
+        sub.add_argument(
+            "--lean-parse", action="store_true",
+            help="Only build the page elements the extractors read.")
+        sub.add_argument(
+            "--max-parse-trees", type=int,
+            help="The maximum number of pages parsed at the same time.")
+
+    export = subparsers.add_parser(
+        "export", parents=[common],
+        help="Write the crawl output to another file.")
+    export.add_argument("--output", required=True, help="The output file.")
+    export.add_argument(
+        "--format", choices=("json", "columnar"), default="json",
+        help="json, or a memory-mappable columnar snapshot "
+             "(see modules/columnar.py). The columnar snapshot stores the "
+             "genres as a list, so they are read back separated by "
+             "\", \" whatever the spacing around the commas was.")
+    export.add_argument("--pretty", action="store_true",
+                        help="Indent the JSON output.")
+    export.set_defaults(func=command_export)
+
+    dedupe = subparsers.add_parser(
+        "dedupe", parents=[common],
+        help="Find novels listed more than once and save the groups next "
+             "to the data file (also done after every crawl).")
+    dedupe.add_argument(
+        "--threshold", type=float, default=0.5,
+        help="The minimum Jaccard similarity of the title and synopsis "
+             "shingles of duplicates.")
+    dedupe.add_argument("--bands", type=int, default=32,
+                        help="The number of LSH bands.")
+    dedupe.add_argument("--rows", type=int, default=4,
+                        help="The number of MinHash values per band.")
+    dedupe.set_defaults(func=command_dedupe)
+
+    site = subparsers.add_parser(
+        "site", parents=[common],
+        help="Render the crawl output to static HTML pages in site_dir.")
+    site.add_argument("--per-page", type=int, default=50,
+                      help="The number of novels per list page.")
+    site.set_defaults(func=command_site)
+
+    volumes = subparsers.add_parser(
+        "volumes", parents=[common],
+        help="Download the volume files to volumes_dir, resuming partial "
+             "downloads.")
+    volumes.add_argument("--id", type=int, action="append",
+                         help="Only download the volumes of this novel; "
+                              "repeatable.")
+    volumes.add_argument("--workers", type=int, default=8,
+                         help="The maximum number of downloads at once.")
+    volumes.add_argument("--per-host", type=int, default=2,
+                         help="The maximum number of downloads from one "
+                              "host.")
+    volumes.add_argument("--retries", type=int, default=3,
+                         help="How often an interrupted download is "
+                              "continued.")
+    volumes.set_defaults(func=command_volumes)
+
+    serve = subparsers.add_parser(
+        "serve", parents=[common],
+        help="Serve the front end or the query API over HTTP.")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--directory", default=".",
+                       help="The directory to serve.")
+    serve.add_argument(
+        "--api", action="store_true",
+        help="Serve the JSON query API over the data file instead.")
+    serve.add_argument(
+        "--cache-size", type=int, default=256,
+        help="The number of rendered API responses kept in memory.")
+    serve.add_argument(
+        "--reload-interval", type=float, default=2.0,
+        help="Seconds between checks of the data file for a new crawl.")
+    serve.set_defaults(func=command_serve)
+
+    query = subparsers.add_parser(
+        "query", parents=[common],
+        help="Print the novels matching the filters.")
+    query.add_argument("--id", type=int, help="The novel ID.")
+    query.add_argument("--title", help="A part of the title.")
+    query.add_argument("--status", help="The status, e.g. Completed.")
+    query.add_argument("--genre", help="One of the genres.")
+    query.add_argument("--limit", type=int, default=20,
+                       help="The maximum number of novels printed.")
+    query.set_defaults(func=command_query)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    config = load_config(args)
+    args.func(args, config)
+
+
+if __name__ == "__main__":
+    main()
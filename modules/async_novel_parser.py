@@ -1,157 +1,313 @@
 import asyncio
-import json
 import logging
+import os
 import random
-from typing import Any, Dict, List
+import time
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import aiohttp
 from aiohttp import ClientSession
-from bs4 import BeautifulSoup
 
+from modules.deadline import (DRAIN_SHARE, PriorityScheduler,
+                              crawl_times_file, load_crawl_times,
+                              merge_with_previous, save_crawl_times)
+from modules.frontier import Frontier
+from modules.novel_ids import NovelIds
+from modules.pipeline import Pipeline, Stage
+from modules.profiling import PROFILER
+from modules.sharding import Shard, in_shard
 from utils.async_utils import download_novel_image, fetch_html, url_exists
-from utils.novel_utils import (get_novel_genres, get_novel_image_url,
-                               get_novel_status, get_novel_synopsis,
-                               get_novel_title, get_number_of_volumes)
-from utils.url_utils import extract_filename_from_url, sanitize_filename
+from utils.html_utils import parse_html
+from utils.file_writer import AsyncFileWriter
+from utils.http_utils import POOL, TIMEOUTS
+from utils.json_utils import read_json
+from utils.metrics import RETRIES, host_of, track_stage
+from utils.novel_utils import build_novel_record, extract_novel_data
+from utils.url_utils import (canonicalize_url, extract_filename_from_url,
+                             sanitize_filename)
+
+# Default number of workers for every stage of the crawl pipeline
+DEFAULT_WORKERS = {"fetch": 20, "parse": 2, "media": 10, "sink": 1}
 
 data_dict: List[Dict[str, Any]] = []
 
 
 async def gather_novels_data(website_base_url: str, novel_base_url: str,
-                             media_dir: str, data_file: str) -> None:
+                             media_dir: str, data_file: str,
+                             workers: Optional[Dict[str, int]] = None,
+                             shard: Optional[Shard] = None,
+                             writer: Optional[AsyncFileWriter] = None,
+                             ids: Optional[NovelIds] = None,
+                             deadline: Optional[float] = None) -> None:
     """
     Gathers data for all novels from the given website and
     saves it to a JSON file.
 
+    Discovery, page fetch, parse, media and sink run as a pipeline joined
+    by bounded queues. Parsing runs in worker threads and files are
+    written by the writer's thread pool, so the event loop only waits on
+    network I/O. The records are saved in the order of their IDs, not in
+    the order the novels finished, and the time every record was crawled
+    is saved next to the data file. The connections are pooled with the
+    settings of POOL.
+
+    With a deadline, the novels are crawled by priority (see
+    PriorityScheduler) and no novel is started in the last DRAIN_SHARE of
+    the time. Novels still in flight at the deadline are dropped, and the
+    crawled records are merged into the previous data file.
+
     Args:
         website_base_url (str): The base URL of the website.
         novel_base_url (str): The base URL for novels.
         media_dir (str): The directory to save downloaded novel images.
         data_file (str): The file where the extracted data will be saved.
-
+        workers (Optional[Dict[str, int]]): The number of workers of each
+        stage, overriding DEFAULT_WORKERS.
+        shard (Optional[Shard]): Only process the novels of this shard.
+        writer (Optional[AsyncFileWriter]): The writer of the images and
+        the data file, a new one with the default settings by default.
+        ids (Optional[NovelIds]): The IDs of the novels, a new table by
+        default. New IDs are saved unless only a shard is processed; the
+        merge step saves them then.
+        deadline (Optional[float]): The seconds the crawl may take.
     """
     logging.info("[INFO] - Getting novels...")
 
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    workers = {**DEFAULT_WORKERS, **(workers or {})}
+    if ids is None:
+        ids = NovelIds()
+    times_file = crawl_times_file(data_file)
+    crawl_times = await asyncio.to_thread(load_crawl_times, times_file)
+    previous: List[Dict[str, Any]] = []
+    if deadline is not None and os.path.exists(data_file):
+        previous = await asyncio.to_thread(read_json, data_file)
     headers = {
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
         "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
     }
-    tasks = []
+    writer = writer or AsyncFileWriter()
+    logging.info("[INFO] - Using the %s connection pool profile", POOL.name)
+    async with writer, aiohttp.ClientSession(
+            headers=headers, timeout=TIMEOUTS.for_aiohttp(),
+            connector=POOL.connector()) as session:
+        novels = discover_novels(session, website_base_url, novel_base_url,
+                                 shard, ids=ids)
+        scheduler = discovery = None
+        if deadline is not None:
+            scheduler = PriorityScheduler(
+                previous, crawl_times,
+                start + deadline * (1 - DRAIN_SHARE))
+            discovery = asyncio.create_task(scheduler.discover(novels),
+                                            name="discovery")
+            novels = scheduler.novels()
+
+        pipeline = Pipeline(
+            novels,
+            [
+                Stage("fetch", partial(fetch_novel_page, session),
+                      workers=workers["fetch"]),
+                Stage("parse", parse_novel_page, workers=workers["parse"],
+                      blocking=True),
+                Stage("media", partial(download_novel_media, session,
+                                       writer, novel_base_url, media_dir),
+                      workers=workers["media"]),
+                Stage("sink", collect_novel_data, workers=workers["sink"]),
+            ]
+        )
+        try:
+            await asyncio.wait_for(
+                pipeline.run_async(),
+                None if deadline is None
+                else max(0.0, start + deadline - loop.time()))
+        except asyncio.TimeoutError:
+            logging.warning("[WARNING] - Deadline reached, dropped the "
+                            "novels in flight")
+        finally:
+            if discovery is not None:
+                discovery.cancel()
+        await writer.checkpoint()
+        PROFILER.snapshot("pipeline")
+        if shard is None:
+            ids.save()
+        if scheduler is not None:
+            logging.info("[INFO] - Crawled %s novels before the deadline, "
+                         "started %s", len(data_dict), scheduler.summary())
+
+        crawled_at = time.time()
+        crawl_times.update((canonicalize_url(record["url"]), crawled_at)
+                           for record in data_dict)
+        records = merge_with_previous(previous, data_dict)
+
+        # Save extracted data to a JSON file
+        try:
+            await writer.write_json_array(records, data_file)
+            logging.info("[INFO] - Saved extracted data to %s", data_file)
+        except IOError as e:
+            logging.error("[ERROR] - Error writing to file %s: %s",
+                          data_file, e)
+        await asyncio.to_thread(save_crawl_times, crawl_times, times_file)
+
+
+async def discover_novels(session: ClientSession, website_base_url: str,
+                          novel_base_url: str, shard: Optional[Shard] = None,
+                          frontier: Optional[Frontier] = None,
+                          ids: Optional[NovelIds] = None
+                          ) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Walks the index pages of the website and yields every novel found.
+
+    Every novel is yielded once, under its canonical URL and a key that
+    no other novel uses. IDs are derived from the URL, so the IDs of all
+    shards fit together.
+
+    Args:
+        session (ClientSession): The aiohttp session to use for the requests.
+        website_base_url (str): The base URL of the website.
+        novel_base_url (str): The base URL for novels.
+        shard (Optional[Shard]): Only yield the novels of this shard.
+        frontier (Optional[Frontier]): The frontier that deduplicates the
+        novels, a new one by default.
+        ids (Optional[NovelIds]): The IDs of the novels, a new table by
+        default.
+
+    Yields:
+        Dict[str, Any]: The id, url and sanitized_title of a novel.
+    """
+    if frontier is None:
+        frontier = Frontier()
+    if ids is None:
+        ids = NovelIds()
     index = 1
-    id = 1
-    async with aiohttp.ClientSession(headers=headers) as session:
-        while True:
-            # Construct URL for the current index page
-            if index == 1:
-                # Skip index1.html since it doesn't exist
-                novels_url = f"{website_base_url}index.html"
-            else:
-                novels_url = f"{website_base_url}index{index}.html"
-
-            if not await url_exists(session, novels_url):
-                logging.warning(
-                    f"[WARNING] - URL does not exist: {novels_url}")
-                break
-
-            logging.info(f"[INFO] - ({index}): Fetching URL: {novels_url}")
-            page_content = await fetch_html(session, novels_url)
-            if not page_content:
-                continue
-            soup = BeautifulSoup(page_content, "lxml")
+    while True:
+        # Construct URL for the current index page
+        if index == 1:
+            # Skip index1.html since it doesn't exist
+            novels_url = f"{website_base_url}index.html"
+        else:
+            novels_url = f"{website_base_url}index{index}.html"
+
+        if not await url_exists(session, novels_url):
+            logging.warning(
+                "[WARNING] - URL does not exist: %s", novels_url)
+            break
+
+        logging.info("[INFO] - (%s): Fetching URL: %s", index, novels_url)
+        page_content, encoding = await fetch_html(session, novels_url)
+        if not page_content:
+            RETRIES.inc(host=host_of(novels_url))
+            continue
+        with track_stage("parse", novels_url), \
+                PROFILER.stage("discovery"):
+            soup = parse_html(novels_url, page_content, encoding)
             novel_titles = soup.find_all("h2")
             novel_links = soup.find_all("a", class_="link-a")
 
-            # Ensure number of titles matches number of links
-            if len(novel_links) != len(novel_titles):
-                logging.warning(f"[WARNING] - Number of links({len(novel_links)}) and titles({len(novel_titles)}) mismatch")
-
-            for novel_title, novel_link in zip(novel_titles, novel_links):
-                novel_url = novel_link.get("href")
-                filename = extract_filename_from_url(novel_url)
-                novel_url = novel_base_url + filename
-                sanitized_title = sanitize_filename(filename)
-
-                task = asyncio.create_task(
-                    get_novel_data(
-                        session,
-                        novel_base_url,
-                        novel_url,
-                        media_dir,
-                        sanitized_title,
-                        id
-                    )
-                )
-                tasks.append(task)
-                id += 1
-
-            await asyncio.sleep(random.uniform(1, 2))
-            index += 1
-
-        await asyncio.gather(*tasks)
-
-    # Save extracted data to a JSON file
-    try:
-        with open(data_file, "w") as json_file:
-            json.dump(data_dict, json_file, indent=4, ensure_ascii=False)
-            logging.info(f"[INFO] - Saved extracted data to {data_file}")
-    except IOError as e:
-        logging.error(f"[ERROR] - Error writing to file {data_file}: {e}")
-
-
-async def get_novel_data(session: ClientSession, novel_base_url: str,
-                         novel_url: str, media_dir: str,
-                         sanitized_title: str, id: int) -> None:
+        # Ensure number of titles matches number of links
+        if len(novel_links) != len(novel_titles):
+            logging.warning(
+                "[WARNING] - Number of links(%s) and titles(%s) mismatch",
+                len(novel_links), len(novel_titles))
+
+        for novel_link in novel_links[:len(novel_titles)]:
+            novel_url = novel_link.get("href")
+            filename = extract_filename_from_url(novel_url)
+            admitted = frontier.admit(novel_base_url + filename,
+                                      sanitize_filename(filename))
+            if admitted is None:
+                continue
+
+            novel_url, sanitized_title = admitted
+            if shard is None or in_shard(novel_url, shard):
+                yield {
+                    "id": ids.id_for(novel_url),
+                    "url": novel_url,
+                    "sanitized_title": sanitized_title,
+                }
+
+        await asyncio.sleep(random.uniform(1, 2))
+        index += 1
+
+
+async def fetch_novel_page(session: ClientSession,
+                           novel: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Extracts data for a single novel and appends it
-    to the global data dictionary.
+    Fetches the page of a novel.
 
     Args:
         session (ClientSession): The aiohttp session to use for the request.
-        novel_base_url (str): The base URL for novels.
-        novel_url (str): The URL of the novel page.
-        media_dir (str): The directory where media files will be saved.
-        sanitized_title (str): The sanitized title of the novel
-        used as the image file name.
-        id (int): The ID of the novel.
+        novel (Dict[str, Any]): The discovered novel.
+
+    Returns:
+        Optional[Dict[str, Any]]: The novel with its raw "page_content"
+        and declared "encoding", or None if the page could not be fetched.
     """
-    logging.info(f"[INFO] - Extracting novel data from {novel_url}...")
+    logging.info("[INFO] - Extracting novel data from %s...", novel["url"])
 
-    if not await url_exists(session, novel_url):
-        logging.warning(f"[WARNING] - URL does not exist: {novel_url}.")
-        return
+    if not await url_exists(session, novel["url"]):
+        logging.warning("[WARNING] - URL does not exist: %s.", novel["url"])
+        return None
 
-    page_content = await fetch_html(session, novel_url)
+    page_content, encoding = await fetch_html(session, novel["url"])
     if not page_content:
-        return
+        return None
+
+    novel["page_content"] = page_content
+    novel["encoding"] = encoding
+    return novel
+
+
+def parse_novel_page(novel: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts the novel details from the fetched page.
+
+    Args:
+        novel (Dict[str, Any]): The novel with its "page_content" and
+        "encoding".
+
+    Returns:
+        Dict[str, Any]: The novel with the extracted details. The page
+        content and encoding are dropped.
+    """
+    novel.update(extract_novel_data(novel["url"], novel.pop("page_content"),
+                                    novel.pop("encoding")))
+    return novel
 
-    soup = BeautifulSoup(page_content, "lxml")
 
-    # Extract novel details using helper functions
-    novel_title = get_novel_title(novel_url, soup)
-    novel_image_url = get_novel_image_url(novel_url, soup)
-    novel_status = get_novel_status(novel_url, soup)
-    novel_synopsis = get_novel_synopsis(novel_url, soup)
-    novel_genres = get_novel_genres(novel_url, soup)
-    novel_num_volumes = get_number_of_volumes(novel_url, soup)
+async def download_novel_media(session: ClientSession,
+                               writer: AsyncFileWriter, novel_base_url: str,
+                               media_dir: str,
+                               novel: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Downloads the cover image of a novel.
+
+    Args:
+        session (ClientSession): The aiohttp session to use for the request.
+        writer (AsyncFileWriter): The writer that saves the image.
+        novel_base_url (str): The base URL for novels.
+        media_dir (str): The directory where media files will be saved.
+        novel (Dict[str, Any]): The parsed novel.
 
-    image_path = await download_novel_image(
+    Returns:
+        Dict[str, Any]: The novel with the "image" path.
+    """
+    novel["image"] = await download_novel_image(
         session,
         novel_base_url,
-        novel_image_url,
-        media_dir, sanitized_title
+        novel["image_url"],
+        media_dir, novel["sanitized_title"], writer
     )
+    return novel
 
-    # Collect data in a dictionary
-    data = {
-        "id": id,
-        "title": novel_title,
-        "status": novel_status,
-        "synopsis": novel_synopsis,
-        "genres": novel_genres,
-        "num_volumes": novel_num_volumes,
-        "image": image_path,
-        "url": novel_url
-    }
 
-    logging.info(f"[INFO] - {id}. Processed {novel_title}")
-    data_dict.append(data)
+def collect_novel_data(novel: Dict[str, Any]) -> None:
+    """
+    Appends the record of a processed novel to the global data dictionary.
+
+    Args:
+        novel (Dict[str, Any]): The novel with its details and image path.
+    """
+    logging.info("[INFO] - %s. Processed %s", novel["id"], novel["title"])
+    data_dict.append(build_novel_record(novel["id"], novel))
@@ -0,0 +1,376 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from utils.json_utils import atomic_file, dumps, loads
+
+# A columnar snapshot stores every field of the records as one column, so a
+# column can be read without decoding the others, and the file can be
+# memory-mapped and used in place. All numbers are little-endian.
+#
+# Layout:
+#
+#     magic       8 bytes    b"NOVCOL01"
+#     length      uint64     length of the header
+#     header      UTF-8 JSON {"rows": n, "columns": [column, ...]}
+#     padding     zero bytes up to a multiple of 8
+#     buffers     every buffer starts at a multiple of 8
+#
+# Every column of the header has a "name", a "kind" and "buffers", a mapping
+# from buffer name to [offset, length] in bytes, counted from the start of
+# the file. The kinds are:
+#
+#     int       "values": int64 per row
+#     string    "offsets": uint64 per row + 1, "data": UTF-8 bytes.
+#               Row i is data[offsets[i]:offsets[i + 1]].
+#     dict      "codes": int32 per row, indexes into the dictionary strings
+#               stored like a string column in "dict_offsets"/"dict_data".
+#     dict_list "list_offsets": uint64 per row + 1, "codes": int32 per list
+#               item, and the dictionary in "dict_offsets"/"dict_data".
+#               Row i is codes[list_offsets[i]:list_offsets[i + 1]].
+#     string_list
+#               "list_offsets": uint64 per row + 1, and the items stored like
+#               a string column in "offsets"/"data".
+#
+# status is a dict column and genres a dict_list column of the genres split
+# at commas; they are joined again with ", " when records are read. volumes
+# is a string_list column of the volume URLs.
+
+MAGIC = b"NOVCOL01"
+LENGTH = struct.Struct("<Q")
+
+# Column kinds of the fields of a record, in record order
+SCHEMA: List[Tuple[str, str]] = [
+    ("id", "int"),
+    ("title", "string"),
+    ("status", "dict"),
+    ("synopsis", "string"),
+    ("genres", "dict_list"),
+    ("num_volumes", "int"),
+    ("image", "string"),
+    ("url", "string"),
+    ("volumes", "string_list"),
+]
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _split_genres(genres: str) -> List[str]:
+    return [genre.strip() for genre in genres.split(",") if genre.strip()]
+
+
+def _string_buffers(values: Sequence[str],
+                    prefix: str = "") -> Dict[str, bytes]:
+    offsets = array("Q", [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode("utf-8")
+        offsets.append(len(data))
+    return {f"{prefix}offsets": _little_endian(offsets),
+            f"{prefix}data": bytes(data)}
+
+
+def _encode_column(kind: str, values: List[Any]) -> Dict[str, bytes]:
+    if kind == "int":
+        return {"values": _little_endian(array("q", values))}
+    if kind == "string":
+        return _string_buffers(values)
+    if kind == "string_list":
+        list_offsets = array("Q", [0])
+        items: List[str] = []
+        for value in values:
+            items.extend(value)
+            list_offsets.append(len(items))
+        return {"list_offsets": _little_endian(list_offsets),
+                **_string_buffers(items)}
+
+    dictionary: Dict[str, int] = {}
+    if kind == "dict":
+        codes = array("i", (dictionary.setdefault(value, len(dictionary))
+                            for value in values))
+        buffers = {"codes": _little_endian(codes)}
+    else:
+        list_offsets = array("Q", [0])
+        codes = array("i")
+        for value in values:
+            for item in _split_genres(value):
+                codes.append(dictionary.setdefault(item, len(dictionary)))
+            list_offsets.append(len(codes))
+        buffers = {"list_offsets": _little_endian(list_offsets),
+                   "codes": _little_endian(codes)}
+    buffers.update(_string_buffers(list(dictionary), "dict_"))
+    return buffers
+
+
+def write_columnar(records: List[Dict[str, Any]], file_name: str) -> None:
+    """
+    Writes records to a columnar snapshot, replacing it atomically.
+
+    Args:
+        records (List[Dict[str, Any]]): The records of the crawl output.
+        file_name (str): The snapshot file.
+    """
+    # The outputs of older crawls have no volumes
+    columns = [(name, kind,
+                _encode_column(kind, [record.get(name, [])
+                                      if kind == "string_list"
+                                      else record[name]
+                                      for record in records]))
+               for name, kind in SCHEMA]
+
+    # The header holds the buffer offsets, which depend on its own length,
+    # so it is laid out twice: the second pass uses the final length
+    header_length = 0
+    for _ in range(2):
+        offset = _align(len(MAGIC) + LENGTH.size + header_length)
+        header_columns = []
+        for name, kind, buffers in columns:
+            placed = {}
+            for buffer_name, content in buffers.items():
+                placed[buffer_name] = [offset, len(content)]
+                offset = _align(offset + len(content))
+            header_columns.append(
+                {"name": name, "kind": kind, "buffers": placed})
+        header = dumps({"rows": len(records), "columns": header_columns})
+        header = header.ljust(header_length, b" ")
+        if len(header) == header_length:
+            break
+        header_length = len(header) + 64
+
+    with atomic_file(file_name) as file:
+        file.write(MAGIC + LENGTH.pack(len(header)) + header)
+        for _, _, buffers in columns:
+            for content in buffers.values():
+                file.write(b"\0" * (_align(file.tell()) - file.tell()))
+                file.write(content)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+class StringColumn(Sequence[str]):
+    """A string column read from a snapshot on access."""
+
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._data[start:end]).decode("utf-8")
+
+
+class DictionaryColumn(Sequence[str]):
+    """A dictionary-encoded column: integer codes into a few strings."""
+
+    def __init__(self, codes: memoryview, dictionary: List[str]) -> None:
+        self.codes = codes
+        self.dictionary = dictionary
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.dictionary[self.codes[index]]
+
+    def value_counts(self) -> Dict[str, int]:
+        """Counts the rows of every value without decoding the rows."""
+        counts = [0] * len(self.dictionary)
+        for code in self.codes:
+            counts[code] += 1
+        return dict(zip(self.dictionary, counts))
+
+
+class DictionaryListColumn(Sequence[List[str]]):
+    """A column of lists of dictionary-encoded strings."""
+
+    def __init__(self, list_offsets: memoryview, codes: memoryview,
+                 dictionary: List[str]) -> None:
+        self.list_offsets = list_offsets
+        self.codes = codes
+        self.dictionary = dictionary
+
+    def __len__(self) -> int:
+        return len(self.list_offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start, end = self.list_offsets[index], self.list_offsets[index + 1]
+        return [self.dictionary[code] for code in self.codes[start:end]]
+
+    def value_counts(self) -> Dict[str, int]:
+        """Counts the rows that have every value."""
+        counts = [0] * len(self.dictionary)
+        offsets = self.list_offsets
+        for index in range(len(self)):
+            # A value listed twice in one row counts once
+            for code in set(self.codes[offsets[index]:offsets[index + 1]]):
+                counts[code] += 1
+        return dict(zip(self.dictionary, counts))
+
+
+class StringListColumn(Sequence[List[str]]):
+    """A column of lists of strings."""
+
+    def __init__(self, list_offsets: memoryview,
+                 items: StringColumn) -> None:
+        self.list_offsets = list_offsets
+        self.items = items
+
+    def __len__(self) -> int:
+        return len(self.list_offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start, end = self.list_offsets[index], self.list_offsets[index + 1]
+        return self.items[start:end]
+
+
+class ColumnarReader:
+    """
+    Reads a columnar snapshot through a memory map.
+
+    Opening a snapshot only parses its header; the columns are views into
+    the mapped file, so loading costs the same for any number of rows.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self._file = open(file_name, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        self._view = memoryview(self._data)
+        self._views: List[memoryview] = []
+        self._cache: Dict[str, Sequence[Any]] = {}
+
+        if bytes(self._view[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"Not a columnar snapshot: {file_name}")
+        (header_length,) = LENGTH.unpack_from(self._view, len(MAGIC))
+        start = len(MAGIC) + LENGTH.size
+        header = loads(bytes(self._view[start:start + header_length]))
+        self.rows: int = header["rows"]
+        self._columns = {column["name"]: column
+                         for column in header["columns"]}
+
+    def _buffer(self, column: Dict[str, Any], name: str,
+                typecode: str = "") -> Any:
+        offset, length = column["buffers"][name]
+        view = self._view[offset:offset + length]
+        self._views.append(view)
+        if not typecode:
+            return view
+        if sys.byteorder != "little":
+            values = array(typecode, bytes(view))
+            values.byteswap()
+            return memoryview(values)
+        view = view.cast(typecode)
+        self._views.append(view)
+        return view
+
+    def _strings(self, column: Dict[str, Any],
+                 prefix: str = "") -> StringColumn:
+        return StringColumn(self._buffer(column, f"{prefix}offsets", "Q"),
+                            self._buffer(column, f"{prefix}data"))
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> Sequence[Any]:
+        """
+        Returns a column as a sequence backed by the memory map.
+
+        Args:
+            name (str): The field name.
+
+        Returns:
+            Sequence[Any]: The values of every row.
+
+        Raises:
+            KeyError: If the snapshot has no such column.
+        """
+        if name in self._cache:
+            return self._cache[name]
+
+        column = self._columns[name]
+        kind = column["kind"]
+        if kind == "int":
+            values: Sequence[Any] = self._buffer(column, "values", "q")
+        elif kind == "string":
+            values = self._strings(column)
+        elif kind == "dict":
+            values = DictionaryColumn(self._buffer(column, "codes", "i"),
+                                      list(self._strings(column, "dict_")))
+        elif kind == "dict_list":
+            values = DictionaryListColumn(
+                self._buffer(column, "list_offsets", "Q"),
+                self._buffer(column, "codes", "i"),
+                list(self._strings(column, "dict_")))
+        elif kind == "string_list":
+            values = StringListColumn(
+                self._buffer(column, "list_offsets", "Q"),
+                self._strings(column))
+        else:
+            raise ValueError(f"Unknown column kind: {kind}")
+        self._cache[name] = values
+        return values
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """Rebuilds the record of a row as in the JSON output."""
+        record = {}
+        for name, column in self._columns.items():
+            value = self.column(name)[index]
+            record[name] = ", ".join(value) \
+                if column["kind"] == "dict_list" else value
+        return record
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.rows):
+            yield self.record(index)
+
+    def close(self) -> None:
+        """
+        Releases the memory map and the file. Columns returned by column()
+        can no longer be read.
+        """
+        self._cache.clear()
+        for view in reversed(self._views):
+            view.release()
+        self._view.release()
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> "ColumnarReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
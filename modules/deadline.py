@@ -0,0 +1,176 @@
+import asyncio
+import itertools
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from utils.json_utils import read_json, write_json
+from utils.url_utils import canonicalize_url
+
+# The share of the time budget in which no new work is started, so the
+# novels in flight can finish before the deadline
+DRAIN_SHARE = 0.1
+
+# Scheduling classes, most useful first
+NEW, INCOMPLETE, STALE = 0, 1, 2
+CLASS_NAMES = {NEW: "new", INCOMPLETE: "incomplete", STALE: "stale"}
+
+# The fields of a complete record, see build_novel_record()
+RECORD_FIELDS = ("id", "title", "status", "synopsis", "genres",
+                 "num_volumes", "image", "url", "volumes")
+
+_DONE = (3, 0.0, 0)
+
+
+def crawl_times_file(data_file: str) -> str:
+    """
+    Returns the file with the crawl time of every record of a data file.
+
+    Args:
+        data_file (str): The data file, e.g. data/novels_data.json.
+
+    Returns:
+        str: The file next to it, e.g. data/novels_data.crawled.json.
+    """
+    root, extension = os.path.splitext(data_file)
+    return f"{root}.crawled{extension}"
+
+
+def load_crawl_times(file_name: str) -> Dict[str, float]:
+    """
+    Reads the crawl times of the records, by canonical URL.
+
+    Returns:
+        Dict[str, float]: The Unix time each record was last crawled, or
+        nothing if the file is missing or damaged.
+    """
+    try:
+        crawl_times = read_json(file_name)
+    except (OSError, ValueError):
+        return {}
+    return {canonicalize_url(url): crawled_at
+            for url, crawled_at in crawl_times.items()}
+
+
+def save_crawl_times(crawl_times: Dict[str, float], file_name: str) -> None:
+    """Writes the crawl times of the records, by URL."""
+    try:
+        write_json(dict(sorted(crawl_times.items())), file_name)
+    except IOError as e:
+        logging.error("[ERROR] - Error writing to file %s: %s", file_name, e)
+
+
+def is_incomplete(record: Dict[str, Any]) -> bool:
+    """Returns whether a record lacks a field or has one not found."""
+    return any(record.get(field, "Not found") == "Not found"
+               for field in RECORD_FIELDS)
+
+
+def merge_with_previous(previous: Iterable[Dict[str, Any]],
+                        fresh: Iterable[Dict[str, Any]]
+                        ) -> List[Dict[str, Any]]:
+    """
+    Updates the records of an earlier output with freshly crawled ones.
+
+    Args:
+        previous (Iterable[Dict[str, Any]]): The records of the earlier
+        output.
+        fresh (Iterable[Dict[str, Any]]): The records crawled now.
+
+    Returns:
+        List[Dict[str, Any]]: The fresh records and the previous records
+        of all other URLs, sorted by ID. The URLs are compared in their
+        canonical form, as outputs of older versions hold raw URLs.
+    """
+    by_url = {canonicalize_url(record["url"]): record for record in previous}
+    by_url.update((canonicalize_url(record["url"]), record)
+                  for record in fresh)
+    return sorted(by_url.values(), key=lambda record: record["id"])
+
+
+class PriorityScheduler:
+    """
+    Feeds the discovered novels to a time-budgeted crawl, most useful
+    first.
+
+    Novels missing from the previous output come first, in discovery
+    order. Then come the novels whose previous record lacks fields, and
+    then all others; both by the time they were last crawled, oldest
+    first. Discovery runs alongside the crawl, so crawling starts with the
+    first index page, and a new novel found later still goes ahead of all
+    known novels that are waiting.
+
+    No novel is handed out after stop_at, a time of the event loop clock.
+    """
+
+    def __init__(self, previous: Iterable[Dict[str, Any]],
+                 crawl_times: Dict[str, float], stop_at: float) -> None:
+        self.stop_at = stop_at
+        self._previous = {canonicalize_url(record["url"]): record
+                          for record in previous}
+        self._crawl_times = {canonicalize_url(url): crawled_at
+                             for url, crawled_at in crawl_times.items()}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._novels: Dict[int, Dict[str, Any]] = {}
+        self.scheduled = {name: 0 for name in CLASS_NAMES.values()}
+        self.started = {name: 0 for name in CLASS_NAMES.values()}
+
+    def priority(self, url: str) -> Tuple[int, float]:
+        """
+        Returns the scheduling class of a novel and the time it was last
+        crawled, 0 if unknown.
+        """
+        url = canonicalize_url(url)
+        record = self._previous.get(url)
+        if record is None:
+            return NEW, 0.0
+        crawled_at = self._crawl_times.get(url, 0.0)
+        return (INCOMPLETE if is_incomplete(record) else STALE), crawled_at
+
+    async def discover(self, novels: AsyncIterator[Dict[str, Any]]) -> None:
+        """
+        Schedules every novel yielded by the discovery.
+
+        Args:
+            novels (AsyncIterator[Dict[str, Any]]): The discovered novels.
+        """
+        try:
+            async for novel in novels:
+                seq = next(self._order)
+                level, crawled_at = self.priority(novel["url"])
+                self._novels[seq] = novel
+                self.scheduled[CLASS_NAMES[level]] += 1
+                await self._queue.put((level, crawled_at, seq))
+        except Exception as e:
+            logging.error("[ERROR] - Discovery failed: %s", e)
+        finally:
+            # Sorts after every novel, so it ends the feed once all
+            # scheduled novels were handed out
+            self._queue.put_nowait(_DONE)
+
+    async def novels(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields the scheduled novels by priority until all are handed out
+        or stop_at is reached.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            remaining = self.stop_at - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                entry = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return
+            if entry == _DONE:
+                return
+            self.started[CLASS_NAMES[entry[0]]] += 1
+            yield self._novels.pop(entry[2])
+
+    def summary(self) -> str:
+        """Returns the started and scheduled novels of every class."""
+        return ", ".join(
+            f"{self.started[name]}/{self.scheduled[name]} {name}"
+            for name in CLASS_NAMES.values())
+
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from utils.url_utils import canonicalize_url
+
+BLOOM_MAGIC = b"NOVBLM01"
+BLOOM_HEADER = struct.Struct(">8sQI")
+
+
+class BloomFilter:
+    """
+    A fixed-size set of strings that may report false positives.
+
+    The size only depends on the expected number of items and the accepted
+    false positive rate, e.g. about 1.2 MB for a million URLs at 1%.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("A Bloom filter needs a positive capacity and "
+                             "an error rate between 0 and 1")
+        self.size = max(8, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Tuple[int, ...]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return tuple((first + i * second) % self.size
+                     for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+    def save(self, file_name: str) -> None:
+        """Writes the filter to a file."""
+        with open(file_name, "wb") as file:
+            file.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.size, self.hashes))
+            file.write(self.bits)
+
+    @classmethod
+    def load(cls, file_name: str) -> "BloomFilter":
+        """
+        Reads a filter written by save().
+
+        Raises:
+            ValueError: If the file is not a Bloom filter.
+        """
+        with open(file_name, "rb") as file:
+            content = file.read()
+        magic, size, hashes = BLOOM_HEADER.unpack_from(content, 0)
+        if magic != BLOOM_MAGIC:
+            raise ValueError(f"Not a Bloom filter: {file_name}")
+
+        bloom = cls.__new__(cls)
+        bloom.size, bloom.hashes = size, hashes
+        bloom.bits = bytearray(content[BLOOM_HEADER.size:])
+        return bloom
+
+
+class Frontier:
+    """
+    Admits every novel URL once and gives every novel a unique key.
+
+    URLs are canonicalized before they are compared, so spelling variants
+    of a link found on different index pages are fetched once. Two novels
+    whose titles sanitize to the same key get distinct keys instead of one
+    replacing the other.
+
+    The URLs whose pages were stored are kept in a seen-set that is saved
+    to seen_file, so a resumed crawl can skip them. The seen-set is exact,
+    or a Bloom filter of fixed size if bloom_capacity is given; a false
+    positive then only means the page is looked up before it is fetched.
+    Frontiers are thread-safe.
+    """
+
+    def __init__(self, seen_file: Optional[str] = None,
+                 bloom_capacity: Optional[int] = None,
+                 resume: bool = False) -> None:
+        self.seen_file = seen_file
+        self._lock = threading.Lock()
+        self._keys: Dict[str, str] = {}
+        self._urls: Dict[str, str] = {}
+        self._seen: Optional[BloomFilter] = None
+        self._seen_urls: Set[str] = set()
+
+        if bloom_capacity:
+            self._seen = BloomFilter(bloom_capacity)
+        if resume and seen_file and os.path.exists(seen_file):
+            self._load(seen_file)
+
+    def _load(self, seen_file: str) -> None:
+        with open(seen_file, "rb") as file:
+            is_bloom = file.read(len(BLOOM_MAGIC)) == BLOOM_MAGIC
+        if is_bloom:
+            self._seen = BloomFilter.load(seen_file)
+            logging.info("[INFO] - Loaded the seen-set from %s", seen_file)
+            return
+
+        with open(seen_file, "r", encoding="utf-8") as file:
+            urls = {line.rstrip("\n") for line in file if line.strip()}
+        if self._seen is not None:
+            for url in urls:
+                self._seen.add(url)
+        else:
+            self._seen_urls = urls
+        logging.info("[INFO] - Loaded %s seen URLs from %s", len(urls),
+                     seen_file)
+
+    def admit(self, url: str, key: str) -> Optional[Tuple[str, str]]:
+        """
+        Registers a discovered novel.
+
+        Args:
+            url (str): The URL of the novel.
+            key (str): The sanitized title of the novel.
+
+        Returns:
+            Optional[Tuple[str, str]]: The canonical URL and a key no other
+            novel uses, or None if the URL was already admitted.
+        """
+        url = canonicalize_url(url)
+        with self._lock:
+            if url in self._urls:
+                logging.debug("[DEBUG] - Skipping duplicate URL: %s", url)
+                return None
+
+            unique_key = key
+            if unique_key in self._keys:
+                digest = hashlib.blake2b(url.encode("utf-8"),
+                                         digest_size=4).hexdigest()
+                unique_key = f"{key}_{digest}"
+                suffix = 2
+                while unique_key in self._keys:
+                    unique_key = f"{key}_{digest}_{suffix}"
+                    suffix += 1
+                logging.warning(
+                    "[WARNING] - Key %s of %s is already used by %s, "
+                    "saving it as %s", key, url, self._keys[key], unique_key)
+
+            self._keys[unique_key] = url
+            self._urls[url] = unique_key
+            return url, unique_key
+
+    def seen(self, url: str) -> bool:
+        """Returns whether the page of a URL was stored by an earlier run."""
+        url = canonicalize_url(url)
+        with self._lock:
+            if self._seen is not None:
+                return url in self._seen
+            return url in self._seen_urls
+
+    def mark_stored(self, url: str) -> None:
+        """Adds a URL to the seen-set once its page is stored."""
+        url = canonicalize_url(url)
+        with self._lock:
+            if self._seen is not None:
+                self._seen.add(url)
+            else:
+                self._seen_urls.add(url)
+
+    def save(self) -> None:
+        """Writes the seen-set to seen_file, replacing it atomically."""
+        if not self.seen_file:
+            return
+
+        directory = os.path.dirname(self.seen_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = self.seen_file + ".tmp"
+        with self._lock:
+            if self._seen is not None:
+                self._seen.save(tmp_file)
+            else:
+                with open(tmp_file, "w", encoding="utf-8") as file:
+                    for url in sorted(self._seen_urls):
+                        file.write(url + "\n")
+        os.replace(tmp_file, self.seen_file)
+        logging.info("[INFO] - Saved the seen-set to %s", self.seen_file)
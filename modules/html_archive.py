@@ -0,0 +1,352 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every record starts with the key length, the codec, the stored length and
+# the key, followed by the (compressed) page content
+RECORD_HEADER = struct.Struct(">HBQ")
+INDEX_MAGIC = b"NOVIDX01"
+INDEX_HEADER = struct.Struct(">8sQQ")
+INDEX_ENTRY = struct.Struct(">QQQ")
+
+CODEC_RAW = 0
+CODEC_GZIP = 1
+CODEC_ZSTD = 2
+
+
+def index_path(archive_file: str) -> str:
+    """Returns the path of the offset index of an archive."""
+    return archive_file + ".idx"
+
+
+def key_hash(key: str) -> int:
+    """
+    Hashes a sanitized title to the 64-bit key of the offset index.
+
+    Args:
+        key (str): The sanitized title.
+
+    Returns:
+        int: The hash as an unsigned integer.
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def compress(content: bytes, codec: Optional[int] = None) -> Tuple[int, bytes]:
+    """
+    Compresses page content with zstd if it is installed, or gzip.
+
+    Args:
+        content (bytes): The page content.
+        codec (Optional[int]): Force a codec instead of the best available.
+
+    Returns:
+        Tuple[int, bytes]: The codec used and the compressed content.
+    """
+    if codec is None:
+        codec = CODEC_ZSTD if zstandard is not None else CODEC_GZIP
+
+    if codec == CODEC_ZSTD:
+        return codec, zstandard.ZstdCompressor(level=3).compress(content)
+    if codec == CODEC_GZIP:
+        return codec, zlib.compress(content, 6)
+    return CODEC_RAW, content
+
+
+def decompress(codec: int, payload: bytes) -> bytes:
+    """
+    Decompresses the payload of a record.
+
+    Args:
+        codec (int): The codec the record was written with.
+        payload (bytes): The stored payload.
+
+    Returns:
+        bytes: The page content.
+
+    Raises:
+        ValueError: If the codec is unknown or zstandard is missing.
+    """
+    if codec == CODEC_RAW:
+        return bytes(payload)
+    if codec == CODEC_GZIP:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The archive uses zstd, install zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def scan_records(data: bytes, start: int = 0, end: Optional[int] = None
+                 ) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    Walks the records of an archive from the given offset.
+
+    Args:
+        data (bytes): The archive content, usually a memory map.
+        start (int): The offset of the first record.
+        end (Optional[int]): The offset the scan stops at, or None for
+        the end of the data.
+
+    Yields:
+        Tuple[str, int, int, int]: The key, codec, payload offset and
+        payload length of every complete record. A truncated record at
+        the end, left by an interrupted write, ends the scan.
+    """
+    offset = start
+    size = len(data) if end is None else min(end, len(data))
+    while offset + RECORD_HEADER.size <= size:
+        key_length, codec, length = RECORD_HEADER.unpack_from(data, offset)
+        key_start = offset + RECORD_HEADER.size
+        payload_start = key_start + key_length
+        if payload_start + length > size:
+            return
+        key = bytes(data[key_start:payload_start]).decode("utf-8")
+        yield key, codec, payload_start, length
+        offset = payload_start + length
+
+
+def read_index(archive_file: str) -> Tuple[Dict[int, Tuple[int, int]], int]:
+    """
+    Loads the offset index of an archive into a dictionary.
+
+    Args:
+        archive_file (str): The path of the archive.
+
+    Returns:
+        Tuple[Dict[int, Tuple[int, int]], int]: The record offsets and
+        lengths keyed by key hash, and the archive length the index covers.
+    """
+    entries: Dict[int, Tuple[int, int]] = {}
+    try:
+        with open(index_path(archive_file), "rb") as file:
+            content = file.read()
+    except FileNotFoundError:
+        return entries, 0
+
+    if len(content) < INDEX_HEADER.size:
+        return entries, 0
+    magic, count, covered = INDEX_HEADER.unpack_from(content, 0)
+    if magic != INDEX_MAGIC or \
+            len(content) < INDEX_HEADER.size + count * INDEX_ENTRY.size:
+        return entries, 0
+
+    for i in range(count):
+        hashed, offset, length = INDEX_ENTRY.unpack_from(
+            content, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+        entries[hashed] = (offset, length)
+    return entries, covered
+
+
+class ArchiveWriter:
+    """
+    Appends compressed pages to a single-file archive.
+
+    Records are only ever appended; a page saved again under the same key
+    supersedes the older record. The sorted offset index is rewritten
+    atomically by flush() and close(). If the index is behind the data
+    file, e.g. after a crash, the missing records are recovered from the
+    data file when the writer is opened. Writers are thread-safe.
+    """
+
+    def __init__(self, archive_file: str,
+                 codec: Optional[int] = None) -> None:
+        self.archive_file = archive_file
+        self.codec = codec
+        self._lock = threading.Lock()
+        self._entries, covered = read_index(archive_file)
+
+        directory = os.path.dirname(archive_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(archive_file, "ab")
+        self._recover(covered)
+
+    def _recover(self, covered: int) -> None:
+        size = os.path.getsize(self.archive_file)
+        if covered > size:
+            # The index belongs to an older archive
+            self._entries, covered = {}, 0
+        if covered == size:
+            return
+
+        end = covered
+        with open(self.archive_file, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for key, _, payload_start, length in scan_records(data,
+                                                                  covered):
+                    record_start = payload_start - RECORD_HEADER.size - \
+                        len(key.encode("utf-8"))
+                    self._entries[key_hash(key)] = (
+                        record_start, payload_start + length - record_start)
+                    end = payload_start + length
+
+        if end < size:
+            logging.warning("[WARNING] - Dropping %s bytes of a truncated "
+                            "record from %s", size - end, self.archive_file)
+            self._file.truncate(end)
+        logging.info("[INFO] - Recovered the index of %s",
+                     self.archive_file)
+        self.flush()
+
+    def add(self, key: str, content: bytes) -> None:
+        """
+        Appends a page to the archive.
+
+        Args:
+            key (str): The sanitized title of the novel.
+            content (bytes): The HTML content of the page.
+        """
+        encoded_key = key.encode("utf-8")
+        codec, payload = compress(content, self.codec)
+        header = RECORD_HEADER.pack(len(encoded_key), codec, len(payload))
+        with self._lock:
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(header + encoded_key + payload)
+            self._entries[key_hash(key)] = (
+                offset, len(header) + len(encoded_key) + len(payload))
+
+    def flush(self) -> None:
+        """Flushes the data file and writes the sorted offset index."""
+        with self._lock:
+            self._file.flush()
+            covered = self._file.seek(0, os.SEEK_END)
+            entries = sorted(self._entries.items())
+
+            tmp_file = index_path(self.archive_file) + ".tmp"
+            with open(tmp_file, "wb") as file:
+                file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(entries),
+                                             covered))
+                for hashed, (offset, length) in entries:
+                    file.write(INDEX_ENTRY.pack(hashed, offset, length))
+            os.replace(tmp_file, index_path(self.archive_file))
+
+    def close(self) -> None:
+        """Writes the index and closes the archive."""
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Reads pages from an archive through memory maps.
+
+    get() finds a record by binary search over the memory-mapped index, so
+    opening the archive costs the same for ten pages as for ten thousand.
+    iter_pages() streams every current record in the order it was written.
+    """
+
+    def __init__(self, archive_file: str) -> None:
+        self.archive_file = archive_file
+        self._data_file = open(archive_file, "rb")
+        self._data = self._map(self._data_file)
+        self._index_file = open(index_path(archive_file), "rb")
+        self._index = self._map(self._index_file)
+
+        magic, self._count, self._covered = INDEX_HEADER.unpack_from(
+            self._index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Not an archive index: "
+                             f"{index_path(archive_file)}")
+
+    @staticmethod
+    def _map(file) -> bytes:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0,  # type: ignore[return-value]
+                         access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _find(self, hashed: int) -> Optional[Tuple[int, int]]:
+        low, high = 0, self._count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            entry_hash, offset, length = INDEX_ENTRY.unpack_from(
+                self._index, INDEX_HEADER.size + middle * INDEX_ENTRY.size)
+            if entry_hash == hashed:
+                return offset, length
+            if entry_hash < hashed:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def _read_record(self, offset: int) -> Tuple[str, bytes]:
+        key_length, codec, length = RECORD_HEADER.unpack_from(self._data,
+                                                              offset)
+        key_start = offset + RECORD_HEADER.size
+        payload_start = key_start + key_length
+        key = bytes(self._data[key_start:payload_start]).decode("utf-8")
+        payload = self._data[payload_start:payload_start + length]
+        return key, decompress(codec, payload)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the page saved under the given key.
+
+        Args:
+            key (str): The sanitized title of the novel.
+
+        Returns:
+            Optional[bytes]: The page content, or None if it is not saved.
+        """
+        found = self._find(key_hash(key))
+        if found is None:
+            return None
+        stored_key, content = self._read_record(found[0])
+        return content if stored_key == key else None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key_hash(key)) is not None
+
+    def iter_pages(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Streams every current page in the order it was written.
+
+        Yields:
+            Tuple[str, bytes]: The key and the content of every page.
+            Superseded records are skipped.
+        """
+        for key, codec, payload_start, length in scan_records(
+                self._data, 0, self._covered):
+            found = self._find(key_hash(key))
+            record_start = payload_start - RECORD_HEADER.size - \
+                len(key.encode("utf-8"))
+            if found is None or found[0] != record_start:
+                continue
+            yield key, decompress(
+                codec, self._data[payload_start:payload_start + length])
+
+    def close(self) -> None:
+        """Closes the memory maps and the files."""
+        for mapped in (self._data, self._index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,9 +1,141 @@
+import atexit
 import logging
 import os
+import queue
+import re
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
 
+# Modules whose per-page warnings are rolled up into a run summary
+AGGREGATED_MODULES = ("novel_utils",)
+
+# Number of example URLs listed for every aggregated warning
+SUMMARY_EXAMPLES = 5
+
+_listener: Optional[QueueListener] = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the queue without formatting them.
+
+    The stdlib QueueHandler merges the message arguments in the calling
+    thread so that records can be pickled. The listener lives in the same
+    process, so the records are passed as they are and the message is only
+    built by the listener thread when a handler actually emits it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class WarningAggregator(logging.Filter):
+    """
+    Swallows repeated extractor warnings and counts them instead.
+
+    Warnings logged from the modules in AGGREGATED_MODULES are grouped by
+    the function and the unformatted message, and the first distinct
+    arguments of every group (the page URL for the extractors) are kept as
+    examples.
+    """
+
+    def __init__(self, modules: Tuple[str, ...] = AGGREGATED_MODULES) -> None:
+        super().__init__()
+        self.modules = modules
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._examples: Dict[Tuple[str, str], List[str]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.WARNING or \
+                record.module not in self.modules:
+            return True
+
+        key = (record.funcName, str(record.msg))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            examples = self._examples.setdefault(key, [])
+            if len(examples) < SUMMARY_EXAMPLES and record.args:
+                args = record.args
+                example = str(args[0] if isinstance(args, tuple) else args)
+                # The same page can log a warning more than once
+                if example not in examples:
+                    examples.append(example)
+        return False
+
+    def summary(self) -> List[str]:
+        """
+        Builds one line for every group of aggregated warnings.
+
+        Returns:
+            List[str]: The summary lines, the most frequent group first.
+        """
+        with self._lock:
+            counts = sorted(self._counts.items(), key=lambda item: -item[1])
+            examples = {key: list(urls) for key, urls in self._examples.items()}
+
+        lines = []
+        for (func_name, message), count in counts:
+            # The URLs are listed as examples, so drop them from the text
+            text = message.replace("[WARNING] - ", "")
+            text = re.sub(r"\.?\s*(for )?URL: %s\.?$", "", text)
+            line = f"{func_name}: {count} x '{text}'"
+            if examples[(func_name, message)]:
+                line += f" (e.g. {', '.join(examples[(func_name, message)])})"
+            lines.append(line)
+        return lines
+
+    def reset(self) -> None:
+        """Forgets all aggregated warnings."""
+        with self._lock:
+            self._counts.clear()
+            self._examples.clear()
+
+
+WARNING_AGGREGATOR = WarningAggregator()
+
+
+def log_warning_summary() -> None:
+    """Logs the aggregated extractor warnings and resets the counters."""
+    lines = WARNING_AGGREGATOR.summary()
+    WARNING_AGGREGATOR.reset()
+    if not lines:
+        return
+
+    logging.warning("[WARNING] - Extractor warnings during this run:")
+    for line in lines:
+        # Logged from this module, so the aggregator lets it through
+        logging.warning("[WARNING] -   %s", line)
+
+
+def stop_logging() -> None:
+    """Flushes the queued records and stops the listener thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging() -> QueueListener:
+    """
+    Routes the root logger through a queue to a background thread.
+
+    The file and console handlers run on the listener thread, so logging
+    never blocks the caller (or the event loop) on disk or terminal I/O.
+    Repeated extractor warnings are aggregated; call log_warning_summary()
+    at the end of a run to log them.
+
+    Returns:
+        QueueListener: The running listener. It is stopped at exit.
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
 
-def setup_logging():
     # Create the logs directory if it doesn't exist
     if not os.path.exists('logs'):
         os.makedirs('logs')
@@ -11,14 +143,28 @@ def setup_logging():
     # Generate a log file name with the current date and time
     log_filename = datetime.now().strftime('logs/%Y-%m-%d_%H-%M-%S.log')
 
-    # Configure the logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(message)s',
+    formatter = logging.Formatter(
+        fmt='%(asctime)s - %(message)s',
         datefmt='%d-%b-%y %H:%M:%S',
-        handlers=[
-            # Direct logs to the date-time-named log file
-            logging.FileHandler(log_filename),
-            logging.StreamHandler()  # Also output logs to the console
-        ]
     )
+    handlers: List[logging.Handler] = [
+        # Direct logs to the date-time-named log file
+        logging.FileHandler(log_filename),
+        logging.StreamHandler()  # Also output logs to the console
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(WARNING_AGGREGATOR)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    return _listener
@@ -0,0 +1,289 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from utils.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+# asyncio debug mode logs "Executing <handle> took 0.250 seconds"; the
+# handle of a task step shows the task name and where its coroutine runs
+TASK_NAME = re.compile(r"name='([^']*)'")
+RUNNING_AT = re.compile(r"running at (\S+?)>")
+
+
+def stage_of(task_name: Optional[str]) -> str:
+    """
+    Returns the pipeline stage of a task named "<stage>-<worker>".
+
+    Args:
+        task_name (Optional[str]): The task name, if any.
+
+    Returns:
+        str: The stage, or "other" for tasks outside the pipeline.
+    """
+    if not task_name or task_name.startswith("Task-"):
+        return "other"
+    return task_name.rsplit("-", 1)[0] if task_name[-1].isdigit() \
+        else task_name
+
+
+@dataclass
+class Offender:
+    """
+    The callbacks that blocked the event loop at one code location.
+
+    Args:
+        stage (str): The pipeline stage that ran the callbacks.
+        location (str): Where the blocking code runs.
+        seconds (float): The total time the loop was blocked.
+        count (int): The number of blocking callbacks.
+        stack (str): A stack captured while the loop was blocked.
+    """
+
+    stage: str
+    location: str
+    seconds: float = 0.0
+    count: int = 0
+    stack: str = field(default="", repr=False)
+
+
+class LoopMonitor:
+    """
+    Measures how late the event loop runs its callbacks, and why.
+
+    While watch() is active, a task sleeps for interval seconds again and
+    again; the extra time it takes to wake up is the scheduling lag that
+    every other callback suffers too. asyncio debug mode reports every
+    callback that runs longer than threshold seconds, with the task and
+    the line it ran. A watchdog thread also captures the stack of the loop
+    thread while it is blocked, which shows the blocking call itself.
+
+    Blocking time is attributed to the pipeline stage of the task, from
+    the task name. Disabled until configured, as debug mode slows the
+    loop down.
+    """
+
+    def __init__(self, top: int = 10, depth: int = 8) -> None:
+        self.enabled = False
+        self.threshold = 0.1
+        self.interval = 0.05
+        self.top = top
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._lags: List[float] = []
+        self._offenders: Dict[Tuple[str, str], Offender] = {}
+        self._beat = 0.0
+        self._stall_stack = ""
+
+    def configure(self, enabled: bool = False, threshold: float = 0.1,
+                  interval: float = 0.05) -> None:
+        """
+        Enables or disables the monitor.
+
+        Args:
+            enabled (bool): Whether watch() monitors the loop.
+            threshold (float): The seconds a callback may run before it is
+            reported as blocking.
+            interval (float): The seconds between two lag samples.
+
+        Raises:
+            ValueError: If threshold or interval is not positive.
+        """
+        if threshold <= 0 or interval <= 0:
+            raise ValueError("threshold and interval must be positive")
+        self.enabled = enabled
+        self.threshold = threshold
+        self.interval = interval
+
+    def _offender(self, stage: str, location: str) -> Offender:
+        key = (stage, location)
+        if key not in self._offenders:
+            self._offenders[key] = Offender(stage, location)
+        return self._offenders[key]
+
+    def record_slow_callback(self, handle: str, seconds: float) -> None:
+        """
+        Records a slow callback reported by asyncio debug mode.
+
+        Args:
+            handle (str): The callback, as formatted by asyncio.
+            seconds (float): How long the callback ran.
+        """
+        name = TASK_NAME.search(handle)
+        location = RUNNING_AT.search(handle)
+        stage = stage_of(name.group(1) if name else None)
+        EVENT_LOOP_BLOCKED.inc(seconds, stage=stage)
+        with self._lock:
+            offender = self._offender(
+                stage, location.group(1) if location else handle[:120])
+            offender.seconds += seconds
+            offender.count += 1
+            # The watchdog captured the stack of this callback while it
+            # blocked; asyncio reports the callback right after it ends
+            if self._stall_stack and not offender.stack:
+                offender.stack = self._stall_stack
+            self._stall_stack = ""
+
+    def _filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and \
+                record.msg.startswith("Executing") and \
+                len(record.args or ()) == 2:
+            handle, seconds = record.args  # type: ignore[misc]
+            self.record_slow_callback(str(handle), float(seconds))
+            # Reported in the summary instead of one warning each
+            return False
+        return True
+
+    async def _sample(self, loop: asyncio.AbstractEventLoop) -> None:
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self._beat = time.monotonic()
+            EVENT_LOOP_LAG.observe(lag)
+            with self._lock:
+                self._lags.append(lag)
+
+    def _watchdog(self, thread_id: int, stop: threading.Event) -> None:
+        captured = 0.0
+        while not stop.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval < self.threshold \
+                    or beat == captured:
+                continue
+            # One stack per stall, taken while the loop thread is still
+            # inside the blocking callback
+            captured = beat
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame)[-self.depth:])
+            with self._lock:
+                self._stall_stack = stack
+
+    @asynccontextmanager
+    async def watch(self) -> AsyncIterator[None]:
+        """Monitors the running event loop while the block runs."""
+        if not self.enabled:
+            yield
+            return
+
+        loop = asyncio.get_running_loop()
+        debug, slow = loop.get_debug(), loop.slow_callback_duration
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+        asyncio_logger = logging.getLogger("asyncio")
+        asyncio_logger.addFilter(self._filter)
+
+        self._beat = time.monotonic()
+        sampler = asyncio.create_task(self._sample(loop),
+                                      name="loop-monitor")
+        stop = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watchdog, args=(threading.get_ident(), stop),
+            name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.cancel()
+            watchdog.join()
+            asyncio_logger.removeFilter(self._filter)
+            loop.set_debug(debug)
+            loop.slow_callback_duration = slow
+
+    def percentiles(self) -> Dict[str, float]:
+        """Returns the p50, p95, p99 and maximum lag in seconds."""
+        with self._lock:
+            lags = sorted(self._lags)
+        if not lags:
+            return {}
+        return {
+            name: lags[min(len(lags) - 1, int(len(lags) * q))]
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99),
+                            ("max", 1.0))
+        }
+
+    def summary(self) -> str:
+        """
+        Builds a readable report of the collected data.
+
+        Returns:
+            str: The lag percentiles, the blocking time of every stage and
+            the worst offenders with a captured stack.
+        """
+        with self._lock:
+            samples = len(self._lags)
+            offenders = sorted(self._offenders.values(),
+                               key=lambda o: (o.seconds, o.count),
+                               reverse=True)
+        out = io.StringIO()
+
+        out.write(f"Event loop lag ({samples} samples every "
+                  f"{self.interval * 1000:.0f}ms)\n")
+        out.write("=" * 40 + "\n")
+        for name, lag in self.percentiles().items():
+            out.write(f"{name:<4} {lag * 1000:>10.1f}ms\n")
+
+        stages: Dict[str, Tuple[float, int]] = {}
+        for offender in offenders:
+            seconds, count = stages.get(offender.stage, (0.0, 0))
+            stages[offender.stage] = (seconds + offender.seconds,
+                                      count + offender.count)
+        out.write(f"\nBlocking callbacks over "
+                  f"{self.threshold * 1000:.0f}ms by stage\n")
+        out.write("-" * 40 + "\n")
+        for stage, (seconds, count) in sorted(
+                stages.items(), key=lambda item: item[1], reverse=True):
+            out.write(f"{stage:<12} {seconds:>10.3f}s in {count} "
+                      f"callback(s)\n")
+
+        out.write(f"\nTop {self.top} offenders\n")
+        out.write("-" * 40 + "\n")
+        for offender in offenders[:self.top]:
+            out.write(f"[{offender.stage}] {offender.location}: "
+                      f"{offender.seconds:.3f}s in {offender.count} "
+                      f"callback(s)\n")
+            if offender.stack:
+                out.write(offender.stack)
+        return out.getvalue()
+
+    def save(self, directory: str = "logs") -> None:
+        """
+        Logs the lag percentiles and saves the full report.
+
+        Args:
+            directory (str): The directory the report is written to.
+        """
+        if not self.enabled:
+            return
+
+        lags = self.percentiles()
+        if lags:
+            logging.info("[INFO] - Event loop lag: %s", ", ".join(
+                f"{name} {lag * 1000:.1f}ms" for name, lag in lags.items()))
+
+        os.makedirs(directory, exist_ok=True)
+        file_name = os.path.join(directory, datetime.now().strftime(
+            "%Y-%m-%d_%H-%M-%S_loop_monitor.txt"))
+        try:
+            with open(file_name, "w") as file:
+                file.write(self.summary())
+            logging.info("[INFO] - Saved the event loop report to %s",
+                         file_name)
+        except IOError as e:
+            logging.error("[ERROR] - Error writing to file %s: %s",
+                          file_name, e)
+
+
+LOOP_MONITOR = LoopMonitor()
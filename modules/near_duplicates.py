@@ -0,0 +1,273 @@
+import hashlib
+import logging
+import os
+import re
+import struct
+import unicodedata
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, FrozenSet, List, Sequence, Tuple
+
+from utils.json_utils import write_json_array
+
+# Signatures are compared band by band: two records whose signatures agree
+# on all rows of at least one band become a candidate pair. With b bands of
+# r rows, pairs with a Jaccard similarity s are found with a probability of
+# 1 - (1 - s^r)^b, which rises steeply around (1 / b)^(1 / r), about 0.42
+# for the defaults. Only candidate pairs are compared, so the catalogue is
+# never compared pair by pair.
+DEFAULT_BANDS = 32
+DEFAULT_ROWS = 4
+DEFAULT_THRESHOLD = 0.5
+TITLE_SHINGLE = 4
+SYNOPSIS_SHINGLE = 3
+
+NON_WORD = re.compile(r"[\W_]+")
+
+
+@dataclass
+class DuplicateGroup:
+    """
+    Records that describe the same work.
+
+    Args:
+        ids (List[int]): The IDs of the records, in ascending order.
+        titles (List[str]): The titles of the records, in the same order.
+        similarity (float): The lowest Jaccard similarity of the pairs
+        that joined the group.
+    """
+
+    ids: List[int]
+    titles: List[str]
+    similarity: float
+
+
+def duplicates_file(data_file: str) -> str:
+    """
+    Returns the file of the duplicate groups of a data file.
+
+    Args:
+        data_file (str): The data file, e.g. data/novels_data.json.
+
+    Returns:
+        str: The file next to it, e.g. data/novels_data.duplicates.json.
+    """
+    root, extension = os.path.splitext(data_file)
+    return f"{root}.duplicates{extension}"
+
+
+def normalize(text: str) -> str:
+    """
+    Normalizes text for shingling: Unicode compatibility forms, no accents,
+    case folded, and punctuation replaced by single spaces.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text
+                       if not unicodedata.combining(char))
+    return NON_WORD.sub(" ", text.casefold()).strip()
+
+
+def shingles(record: Dict[str, Any]) -> FrozenSet[str]:
+    """
+    Returns the shingles of a record: character 4-grams of the title,
+    which absorb small spelling differences, and word 3-grams of the
+    synopsis. Fields that were not found contribute nothing.
+
+    Args:
+        record (Dict[str, Any]): The record of a novel.
+
+    Returns:
+        FrozenSet[str]: The shingles, prefixed with the field.
+    """
+    result = set()
+    title = record.get("title") or ""
+    title = normalize(title) if title != "Not found" else ""
+    if title:
+        result.update("t:" + title[i:i + TITLE_SHINGLE] for i in
+                      range(max(1, len(title) - TITLE_SHINGLE + 1)))
+
+    synopsis = record.get("synopsis") or ""
+    words = normalize(synopsis).split() if synopsis != "Not found" else []
+    if words:
+        result.update("s:" + " ".join(words[i:i + SYNOPSIS_SHINGLE]) for i in
+                      range(max(1, len(words) - SYNOPSIS_SHINGLE + 1)))
+    return frozenset(result)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Returns the Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets.
+
+    Instead of permuting one hash of every shingle many times in Python,
+    every shingle is hashed once with SHAKE-128, whose output is cut into
+    one independent 64-bit hash per signature value. The minimums are
+    then taken column by column, so the whole signature is computed by C
+    code. The hashes are not salted, so signatures are stable across runs
+    and processes.
+    """
+
+    def __init__(self, size: int = DEFAULT_BANDS * DEFAULT_ROWS) -> None:
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        self._unpack = struct.Struct(f"<{size}Q").unpack
+
+    def signature(self, shingle_set: FrozenSet[str]) -> Tuple[int, ...]:
+        """
+        Returns the MinHash signature of a non-empty shingle set.
+
+        Args:
+            shingle_set (FrozenSet[str]): The shingles of a record.
+
+        Returns:
+            Tuple[int, ...]: size minimums, one per hash function.
+        """
+        hashes = [self._unpack(hashlib.shake_128(
+            shingle.encode("utf-8")).digest(self.size * 8))
+            for shingle in shingle_set]
+        return tuple(map(min, zip(*hashes)))
+
+
+def candidate_pairs(signatures: Sequence[Tuple[int, ...]], bands: int,
+                    rows: int) -> List[Tuple[int, int]]:
+    """
+    Finds the pairs of signatures that agree on at least one band.
+
+    Args:
+        signatures (Sequence[Tuple[int, ...]]): The signatures, each with
+        at least bands * rows values.
+        bands (int): The number of bands.
+        rows (int): The number of values per band.
+
+    Returns:
+        List[Tuple[int, int]]: The pairs of signature indexes, lower index
+        first, without repetitions.
+    """
+    pairs = set()
+    for band in range(bands):
+        buckets: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+        for index, signature in enumerate(signatures):
+            buckets[signature[band * rows:(band + 1) * rows]].append(index)
+        for bucket in buckets.values():
+            for i, first in enumerate(bucket):
+                for second in bucket[i + 1:]:
+                    pairs.add((first, second))
+    return sorted(pairs)
+
+
+def find_duplicates(records: List[Dict[str, Any]],
+                    threshold: float = DEFAULT_THRESHOLD,
+                    bands: int = DEFAULT_BANDS,
+                    rows: int = DEFAULT_ROWS) -> List[DuplicateGroup]:
+    """
+    Groups the records whose titles and synopses are nearly the same.
+
+    Candidate pairs come from LSH banding of MinHash signatures; a pair is
+    kept if the exact Jaccard similarity of its shingles reaches the
+    threshold. Pairs that share a record are joined into one group.
+
+    Args:
+        records (List[Dict[str, Any]]): The records of the crawl output.
+        threshold (float): The minimum Jaccard similarity of duplicates.
+        bands (int): The number of LSH bands.
+        rows (int): The number of signature values per band.
+
+    Returns:
+        List[DuplicateGroup]: The groups of two or more records, ordered by
+        their lowest ID.
+
+    Raises:
+        ValueError: If threshold is not in (0, 1] or bands or rows is not
+        positive.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    if bands < 1 or rows < 1:
+        raise ValueError("bands and rows must be positive")
+
+    hasher = MinHasher(bands * rows)
+    indexed = [(record, shingle_set) for record in records
+               for shingle_set in (shingles(record),) if shingle_set]
+    signatures = [hasher.signature(shingle_set)
+                  for _, shingle_set in indexed]
+
+    parent = list(range(len(indexed)))
+
+    def root(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    matches = []
+    candidates = candidate_pairs(signatures, bands, rows)
+    for first, second in candidates:
+        similarity = jaccard(indexed[first][1], indexed[second][1])
+        if similarity >= threshold:
+            matches.append((first, similarity))
+            parent[root(first)] = root(second)
+
+    similarities: Dict[int, float] = {}
+    for index, similarity in matches:
+        group_root = root(index)
+        similarities[group_root] = min(
+            similarity, similarities.get(group_root, 1.0))
+
+    members: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for index, (record, _) in enumerate(indexed):
+        members[root(index)].append(record)
+
+    groups = []
+    for group_root, group in members.items():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda record: record["id"])
+        groups.append(DuplicateGroup(
+            [record["id"] for record in group],
+            [record["title"] for record in group],
+            round(similarities[group_root], 3)))
+    groups.sort(key=lambda group: group.ids[0])
+
+    logging.info("[INFO] - Found %s duplicate groups among %s records "
+                 "(%s candidate pairs)", len(groups), len(records),
+                 len(candidates))
+    return groups
+
+
+def write_duplicates(records: List[Dict[str, Any]], file_name: str,
+                     threshold: float = DEFAULT_THRESHOLD,
+                     bands: int = DEFAULT_BANDS,
+                     rows: int = DEFAULT_ROWS) -> List[DuplicateGroup]:
+    """
+    Finds the duplicate groups of the records and saves them as a JSON
+    array of objects with "ids", "titles" and "similarity".
+
+    Args:
+        records (List[Dict[str, Any]]): The records of the crawl output.
+        file_name (str): The file of the duplicate groups.
+        threshold (float): The minimum Jaccard similarity of duplicates.
+        bands (int): The number of LSH bands.
+        rows (int): The number of signature values per band.
+
+    Returns:
+        List[DuplicateGroup]: The duplicate groups.
+    """
+    groups = find_duplicates(records, threshold, bands, rows)
+    write_json_array((asdict(group) for group in groups), file_name,
+                     pretty=True)
+    logging.info("[INFO] - Saved the duplicate groups to %s", file_name)
+    return groups
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, Set
+
+from utils.json_utils import read_json, write_json
+from utils.url_utils import canonicalize_url
+
+# IDs stay below 2**31, so they fit the int32 columns of other tools and
+# are exact numbers in JavaScript
+ID_SPACE = (1 << 31) - 1
+
+
+def derive_id(url: str, attempt: int = 0) -> int:
+    """
+    Derives the ID of a novel from its canonical URL.
+
+    Args:
+        url (str): The canonical URL of the novel.
+        attempt (int): Incremented to derive another ID when the previous
+        one is used by another URL.
+
+    Returns:
+        int: An ID from 1 to ID_SPACE.
+    """
+    key = url if not attempt else f"{url}#{attempt}"
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % ID_SPACE + 1
+
+
+class NovelIds:
+    """
+    Gives every novel an ID that does not change between runs.
+
+    A novel seen for the first time gets an ID derived from its canonical
+    URL, so it does not depend on the order in which novels are listed or
+    processed. The assigned IDs are saved to ids_file and reused by later
+    runs, so an ID never changes once assigned, also if a later novel's
+    URL derives the same ID and has to use another one.
+
+    If ids_file does not exist yet, the IDs of the records in data_file
+    are adopted, so the IDs of an existing output are kept. NovelIds are
+    thread-safe.
+    """
+
+    def __init__(self, ids_file: Optional[str] = None,
+                 data_file: Optional[str] = None) -> None:
+        self.ids_file = ids_file
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._taken: Set[int] = set()
+        self._changed = False
+
+        if ids_file and os.path.exists(ids_file):
+            for url, novel_id in read_json(ids_file).items():
+                self._ids[url] = novel_id
+                self._taken.add(novel_id)
+            logging.info("[INFO] - Loaded %s novel IDs from %s",
+                         len(self._ids), ids_file)
+        elif data_file and os.path.exists(data_file):
+            adopted = self.adopt(read_json(data_file))
+            logging.info("[INFO] - Adopted %s novel IDs from %s", adopted,
+                         data_file)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def adopt(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Keeps the IDs of existing records.
+
+        Records whose URL already has an ID, or whose ID is used by another
+        URL, are skipped.
+
+        Args:
+            records (Iterable[Dict[str, Any]]): Records with "id" and "url".
+
+        Returns:
+            int: The number of adopted IDs.
+        """
+        adopted = 0
+        with self._lock:
+            for record in records:
+                url = canonicalize_url(record["url"])
+                if url in self._ids or record["id"] in self._taken:
+                    continue
+                self._ids[url] = record["id"]
+                self._taken.add(record["id"])
+                adopted += 1
+            self._changed = self._changed or adopted > 0
+        return adopted
+
+    def id_for(self, url: str) -> int:
+        """
+        Returns the ID of a novel, assigning one if it has none yet.
+
+        Args:
+            url (str): The URL of the novel.
+
+        Returns:
+            int: The ID of the novel.
+        """
+        url = canonicalize_url(url)
+        with self._lock:
+            novel_id = self._ids.get(url)
+            if novel_id is not None:
+                return novel_id
+
+            attempt = 0
+            novel_id = derive_id(url)
+            while novel_id in self._taken:
+                attempt += 1
+                novel_id = derive_id(url, attempt)
+            if attempt:
+                logging.warning("[WARNING] - The ID of %s is used by another "
+                                "novel, assigned %s instead", url, novel_id)
+            self._ids[url] = novel_id
+            self._taken.add(novel_id)
+            self._changed = True
+            return novel_id
+
+    def save(self) -> None:
+        """Writes the IDs to ids_file if new ones were assigned."""
+        if not self.ids_file or not self._changed:
+            return
+        with self._lock:
+            ids = dict(sorted(self._ids.items()))
+            self._changed = False
+        try:
+            write_json(ids, self.ids_file, pretty=True)
+            logging.info("[INFO] - Saved %s novel IDs to %s", len(ids),
+                         self.ids_file)
+        except IOError as e:
+            logging.error("[ERROR] - Error writing to file %s: %s",
+                          self.ids_file, e)
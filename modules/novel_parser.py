@@ -1,35 +1,74 @@
-import json
 import logging
 import os
 import random
+import threading
 from time import sleep
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
 
-from utils.novel_utils import (download_novel_image, get_novel_genres,
-                               get_novel_image_url, get_novel_status,
-                               get_novel_synopsis, get_novel_title,
-                               get_number_of_volumes)
+from modules.frontier import Frontier
+from modules.html_archive import ArchiveReader, ArchiveWriter, index_path
+from modules.novel_ids import NovelIds
+from modules.pipeline import Pipeline, Stage
+from modules.profiling import PROFILER
+from utils.html_utils import declared_encoding, parse_html
+from utils.http_utils import HttpResponse, hedged_call, http_get
+from utils.json_utils import read_json, write_json, write_json_array
+from utils.metrics import (BYTES_RECEIVED, BYTES_WRITTEN, QUEUE_DEPTH,
+                           REQUESTS, host_of, track_stage)
+from utils.novel_utils import (build_novel_record, download_novel_image,
+                               extract_novel_data)
 from utils.url_utils import (extract_filename_from_url, sanitize_filename,
                              url_exists)
 
+# Default number of workers for every stage of the crawl pipeline
+DEFAULT_WORKERS = {"fetch": 2, "parse": 1, "media": 2, "sink": 1}
 
-def get_all_novels(website_base_url: str, novel_base_url: str,
-                   file_name: str) -> None:
+
+def save_json(data: Any, file_name: str, description: str) -> None:
     """
-    Fetches all novel URLs from the website and saves them to a JSON file.
+    Saves data to a JSON file and logs the result.
+
+    Lists are encoded one item at a time. The file is replaced atomically.
+
+    Args:
+        data (Any): The data to save.
+        file_name (str): The name of the file.
+        description (str): What was saved, used in the log message.
+    """
+    try:
+        with track_stage("write"), PROFILER.stage("sink"):
+            if isinstance(data, list):
+                write_json_array(data, file_name)
+            else:
+                write_json(data, file_name)
+            logging.info("[INFO] - Saved %s to %s", description, file_name)
+    except IOError as e:
+        logging.error("[ERROR] - Error writing to file %s: %s", file_name, e)
+
+
+def iter_novels(website_base_url: str, novel_base_url: str,
+                frontier: Optional[Frontier] = None
+                ) -> Iterator[Tuple[str, str]]:
+    """
+    Walks the index pages of the website and yields every novel found.
+
+    Every novel is yielded once, under its canonical URL and a key that
+    no other novel uses.
 
     Args:
         website_base_url (str): The base URL of the website.
         novel_base_url (str): The base URL for novels.
-        file_name (str): The name of the file where the collected URLs
-        will be saved.
-    """
-    logging.info("[INFO] - (1) Getting novels...")
+        frontier (Optional[Frontier]): The frontier that deduplicates the
+        novels, a new one by default.
 
+    Yields:
+        Tuple[str, str]: The sanitized title and the URL of a novel.
+    """
+    if frontier is None:
+        frontier = Frontier()
     index = 1
-    all_novels_dict = {}
 
     while True:
         # Construct URL for the current index page
@@ -40,150 +79,345 @@ def get_all_novels(website_base_url: str, novel_base_url: str,
             novels_url = f"{website_base_url}index{index}.html"
 
         if not url_exists(novels_url):
-            logging.warning(f"[WARNING] - URL does not exist: {novels_url}")
+            logging.warning("[WARNING] - URL does not exist: %s", novels_url)
             break
 
         try:
-            logging.info(f"[INFO] - {index}: Fetching URL: {novels_url}")
-            response = requests.get(novels_url)
+            logging.info("[INFO] - %s: Fetching URL: %s", index, novels_url)
+            response = fetch_page(novels_url)
             page_content = response.content
-            soup = BeautifulSoup(page_content, "lxml")
-            novel_titles = soup.find_all("h2")
-            novel_links = soup.find_all("a", class_="link-a")
+            with track_stage("parse", novels_url), \
+                    PROFILER.stage("discovery"):
+                soup = parse_html(novels_url, page_content,
+                                  declared_encoding(
+                                      response.headers.get("Content-Type")))
+                novel_titles = soup.find_all("h2")
+                novel_links = soup.find_all("a", class_="link-a")
 
             # Ensure number of titles matches number of links
             if len(novel_links) != len(novel_titles):
                 logging.warning(
-                    f"[WARNING] - Number of links({len(novel_links)}) and titles({len(novel_titles)}) mismatch")
+                    "[WARNING] - Number of links(%s) and titles(%s) mismatch",
+                    len(novel_links), len(novel_titles))
 
             for novel_title, novel_link in zip(novel_titles, novel_links):
                 novel_url = novel_link.get("href")
                 filename = extract_filename_from_url(novel_url)
-                novel_url = novel_base_url + filename
-                sanitized_title = sanitize_filename(filename)
-
-                all_novels_dict[sanitized_title] = novel_url
-                logging.info(f"[INFO] - Added novel: {novel_title.text.strip()}")
+                admitted = frontier.admit(novel_base_url + filename,
+                                          sanitize_filename(filename))
+                if admitted is None:
+                    continue
+                novel_url, sanitized_title = admitted
+
+                logging.info("[INFO] - Added novel: %s",
+                             novel_title.text.strip())
+                yield sanitized_title, novel_url
         except requests.RequestException as e:
-            logging.error(f"[ERROR] - Error fetching URL {novels_url}: {e}")
+            logging.error("[ERROR] - Error fetching URL %s: %s", novels_url, e)
 
         sleep(random.randrange(1, 2))
         index += 1
 
+
+def get_all_novels(website_base_url: str, novel_base_url: str,
+                   file_name: str) -> None:
+    """
+    Fetches all novel URLs from the website and saves them to a JSON file.
+
+    Args:
+        website_base_url (str): The base URL of the website.
+        novel_base_url (str): The base URL for novels.
+        file_name (str): The name of the file where the collected URLs
+        will be saved.
+    """
+    logging.info("[INFO] - (1) Getting novels...")
+
+    all_novels_dict = dict(iter_novels(website_base_url, novel_base_url))
+
     # Save collected URLs to a JSON file
+    save_json(all_novels_dict, file_name, "all novels")
+
+
+def fetch_page(url: str) -> HttpResponse:
+    """
+    Fetches a page with a GET request and records its request metrics.
+
+    The request uses the configured timeouts and is hedged if hedging is
+    enabled and the page is slow.
+
+    Args:
+        url (str): The URL of the page.
+
+    Returns:
+        HttpResponse: The response of the request.
+
+    Raises:
+        requests.RequestException: If the request fails.
+    """
+    with track_stage("page", url):
+        response = hedged_call("page", host_of(url), lambda: http_get(url))
+    REQUESTS.inc(method="GET", host=host_of(url),
+                 status=str(response.status_code))
+    BYTES_RECEIVED.inc(len(response.content), host=host_of(url))
+    return response
+
+
+def archive_page(archive: ArchiveWriter, sanitized_title: str,
+                 content: bytes) -> None:
+    """
+    Saves the HTML content of a novel page to the archive.
+
+    Args:
+        archive (ArchiveWriter): The archive the pages are saved to.
+        sanitized_title (str): The sanitized title used as the key.
+        content (bytes): The HTML content of the page.
+    """
     try:
-        with open(file_name, "w") as file:
-            json.dump(all_novels_dict, file, indent=4, ensure_ascii=False)
-            logging.info(f"[INFO] - Saved all novels to {file_name}")
+        with track_stage("write"):
+            archive.add(sanitized_title, content)
+        BYTES_WRITTEN.inc(len(content), stage="html")
     except IOError as e:
-        logging.error(f"[ERROR] - Error writing to file {file_name}: {e}")
+        logging.error("[ERROR] - Error writing to file %s: %s",
+                      archive.archive_file, e)
 
 
-def download_novel_html_files(file_name: str, directory: str) -> None:
+def download_novel_html_files(file_name: str, archive_file: str) -> None:
     """
     Downloads the HTML files for each novel URL and saves them
-    to a specified directory.
+    to the HTML archive.
 
     Args:
         file_name (str): The name of the JSON file containing the novel URLs.
-        directory (str): The directory where the HTML files will be saved.
+        archive_file (str): The archive where the HTML files will be saved.
     """
-    logging.info(f"[INFO] - (2) Downloading novel HTML files to {directory}...")
+    logging.info("[INFO] - (2) Downloading novel HTML files to %s...",
+                 archive_file)
 
-    with open(file_name, "r") as file:
-        all_novels = json.load(file)
+    all_novels = read_json(file_name)
 
     count = 0
-    for novel_title, novel_url in all_novels.items():
-        if not url_exists(novel_url):
-            logging.warning(
-                f"[WARNING] - URL does not exist: {novel_url}. Title: {novel_title}")
-            continue
-
-        try:
-            response = requests.get(novel_url)
-            page_text = response.text
-            file_name = os.path.join(directory, f"{novel_title}.html")
+    remaining = len(all_novels)
+    with ArchiveWriter(archive_file) as archive:
+        for novel_title, novel_url in all_novels.items():
+            QUEUE_DEPTH.set(remaining, queue="html_downloads")
+            remaining -= 1
+            if not url_exists(novel_url):
+                logging.warning(
+                    "[WARNING] - URL does not exist: %s. Title: %s",
+                    novel_url, novel_title)
+                continue
 
-            # Save the HTML content to a file
             try:
-                with open(file_name, "w") as html_file:
-                    html_file.write(page_text)
-            except IOError as e:
-                logging.error(f"[ERROR] - Error writing to file {file_name}: {e}")
-            count += 1
-            logging.info(f"[INFO] - {count}: Downloaded {novel_title}")
-            sleep(random.randrange(1, 2))
-        except requests.RequestException as e:
-            logging.error(f"[ERROR] - Error downloading URL {novel_url}: {e}")
+                response = fetch_page(novel_url)
+                archive_page(archive, novel_title, response.content)
+                count += 1
+                logging.info("[INFO] - %s: Downloaded %s", count, novel_title)
+                sleep(random.randrange(1, 2))
+            except requests.RequestException as e:
+                logging.error("[ERROR] - Error downloading URL %s: %s",
+                              novel_url, e)
+    QUEUE_DEPTH.set(0, queue="html_downloads")
+
+
+def import_html_files(html_files_dir: str, archive_file: str) -> None:
+    """
+    Moves the HTML files of an older run from a directory into the archive.
+
+    Args:
+        html_files_dir (str): The directory containing the HTML files.
+        archive_file (str): The archive the files are added to.
+    """
+    logging.info("[INFO] - Importing HTML files from %s into %s...",
+                 html_files_dir, archive_file)
+
+    count = 0
+    with ArchiveWriter(archive_file) as archive:
+        for file_name in sorted(os.listdir(html_files_dir)):
+            if file_name.endswith(".html"):
+                file_path = os.path.join(html_files_dir, file_name)
+                with open(file_path, "rb") as file:
+                    archive.add(file_name.rsplit(".", 1)[0], file.read())
+                count += 1
+
+    logging.info("[INFO] - Imported %s HTML files", count)
 
 
-def get_data_from_html_files(novel_base_url: str, html_files_dir: str,
+def get_data_from_html_files(novel_base_url: str, archive_file: str,
                              media_dir: str, all_novels_file: str,
-                             data_file: str) -> None:
+                             data_file: str,
+                             ids: Optional[NovelIds] = None) -> None:
     """
-    Extracts data from the downloaded HTML files and saves it to a JSON file.
+    Extracts data from the archived HTML files and saves it to a JSON file.
 
     Args:
         novel_base_url (str): The base URL for novels.
-        html_files_dir (str): The directory containing the
+        archive_file (str): The archive containing the
         downloaded HTML files.
         media_dir (str): The directory where media files will be saved.
         all_novels_file (str): The JSON file containing all novel URLs.
         data_file (str): The file where the extracted data will be saved.
+        ids (Optional[NovelIds]): The IDs of the novels, a new table by
+        default.
     """
-    logging.info(f"[INFO] - (3) Extracting data from HTML files in {html_files_dir}...")
+    logging.info("[INFO] - (3) Extracting data from HTML files in %s...",
+                 archive_file)
 
-    with open(all_novels_file, "r", encoding="utf-8") as json_file:
-        all_novels = json.load(json_file)
+    all_novels = read_json(all_novels_file)
+    if ids is None:
+        ids = NovelIds()
 
     data_dict = []
     count = 0
-    for file_name in os.listdir(html_files_dir):
-        if file_name.endswith(".html"):
-            file_path = os.path.join(html_files_dir, file_name)
-            sanitized_title = file_name.rsplit(".", 1)[0]
+    with ArchiveReader(archive_file) as archive:
+        for sanitized_title, page_content in archive.iter_pages():
             novel_url = all_novels.get(sanitized_title, "URL not found")
             if novel_url == "URL not found":
                 logging.warning(
-                    f"[WARNING] - URL wasn't found for title: {sanitized_title}")
+                    "[WARNING] - URL wasn't found for title: %s",
+                    sanitized_title)
 
-            with open(file_path, "r", encoding="utf-8") as file:
-                page_content = file.read()
-                soup = BeautifulSoup(page_content, "lxml")
+            with PROFILER.stage("parse"):
+                novel = extract_novel_data(novel_url, page_content)
+            with PROFILER.stage("media"):
+                novel["image"] = download_novel_image(
+                    novel_base_url, novel["image_url"], media_dir,
+                    sanitized_title)
+            novel["url"] = novel_url
 
-                # Extract novel details using helper functions
-                novel_title = get_novel_title(novel_url, soup)
-                novel_image_url = get_novel_image_url(novel_url, soup)
-                novel_status = get_novel_status(novel_url, soup)
-                novel_synopsis = get_novel_synopsis(novel_url, soup)
-                novel_genres = get_novel_genres(novel_url, soup)
-                novel_num_volumes = get_number_of_volumes(novel_url, soup)
+            count += 1
+            # Pages without a known URL are told apart by their key
+            novel_id = ids.id_for(sanitized_title
+                                  if novel_url == "URL not found"
+                                  else novel_url)
+            data_dict.append(build_novel_record(novel_id, novel))
 
-                image_path = download_novel_image(
-                    novel_base_url, novel_image_url, media_dir, sanitized_title)
+            logging.info("[INFO] - %s. Processed %s", count, novel["title"])
+            sleep(random.randrange(1, 2))
 
-                count += 1
-                # Collect data in a dictionary
-                data = {
-                    "id": count,
-                    "title": novel_title,
-                    "status": novel_status,
-                    "synopsis": novel_synopsis,
-                    "genres": novel_genres,
-                    "num_volumes": novel_num_volumes,
-                    "image": image_path,
-                    "url": novel_url
-                }
-                data_dict.append(data)
-
-                logging.info(f"[INFO] - {count}. Processed {novel_title}")
-                sleep(random.randrange(1, 2))
+    PROFILER.snapshot("parse")
+    ids.save()
 
     # Save extracted data to a JSON file
-    try:
-        with open(data_file, "w") as json_file:
-            json.dump(data_dict, json_file, indent=4, ensure_ascii=False)
-            logging.info(f"[INFO] - Saved extracted data to {data_file}")
-    except IOError as e:
-        logging.error(f"[ERROR] - Error writing to file {data_file}: {e}")
+    data_dict.sort(key=lambda record: record["id"])
+    save_json(data_dict, data_file, "extracted data")
+
+
+def crawl_novels(website_base_url: str, novel_base_url: str,
+                 archive_file: str, media_dir: str, all_novels_file: str,
+                 data_file: str,
+                 workers: Optional[Dict[str, int]] = None,
+                 frontier: Optional[Frontier] = None,
+                 ids: Optional[NovelIds] = None) -> None:
+    """
+    Crawls the website with a staged pipeline and saves the novel data.
+
+    Discovery, page fetch, parse, media and sink run concurrently on
+    worker threads joined by bounded queues, so pages are parsed and
+    images downloaded while the index pages are still being walked.
+    The pages are kept in the HTML archive for reparsing. Pages the
+    frontier has seen in an earlier run are read from the archive instead
+    of being fetched again. The records are saved in the order of their
+    IDs, which do not depend on the order the novels were processed in.
+
+    Args:
+        website_base_url (str): The base URL of the website.
+        novel_base_url (str): The base URL for novels.
+        archive_file (str): The archive where the HTML files are saved.
+        media_dir (str): The directory where media files will be saved.
+        all_novels_file (str): The JSON file where the novel URLs are saved.
+        data_file (str): The file where the extracted data will be saved.
+        workers (Optional[Dict[str, int]]): The number of workers of each
+        stage, overriding DEFAULT_WORKERS.
+        frontier (Optional[Frontier]): The frontier that deduplicates the
+        novels and keeps the seen-set, a new one by default.
+        ids (Optional[NovelIds]): The IDs of the novels, a new table by
+        default.
+    """
+    logging.info("[INFO] - Crawling novels...")
+
+    workers = {**DEFAULT_WORKERS, **(workers or {})}
+    if frontier is None:
+        frontier = Frontier()
+    if ids is None:
+        ids = NovelIds()
+    all_novels_dict: Dict[str, str] = {}
+    data_dict: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def discover() -> Iterator[Dict[str, Any]]:
+        for sanitized_title, novel_url in iter_novels(
+                website_base_url, novel_base_url, frontier):
+            all_novels_dict[sanitized_title] = novel_url
+            yield {"sanitized_title": sanitized_title, "url": novel_url}
+
+    def fetch(novel: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if stored is not None and frontier.seen(novel["url"]):
+            page_content = stored.get(novel["sanitized_title"])
+            if page_content is not None:
+                logging.info("[INFO] - Reading stored page of %s",
+                             novel["url"])
+                novel["page_content"] = page_content
+                novel["encoding"] = None
+                return novel
+
+        if not url_exists(novel["url"]):
+            logging.warning("[WARNING] - URL does not exist: %s. Title: %s",
+                            novel["url"], novel["sanitized_title"])
+            return None
+
+        try:
+            response = fetch_page(novel["url"])
+        except requests.RequestException as e:
+            logging.error("[ERROR] - Error downloading URL %s: %s",
+                          novel["url"], e)
+            return None
+
+        archive_page(archive, novel["sanitized_title"], response.content)
+        frontier.mark_stored(novel["url"])
+        novel["page_content"] = response.content
+        novel["encoding"] = declared_encoding(
+            response.headers.get("Content-Type"))
+        sleep(random.randrange(1, 2))
+        return novel
+
+    def parse(novel: Dict[str, Any]) -> Dict[str, Any]:
+        novel.update(extract_novel_data(novel["url"],
+                                        novel.pop("page_content"),
+                                        novel.pop("encoding")))
+        return novel
+
+    def media(novel: Dict[str, Any]) -> Dict[str, Any]:
+        novel["image"] = download_novel_image(
+            novel_base_url, novel["image_url"], media_dir,
+            novel["sanitized_title"])
+        return novel
+
+    def sink(novel: Dict[str, Any]) -> None:
+        record = build_novel_record(ids.id_for(novel["url"]), novel)
+        with lock:
+            data_dict.append(record)
+        logging.info("[INFO] - %s. Processed %s", record["id"],
+                     record["title"])
+
+    pipeline = Pipeline(discover(), [
+        Stage("fetch", fetch, workers=workers["fetch"]),
+        Stage("parse", parse, workers=workers["parse"]),
+        Stage("media", media, workers=workers["media"]),
+        Stage("sink", sink, workers=workers["sink"]),
+    ])
+    with ArchiveWriter(archive_file) as archive:
+        stored = None
+        if os.path.exists(index_path(archive_file)):
+            stored = ArchiveReader(archive_file)
+        try:
+            pipeline.run_threaded()
+        finally:
+            if stored is not None:
+                stored.close()
+    frontier.save()
+    ids.save()
+    PROFILER.snapshot("pipeline")
+
+    save_json(all_novels_dict, all_novels_file, "all novels")
+    data_dict.sort(key=lambda record: record["id"])
+    save_json(data_dict, data_file, "extracted data")
@@ -0,0 +1,240 @@
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import (Any, AsyncIterable, Callable, Dict, Iterable, List,
+                    Optional, Union)
+
+from modules.profiling import PROFILER
+from utils.metrics import QUEUE_DEPTH
+
+# Marks the end of the stream on a stage's input queue
+_DONE = object()
+
+Source = Union[Iterable[Any], AsyncIterable[Any]]
+
+
+@dataclass
+class Stage:
+    """
+    A step of the pipeline.
+
+    Args:
+        name (str): The stage name, used for the queue metrics and the
+        profiler.
+        func (Callable[[Any], Any]): Called with every input item. It
+        returns the item passed to the next stage, or None to drop it.
+        In the async runner it may be a coroutine function.
+        workers (int): The number of concurrent workers.
+        queue_size (int): The capacity of the input queue. A full queue
+        blocks the previous stage, which applies backpressure.
+        fan_out (bool): Whether func returns an iterable of items that
+        are passed on one by one.
+        blocking (bool): Whether the async runner should call a regular
+        func in a worker thread instead of on the event loop.
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 100
+    fan_out: bool = False
+    blocking: bool = False
+
+
+def _outputs(stage: Stage, result: Any) -> List[Any]:
+    if result is None:
+        return []
+    if stage.fan_out:
+        return [item for item in result if item is not None]
+    return [result]
+
+
+class Pipeline:
+    """
+    Runs items from a source through stages joined by bounded queues.
+
+    Every stage has its own workers and input queue, so the stages overlap:
+    pages are parsed while other pages are still being fetched. A queue only
+    holds queue_size items, so the memory stays flat and a slow stage makes
+    the stages before it wait instead of buffering the whole crawl.
+
+    The same stages can run on the event loop (run_async) or on threads
+    (run_threaded).
+    """
+
+    def __init__(self, source: Source, stages: List[Stage]) -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.source = source
+        self.stages = stages
+
+    def _call(self, stage: Stage, item: Any) -> Any:
+        with PROFILER.stage(stage.name):
+            return stage.func(item)
+
+    async def run_async(self) -> None:
+        """Runs the pipeline on the current event loop."""
+        queues: List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages
+        ]
+
+        async def put(index: int, item: Any) -> None:
+            await queues[index].put(item)
+            QUEUE_DEPTH.set(queues[index].qsize(),
+                            queue=self.stages[index].name)
+
+        async def feed() -> None:
+            try:
+                if isinstance(self.source, AsyncIterable):
+                    async for item in self.source:
+                        await put(0, item)
+                else:
+                    for item in self.source:
+                        await put(0, item)
+            except Exception as e:
+                logging.error("[ERROR] - Pipeline source failed: %s", e)
+            # Not in a finally block: once the run is cancelled, nobody
+            # takes the markers from a full queue and the task would wait
+            # for good
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        async def work(index: int) -> None:
+            stage = self.stages[index]
+            is_coroutine = inspect.iscoroutinefunction(stage.func)
+            while True:
+                item = await queues[index].get()
+                QUEUE_DEPTH.set(queues[index].qsize(), queue=stage.name)
+                if item is _DONE:
+                    return
+
+                try:
+                    if is_coroutine:
+                        result = await stage.func(item)
+                    elif stage.blocking:
+                        result = await asyncio.to_thread(
+                            self._call, stage, item)
+                    else:
+                        result = self._call(stage, item)
+                except Exception as e:
+                    logging.error("[ERROR] - Stage %s failed: %s",
+                                  stage.name, e)
+                    continue
+
+                if index + 1 < len(self.stages):
+                    for output in _outputs(stage, result):
+                        await put(index + 1, output)
+
+        # Workers are named "<stage>-<n>", so the event loop monitor can
+        # tell which stage blocked the loop
+        async def run_stage(index: int) -> None:
+            stage = self.stages[index]
+            await asyncio.gather(*(
+                asyncio.create_task(work(index), name=f"{stage.name}-{n}")
+                for n in range(stage.workers)))
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put(_DONE)
+
+        await asyncio.gather(
+            asyncio.create_task(feed(), name="source"),
+            *(run_stage(i) for i in range(len(self.stages))))
+
+    def run_threaded(self) -> None:
+        """Runs the pipeline on threads, one per stage worker."""
+        if isinstance(self.source, AsyncIterable) or any(
+                inspect.iscoroutinefunction(stage.func)
+                for stage in self.stages):
+            raise TypeError("run_threaded() needs a regular source "
+                            "and regular stage functions")
+
+        queues: List["queue.Queue[Any]"] = [
+            queue.Queue(maxsize=stage.queue_size) for stage in self.stages
+        ]
+
+        def put(index: int, item: Any) -> None:
+            queues[index].put(item)
+            QUEUE_DEPTH.set(queues[index].qsize(),
+                            queue=self.stages[index].name)
+
+        def feed() -> None:
+            try:
+                for item in self.source:  # type: ignore[union-attr]
+                    put(0, item)
+            except Exception as e:
+                logging.error("[ERROR] - Pipeline source failed: %s", e)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_DONE)
+
+        def work(index: int) -> None:
+            stage = self.stages[index]
+            while True:
+                item = queues[index].get()
+                QUEUE_DEPTH.set(queues[index].qsize(), queue=stage.name)
+                if item is _DONE:
+                    return
+
+                try:
+                    result = self._call(stage, item)
+                except Exception as e:
+                    logging.error("[ERROR] - Stage %s failed: %s",
+                                  stage.name, e)
+                    continue
+
+                if index + 1 < len(self.stages):
+                    for output in _outputs(stage, result):
+                        put(index + 1, output)
+
+        feeder = threading.Thread(target=feed, name="pipeline-source",
+                                  daemon=True)
+        feeder.start()
+        threads: List[List[threading.Thread]] = []
+        for index, stage in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=work, args=(index,),
+                                 name=f"pipeline-{stage.name}-{n}",
+                                 daemon=True)
+                for n in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        # A stage is finished once all its workers have seen the end marker
+        feeder.join()
+        for index, stage_threads in enumerate(threads):
+            for thread in stage_threads:
+                thread.join()
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    queues[index + 1].put(_DONE)
+
+
+def parse_workers(spec: Optional[str]) -> Dict[str, int]:
+    """
+    Parses a worker count specification such as "fetch=8,media=4".
+
+    Args:
+        spec (Optional[str]): Comma separated stage=count pairs.
+
+    Returns:
+        Dict[str, int]: The worker counts keyed by stage name.
+
+    Raises:
+        ValueError: If a pair is malformed or a count is not positive.
+    """
+    workers: Dict[str, int] = {}
+    if not spec:
+        return workers
+
+    for pair in spec.split(","):
+        name, _, count = pair.partition("=")
+        if not name.strip() or not count.strip().isdigit() or \
+                int(count) < 1:
+            raise ValueError(f"Invalid worker count: {pair!r}")
+        workers[name.strip()] = int(count)
+    return workers
@@ -0,0 +1,196 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Profiler:
+    """
+    Collects per-stage cProfile statistics and tracemalloc snapshots.
+
+    Stages nest: entering a stage pauses the profile of the enclosing
+    stage, so every function call is attributed to exactly one stage.
+    Stacks are kept per thread, which lets worker threads profile their
+    own stages. In the async engine only blocks that do not await should
+    be wrapped in a stage, since other tasks run while a coroutine awaits;
+    the time spent in the event loop and in network I/O is attributed to
+    the enclosing "run" stage.
+    """
+
+    def __init__(self, top: int = 15) -> None:
+        self.enabled = False
+        self.top = top
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._wall_times: Dict[str, float] = {}
+        self._entries: Dict[str, int] = {}
+        self._snapshots: List[Tuple[str, tracemalloc.Snapshot]] = []
+
+    def enable(self) -> None:
+        """Turns profiling on and starts tracing memory allocations."""
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self) -> List[cProfile.Profile]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _profile_for(self, name: str) -> cProfile.Profile:
+        key = (name, threading.get_ident())
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = cProfile.Profile()
+        return profile
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Profiles a block of work under the given stage name.
+
+        Args:
+            name (str): The stage name, e.g. "discovery" or "parse".
+        """
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._stack()
+        profile = self._profile_for(name)
+        if stack:
+            stack[-1].disable()
+        stack.append(profile)
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1].enable()
+            with self._lock:
+                self._wall_times[name] = (
+                    self._wall_times.get(name, 0.0) + elapsed)
+                self._entries[name] = self._entries.get(name, 0) + 1
+
+    def snapshot(self, label: str) -> None:
+        """
+        Takes a tracemalloc snapshot at a stage boundary.
+
+        Args:
+            label (str): The name of the boundary, shown in the summary.
+        """
+        if not self.enabled or not tracemalloc.is_tracing():
+            return
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with self._lock:
+            self._snapshots.append((label, snapshot))
+
+    def _stage_stats(self) -> Dict[str, pstats.Stats]:
+        with self._lock:
+            profiles = list(self._profiles.items())
+
+        stats: Dict[str, pstats.Stats] = {}
+        for (name, _), profile in profiles:
+            profile.create_stats()
+            if not profile.stats:  # type: ignore[attr-defined]
+                continue
+            if name in stats:
+                stats[name].add(profile)
+            else:
+                stats[name] = pstats.Stats(profile)
+        return stats
+
+    def summary(self) -> str:
+        """
+        Builds a readable summary of the collected data.
+
+        Returns:
+            str: The per-stage timings, the slowest functions of every
+            stage and the top allocation sites of every snapshot.
+        """
+        stage_stats = self._stage_stats()
+        out = io.StringIO()
+
+        out.write("Stage wall times\n")
+        out.write("================\n")
+        for name in sorted(self._wall_times,
+                           key=lambda n: self._wall_times[n], reverse=True):
+            out.write(f"{name:<12} {self._wall_times[name]:>10.3f}s "
+                      f"in {self._entries[name]} block(s)\n")
+
+        for name, stats in stage_stats.items():
+            out.write(f"\nStage '{name}': top {self.top} by cumulative time\n")
+            out.write("-" * 60 + "\n")
+            stats.stream = out  # type: ignore[attr-defined]
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+
+        previous: Optional[tracemalloc.Snapshot] = None
+        for label, snapshot in self._snapshots:
+            total = sum(stat.size for stat in snapshot.statistics("filename"))
+            out.write(f"\nMemory after '{label}': {total / 1024:.1f} KiB "
+                      f"traced, top {self.top} allocation sites\n")
+            out.write("-" * 60 + "\n")
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                out.write(f"{stat}\n")
+            if previous is not None:
+                out.write("\nGrowth since the previous snapshot\n")
+                for stat in snapshot.compare_to(previous,
+                                                "lineno")[:self.top]:
+                    out.write(f"{stat}\n")
+            previous = snapshot
+
+        return out.getvalue()
+
+    def save(self, directory: str = "logs") -> None:
+        """
+        Saves the combined and per-stage .pstats files and the summary.
+
+        Args:
+            directory (str): The directory the files are written to.
+        """
+        if not self.enabled:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(
+            directory, datetime.now().strftime("%Y-%m-%d_%H-%M-%S_profile"))
+
+        stage_stats = self._stage_stats()
+        combined: Optional[pstats.Stats] = None
+        for name, stats in stage_stats.items():
+            stats.dump_stats(f"{prefix}_{name}.pstats")
+            if combined is None:
+                combined = pstats.Stats(f"{prefix}_{name}.pstats")
+            else:
+                combined.add(stats)
+        if combined is not None:
+            combined.dump_stats(f"{prefix}.pstats")
+
+        try:
+            with open(f"{prefix}.txt", "w") as file:
+                file.write(self.summary())
+            logging.info("[INFO] - Saved profile to %s.pstats "
+                         "and %s.txt", prefix, prefix)
+        except IOError as e:
+            logging.error("[ERROR] - Error writing to file %s.txt: %s", prefix, e)
+
+
+PROFILER = Profiler()
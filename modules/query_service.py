@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+from utils.json_utils import dumps, read_json
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a text into lowercase word tokens."""
+    return TOKEN.findall(text.lower())
+
+
+def split_genres(genres: str) -> List[str]:
+    """Splits the genres field of a record into lowercase genres."""
+    genres_list = [genre.strip().lower() for genre in genres.split(",")]
+    return [genre for genre in genres_list
+            if genre and genre != "not found"]
+
+
+class NovelIndex:
+    """
+    In-memory indexes over the records of a crawl output.
+
+    Records are indexed by ID, genre, status and title tokens. Every
+    lookup returns IDs in ascending order, so pages are stable.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]) -> None:
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_genre: Dict[str, List[int]] = {}
+        self.by_status: Dict[str, List[int]] = {}
+        self.by_token: Dict[str, List[int]] = {}
+
+        for record in sorted(records, key=lambda r: r["id"]):
+            id = record["id"]
+            self.by_id[id] = record
+            for genre in split_genres(record.get("genres", "")):
+                self.by_genre.setdefault(genre, []).append(id)
+            status = record.get("status", "").strip().lower()
+            self.by_status.setdefault(status, []).append(id)
+            for token in set(tokenize(record.get("title", ""))):
+                self.by_token.setdefault(token, []).append(id)
+        self.ids = list(self.by_id)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def filter(self, genre: Optional[str] = None,
+               status: Optional[str] = None) -> List[int]:
+        """
+        Returns the IDs of the records with the given genre and status.
+
+        Args:
+            genre (Optional[str]): One of the genres, case-insensitive.
+            status (Optional[str]): The status, case-insensitive.
+
+        Returns:
+            List[int]: The matching IDs, or all IDs without filters.
+        """
+        matches: Optional[set] = None
+        for index, value in ((self.by_genre, genre),
+                             (self.by_status, status)):
+            if value is None:
+                continue
+            ids = set(index.get(value.strip().lower(), ()))
+            matches = ids if matches is None else matches & ids
+        if matches is None:
+            return self.ids
+        return sorted(matches)
+
+    def search(self, query: str) -> List[int]:
+        """
+        Returns the IDs of the records whose title has every word of the
+        query. The last word may be the start of a title word.
+
+        Args:
+            query (str): The search text.
+
+        Returns:
+            List[int]: The matching IDs.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        matches: Optional[set] = None
+        for position, token in enumerate(tokens):
+            if position == len(tokens) - 1:
+                ids = {id for word, word_ids in self.by_token.items()
+                       if word.startswith(token) for id in word_ids}
+            else:
+                ids = set(self.by_token.get(token, ()))
+            matches = ids if matches is None else matches & ids
+        return sorted(matches or ())
+
+
+def load_index(data_file: str) -> NovelIndex:
+    """
+    Loads a crawl output into a new index.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not valid JSON.
+    """
+    return NovelIndex(read_json(data_file))
+
+
+class ResponseCache:
+    """A least recently used cache of rendered response bodies."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._entries: "OrderedDict[Tuple[Any, ...], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: Tuple[Any, ...], body: bytes) -> None:
+        if self.size < 1:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class QueryService:
+    """
+    Serves a crawl output from memory over HTTP.
+
+    The data file is checked every reload_interval seconds. A new output
+    is loaded in a worker thread and swapped in once it is complete, so
+    requests never wait for a reload and never see a partial index. An
+    output that fails to load, e.g. while it is still being written, is
+    retried at the next check and the previous index stays in use.
+    """
+
+    def __init__(self, data_file: str, cache_size: int = 256,
+                 reload_interval: float = 2.0) -> None:
+        self.data_file = data_file
+        self.reload_interval = reload_interval
+        self.cache = ResponseCache(cache_size)
+        self.index = NovelIndex([])
+        self._loaded_version: Optional[Tuple[int, int]] = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    async def reload_if_changed(self) -> bool:
+        """
+        Loads the data file if it changed since the last load.
+
+        Returns:
+            bool: Whether a new index was swapped in.
+        """
+        try:
+            stat = os.stat(self.data_file)
+        except OSError:
+            return False
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._loaded_version:
+            return False
+
+        try:
+            index = await asyncio.to_thread(load_index, self.data_file)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning("[WARNING] - Could not load %s: %s",
+                            self.data_file, e)
+            return False
+
+        self.index = index
+        self.cache.clear()
+        self._loaded_version = version
+        logging.info("[INFO] - Loaded %s novels from %s", len(index),
+                     self.data_file)
+        return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload_if_changed()
+
+    async def _start(self, app: web.Application) -> None:
+        await self.reload_if_changed()
+        self._reload_task = asyncio.create_task(self._watch())
+
+    async def _stop(self, app: web.Application) -> None:
+        if self._reload_task:
+            self._reload_task.cancel()
+
+    def _respond(self, request: web.Request, render) -> web.Response:
+        key = (request.path, tuple(sorted(request.query.items())))
+        body = self.cache.get(key)
+        if body is None:
+            body = dumps(render())
+            self.cache.put(key, body)
+        return web.Response(body=body, content_type="application/json",
+                            headers={"Access-Control-Allow-Origin": "*"})
+
+    def _page(self, request: web.Request, ids: List[int]) -> Dict[str, Any]:
+        try:
+            page = int(request.query.get("page", 1))
+            per_page = int(request.query.get("per_page", DEFAULT_PER_PAGE))
+        except ValueError:
+            raise web.HTTPBadRequest(
+                text=dumps({"error": "page and per_page must be "
+                                     "integers"}).decode("utf-8"),
+                content_type="application/json")
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+
+        start = (page - 1) * per_page
+        return {
+            "page": page,
+            "per_page": per_page,
+            "total": len(ids),
+            "results": [self.index.by_id[id]
+                        for id in ids[start:start + per_page]],
+        }
+
+    async def list_novels(self, request: web.Request) -> web.Response:
+        """GET /novels, optionally filtered by ?genre= and ?status=."""
+        return self._respond(request, lambda: self._page(
+            request, self.index.filter(request.query.get("genre"),
+                                       request.query.get("status"))))
+
+    async def get_novel(self, request: web.Request) -> web.Response:
+        """GET /novels/{id}"""
+        try:
+            record = self.index.by_id.get(int(request.match_info["id"]))
+        except ValueError:
+            record = None
+        if record is None:
+            raise web.HTTPNotFound(
+                text=dumps({"error": "novel not found"}).decode("utf-8"),
+                content_type="application/json")
+        return self._respond(request, lambda: record)
+
+    async def search_novels(self, request: web.Request) -> web.Response:
+        """GET /search?q=, matching title words."""
+        return self._respond(request, lambda: self._page(
+            request, self.index.search(request.query.get("q", ""))))
+
+    async def list_genres(self, request: web.Request) -> web.Response:
+        """GET /genres, with the number of novels of every genre."""
+        return self._respond(request, lambda: {
+            genre: len(ids)
+            for genre, ids in sorted(self.index.by_genre.items())
+        })
+
+    def create_app(self) -> web.Application:
+        """Builds the aiohttp application of the service."""
+        app = web.Application()
+        app.router.add_get("/novels", self.list_novels)
+        app.router.add_get("/novels/{id}", self.get_novel)
+        app.router.add_get("/search", self.search_novels)
+        app.router.add_get("/genres", self.list_genres)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
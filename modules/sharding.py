@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Set, Tuple
+
+from utils.json_utils import read_json, write_json_array
+
+Shard = Tuple[int, int]
+
+
+def parse_shard(spec: str) -> Shard:
+    """
+    Parses a shard specification such as "0/4".
+
+    Args:
+        spec (str): The zero-based shard index and the number of shards,
+        separated by a slash.
+
+    Returns:
+        Shard: The shard index and the number of shards.
+
+    Raises:
+        ValueError: If the specification is malformed.
+    """
+    index, _, count = spec.partition("/")
+    if not index.strip().isdigit() or not count.strip().isdigit():
+        raise ValueError(f"Invalid shard: {spec!r}, expected i/N")
+
+    shard = (int(index), int(count))
+    if shard[1] < 1 or not 0 <= shard[0] < shard[1]:
+        raise ValueError(f"Invalid shard: {spec!r}, expected 0 <= i < N")
+    return shard
+
+
+def shard_of(novel_url: str, count: int) -> int:
+    """
+    Returns the shard a novel belongs to.
+
+    The URL is hashed with BLAKE2b rather than hash(), which is salted per
+    process, so every worker on every machine agrees on the split.
+
+    Args:
+        novel_url (str): The URL of the novel.
+        count (int): The number of shards.
+
+    Returns:
+        int: The zero-based shard index.
+    """
+    digest = hashlib.blake2b(novel_url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def in_shard(novel_url: str, shard: Shard) -> bool:
+    """Returns whether a novel belongs to the given shard."""
+    return shard_of(novel_url, shard[1]) == shard[0]
+
+
+def shard_file(data_file: str, shard: Shard) -> str:
+    """
+    Returns the partial output file of a shard.
+
+    Args:
+        data_file (str): The merged data file, e.g. data/novels_data.json.
+        shard (Shard): The shard index and the number of shards.
+
+    Returns:
+        str: The partial file, e.g. data/novels_data.shard-0-of-4.json.
+    """
+    root, extension = os.path.splitext(data_file)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{extension}"
+
+
+def merge_records(partials: List[List[Dict[str, Any]]]
+                  ) -> List[Dict[str, Any]]:
+    """
+    Combines the records of several shards into one list.
+
+    The shards derive IDs from the novel URLs, so the records are sorted
+    by ID. A novel found in more than one partial output, under any
+    spelling of its URL, is kept once. If two shards gave the same ID to
+    different novels, the first novel in (ID, URL) order keeps it and the
+    others get new IDs above all others; the IDs of all other novels do
+    not change.
+
+    Args:
+        partials (List[List[Dict[str, Any]]]): The records of every shard.
+
+    Returns:
+        List[Dict[str, Any]]: The merged records, sorted by ID.
+    """
+    # Imported here, so the CLI does not load requests with this module
+    from utils.url_utils import canonicalize_url
+
+    by_url: Dict[str, Dict[str, Any]] = {}
+    for records in partials:
+        for record in records:
+            by_url.setdefault(canonicalize_url(record["url"]), record)
+
+    merged = sorted(by_url.values(), key=lambda r: (r["id"], r["url"]))
+    taken: Set[int] = set()
+    conflicts = []
+    for record in merged:
+        if record["id"] in taken:
+            conflicts.append(record)
+        taken.add(record["id"])
+
+    next_id = max(taken, default=0) + 1
+    for record in conflicts:
+        logging.warning("[WARNING] - Shards disagree on novel ID %s, "
+                        "reassigning %s to %s", record["id"], record["url"],
+                        next_id)
+        record["id"] = next_id
+        next_id += 1
+    if conflicts:
+        merged.sort(key=lambda r: r["id"])
+    return merged
+
+
+def merge_shards(data_file: str, count: int) -> List[Dict[str, Any]]:
+    """
+    Merges the partial outputs of all shards into the data file.
+
+    Args:
+        data_file (str): The merged data file.
+        count (int): The number of shards.
+
+    Returns:
+        List[Dict[str, Any]]: The merged records.
+
+    Raises:
+        FileNotFoundError: If the output of a shard is missing.
+    """
+    partials = []
+    for index in range(count):
+        file_name = shard_file(data_file, (index, count))
+        partials.append(read_json(file_name))
+        logging.info("[INFO] - Read %s records from %s",
+                     len(partials[-1]), file_name)
+
+    merged = merge_records(partials)
+    try:
+        write_json_array(merged, data_file)
+        logging.info("[INFO] - Saved %s merged records to %s",
+                     len(merged), data_file)
+    except IOError as e:
+        logging.error("[ERROR] - Error writing to file %s: %s", data_file, e)
+    return merged
@@ -0,0 +1,307 @@
+import hashlib
+import logging
+import math
+import os
+import shutil
+from dataclasses import dataclass
+from html import escape
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from utils.json_utils import atomic_file, dumps, read_json, write_json
+
+# Bump when a template changes, so every page is rendered again
+SITE_VERSION = 1
+DEFAULT_PER_PAGE = 50
+MANIFEST_FILE = ".site-manifest.json"
+STATIC_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+STYLESHEETS = ("novels.css", "novel_details.css")
+
+# The list pages are index.html, page/2.html, page/3.html, ... and every
+# novel gets novels/<id>.html. Links are relative, so the output directory
+# can be served from any path of any static host. Covers are copied to
+# media/ and the stylesheets to static/css/.
+
+LIST_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <title>{title}</title>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <link rel="stylesheet" href="{root}static/css/novels.css">
+</head>
+<body>
+  <table>
+    <thead>
+       <tr>
+          <th>Image</th>
+          <th>Title</th>
+          <th>Status</th>
+          <th>Genres</th>
+          <th>Number of Volumes</th>
+       </tr>
+    </thead>
+    <tbody id="data-output">
+{rows}
+    </tbody>
+ </table>
+ <nav class="pager">{pager}</nav>
+</body>
+</html>
+"""
+
+ROW_TEMPLATE = """        <tr>
+          <td data-label="Image">{image}</td>
+          <td data-label="Title"><a href="{root}novels/{id}.html">{title}</a></td>
+          <td data-label="Status">{status}</td>
+          <td data-label="Genres">{genres}</td>
+          <td data-label="Number of Volumes">{num_volumes}</td>
+        </tr>"""
+
+DETAIL_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <title>{title}</title>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <link rel="stylesheet" href="../static/css/novel_details.css">
+</head>
+<body>
+  <div class="novel-detail-container">
+    <div class="novel-image">
+      {image}
+    </div>
+    <div class="novel-info">
+      <h1 id="novel-title">{title}</h1>
+      <p id="novel-synopsis">{synopsis}</p>
+      <p><strong>Status:</strong> <span id="novel-status">{status}</span></p>
+      <p><strong>Genres:</strong> <span id="novel-genres">{genres}</span></p>
+      <p><strong>Number of Volumes:</strong> <span id="novel-volumes">{num_volumes}</span></p>
+      <p><strong>URL:</strong> <a id="novel-url" href="{url}" target="_blank">Visit Novel</a></p>
+    </div>
+  </div>
+</body>
+</html>
+"""
+
+# The fields shown in the rows of the list pages
+LIST_FIELDS = ("id", "title", "status", "genres", "num_volumes")
+
+
+@dataclass
+class SiteBuild:
+    """
+    The result of a site build.
+
+    Args:
+        written (int): The pages rendered and written.
+        unchanged (int): The pages whose records did not change.
+        removed (int): The pages of records that no longer exist.
+    """
+
+    written: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+def list_page_path(page: int) -> str:
+    """Returns the path of a list page, relative to the output directory."""
+    return "index.html" if page == 1 else f"page/{page}.html"
+
+
+def image_tag(image: Optional[str], root: str) -> str:
+    """Returns the img tag of a cover copied to media/, or no tag."""
+    if not image:
+        return ""
+    return f'<img src="{root}media/{quote(image)}" alt="Novel Image">'
+
+
+def render_list_page(rows: List[Dict[str, Any]], page: int,
+                     pages: int) -> str:
+    """
+    Renders a list page.
+
+    Args:
+        rows (List[Dict[str, Any]]): The records of the page, with the
+        "image" of a copied cover, if any.
+        page (int): The page number, starting at 1.
+        pages (int): The number of list pages.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    root = "" if page == 1 else "../"
+    links = []
+    if page > 1:
+        links.append(f'<a href="{root}{list_page_path(page - 1)}" '
+                     f'rel="prev">Previous</a>')
+    links.append(f"Page {page} of {pages}")
+    if page < pages:
+        links.append(f'<a href="{root}{list_page_path(page + 1)}" '
+                     f'rel="next">Next</a>')
+
+    return LIST_TEMPLATE.format(
+        title="Novels" if page == 1 else f"Novels - Page {page}",
+        root=root,
+        rows="\n".join(ROW_TEMPLATE.format(
+            root=root,
+            image=image_tag(row["image"], root),
+            id=row["id"],
+            title=escape(str(row["title"])),
+            status=escape(str(row["status"])),
+            genres=escape(str(row["genres"])),
+            num_volumes=escape(str(row["num_volumes"])),
+        ) for row in rows),
+        pager=" ".join(links),
+    )
+
+
+def render_detail_page(record: Dict[str, Any],
+                       image: Optional[str]) -> str:
+    """
+    Renders the detail page of a novel.
+
+    Args:
+        record (Dict[str, Any]): The record of the novel.
+        image (Optional[str]): The file name of the copied cover, if any.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    return DETAIL_TEMPLATE.format(
+        title=escape(str(record["title"])),
+        image=image_tag(image, "../"),
+        synopsis=escape(str(record["synopsis"])),
+        status=escape(str(record["status"])),
+        genres=escape(str(record["genres"])),
+        num_volumes=escape(str(record["num_volumes"])),
+        url=escape(str(record["url"])),
+    )
+
+
+def page_key(content: Any) -> str:
+    """Returns a digest of the inputs of a page and the site version."""
+    return hashlib.blake2b(dumps([SITE_VERSION, content]),
+                           digest_size=16).hexdigest()
+
+
+def copy_if_changed(source: str, destination: str) -> bool:
+    """
+    Copies a file unless the destination has the same size and mtime.
+
+    Returns:
+        bool: Whether the file was copied.
+    """
+    stat = os.stat(source)
+    try:
+        copied = os.stat(destination)
+    except FileNotFoundError:
+        pass
+    else:
+        if (copied.st_size, copied.st_mtime_ns) == \
+                (stat.st_size, stat.st_mtime_ns):
+            return False
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    shutil.copy2(source, destination)
+    return True
+
+
+def copy_cover(record: Dict[str, Any], output_dir: str) -> Optional[str]:
+    """
+    Copies the cover of a record to the media directory of the site.
+
+    Returns:
+        Optional[str]: The file name of the cover in media/, or None if
+        the record has no cover.
+    """
+    image = record.get("image")
+    if not image or image == "Not found" or not os.path.isfile(image):
+        return None
+    name = os.path.basename(image)
+    copy_if_changed(image, os.path.join(output_dir, "media", name))
+    return name
+
+
+def build_site(records: List[Dict[str, Any]], output_dir: str,
+               per_page: int = DEFAULT_PER_PAGE) -> SiteBuild:
+    """
+    Renders the crawl output to static HTML pages.
+
+    Every page is identified by a digest of the records it shows. Pages
+    whose digest matches the previous build are not rendered again, and
+    pages of records that no longer exist are removed.
+
+    Args:
+        records (List[Dict[str, Any]]): The records of the crawl output.
+        output_dir (str): The directory of the site.
+        per_page (int): The number of novels per list page.
+
+    Returns:
+        SiteBuild: The number of written, unchanged and removed pages.
+
+    Raises:
+        ValueError: If per_page is not positive.
+    """
+    if per_page < 1:
+        raise ValueError("per_page must be positive")
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        previous: Dict[str, str] = read_json(manifest_file)
+    except (OSError, ValueError):
+        previous = {}
+
+    for stylesheet in STYLESHEETS:
+        copy_if_changed(os.path.join(STATIC_DIR, "css", stylesheet),
+                        os.path.join(output_dir, "static", "css", stylesheet))
+
+    records = sorted(records, key=lambda record: record["id"])
+    covers = {record["id"]: copy_cover(record, output_dir)
+              for record in records}
+
+    # Pages are rendered lazily: a page is only rendered when its key
+    # differs from the previous build or the file is missing
+    pages: List[Tuple[str, str, Any]] = []
+    for record in records:
+        image = covers[record["id"]]
+        pages.append((f"novels/{record['id']}.html",
+                      page_key([record, image]),
+                      lambda record=record, image=image:
+                      render_detail_page(record, image)))
+
+    page_count = max(1, math.ceil(len(records) / per_page))
+    for page in range(1, page_count + 1):
+        rows = [{**{field: record[field] for field in LIST_FIELDS},
+                 "image": covers[record["id"]]}
+                for record in records[(page - 1) * per_page:page * per_page]]
+        pages.append((list_page_path(page),
+                      page_key([rows, page, page_count]),
+                      lambda rows=rows, page=page:
+                      render_list_page(rows, page, page_count)))
+
+    build = SiteBuild()
+    manifest: Dict[str, str] = {}
+    for path, key, render in pages:
+        manifest[path] = key
+        file_name = os.path.join(output_dir, path)
+        if previous.get(path) == key and os.path.exists(file_name):
+            build.unchanged += 1
+            continue
+        with atomic_file(file_name) as file:
+            file.write(render().encode("utf-8"))
+        build.written += 1
+
+    for path in set(previous) - set(manifest):
+        file_name = os.path.join(output_dir, path)
+        if os.path.exists(file_name):
+            os.remove(file_name)
+            build.removed += 1
+
+    write_json(manifest, manifest_file)
+    logging.info("[INFO] - Built the site in %s: %s pages written, "
+                 "%s unchanged, %s removed", output_dir, build.written,
+                 build.unchanged, build.removed)
+    return build
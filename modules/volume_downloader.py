@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import aiohttp
+from aiohttp import ClientSession
+
+from utils.http_utils import TIMEOUTS
+from utils.metrics import (BYTES_RECEIVED, BYTES_WRITTEN, REQUESTS, RETRIES,
+                           host_of, track_stage)
+from utils.url_utils import sanitize_filename
+
+CHUNK_SIZE = 1024 * 1024
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+UNSATISFIABLE_RANGE = re.compile(r"bytes \*/(\d+)")
+
+
+@dataclass
+class VolumeResult:
+    """
+    The outcome of one volume download.
+
+    Args:
+        url (str): The URL of the volume.
+        path (str): The file of the volume.
+        status (str): "downloaded", "resumed", "skipped" if the file was
+        already complete, or "failed".
+        size (int): The size of the file in bytes.
+        error (str): Why the download failed.
+    """
+
+    url: str
+    path: str
+    status: str
+    size: int = 0
+    error: str = ""
+
+
+class VolumeDownloadError(Exception):
+    """
+    A volume download went wrong in a way that continuing the part file
+    cannot fix. The part file is discarded.
+
+    Args:
+        message (str): What went wrong.
+        permanent (bool): Whether retrying cannot help, e.g. on HTTP 404.
+    """
+
+    def __init__(self, message: str, permanent: bool = False) -> None:
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class IncompleteDownload(Exception):
+    """The connection ended early; the part file can be continued."""
+
+
+def volume_path(volumes_dir: str, record: Dict[str, Any], url: str) -> str:
+    """
+    Returns the file of a volume: one directory per novel, named after its
+    ID and title, holding the files under their names in the URL.
+
+    A short hash of the whole URL is added to the name, as hosted links
+    such as .../uc?id=A and .../uc?id=B share the name in their path.
+
+    Args:
+        volumes_dir (str): The directory of all volumes.
+        record (Dict[str, Any]): The record of the novel.
+        url (str): The URL of the volume.
+
+    Returns:
+        str: The path of the volume file.
+    """
+    directory = f"{record['id']}_{sanitize_filename(record['title'])}"
+    name = os.path.basename(unquote(urlsplit(url).path)) or "volume"
+    stem, extension = os.path.splitext(name.replace(os.sep, "_"))
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=4).hexdigest()
+    return os.path.join(volumes_dir, directory,
+                        f"{stem}_{digest}{extension}")
+
+
+def _open_part(part_file: str, offset: int):
+    file = open(part_file, "r+b" if offset else "wb")
+    file.seek(offset)
+    file.truncate()
+    return file
+
+
+class VolumeDownloader:
+    """
+    Downloads volume files concurrently, resuming partial downloads.
+
+    A volume is streamed to <file>.part and renamed to its final name only
+    once its size matches the size announced by the server, so a complete
+    file is never downloaded again. After an interruption, the part file
+    is continued with a Range request; servers that ignore the range send
+    the whole file, which then replaces the part.
+
+    At most workers downloads run at once, and at most per_host of them
+    against the same host. Network errors are retried from the bytes
+    already on disk, after backoff seconds, doubled at every retry.
+    """
+
+    def __init__(self, session: ClientSession, workers: int = 8,
+                 per_host: int = 2, retries: int = 3,
+                 backoff: float = 1.0) -> None:
+        if workers < 1 or per_host < 1:
+            raise ValueError("workers and per_host must be positive")
+        self.session = session
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host = per_host
+        self._slots = asyncio.Semaphore(workers)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_slots(self, host: str) -> asyncio.Semaphore:
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def _fetch(self, url: str, part_file: str) -> Tuple[int, bool]:
+        """
+        Continues a part file from its current size.
+
+        Returns:
+            Tuple[int, bool]: The size of the complete part file and
+            whether it was resumed.
+
+        Raises:
+            VolumeDownloadError: If the server reports an error or sends
+            more bytes than announced.
+            IncompleteDownload: If fewer bytes than announced arrived.
+            aiohttp.ClientError: If the connection fails.
+        """
+        offset = os.path.getsize(part_file) \
+            if os.path.exists(part_file) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        host = host_of(url)
+
+        async with self.session.get(url, headers=headers) as response:
+            REQUESTS.inc(method="GET", host=host,
+                         status=str(response.status))
+            if response.status == 416:
+                # The part may already hold the whole file
+                match = UNSATISFIABLE_RANGE.fullmatch(
+                    response.headers.get("Content-Range", ""))
+                if match and int(match.group(1)) == offset:
+                    return offset, True
+                raise VolumeDownloadError(
+                    f"Range not satisfiable at {offset} bytes")
+            if response.status == 206:
+                match = CONTENT_RANGE.fullmatch(
+                    response.headers.get("Content-Range", ""))
+                if not match or int(match.group(1)) != offset:
+                    raise VolumeDownloadError(
+                        "Unexpected Content-Range: "
+                        f"{response.headers.get('Content-Range')}")
+                total = None if match.group(3) == "*" \
+                    else int(match.group(3))
+            elif response.status == 200:
+                # The server ignored the range, start over
+                offset = 0
+                total = response.content_length
+            else:
+                raise VolumeDownloadError(
+                    f"HTTP {response.status}",
+                    permanent=response.status in (401, 403, 404, 410))
+
+            file = await asyncio.to_thread(_open_part, part_file, offset)
+            size = offset
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    BYTES_RECEIVED.inc(len(chunk), host=host)
+                    await asyncio.to_thread(file.write, chunk)
+                    BYTES_WRITTEN.inc(len(chunk), stage="volume")
+                    size += len(chunk)
+            finally:
+                await asyncio.to_thread(file.close)
+
+        if total is not None and size < total:
+            raise IncompleteDownload(f"Got {size} of {total} bytes")
+        if total is not None and size > total:
+            raise VolumeDownloadError(f"Got {size} of {total} bytes")
+        return size, offset > 0
+
+    async def download(self, url: str, path: str) -> VolumeResult:
+        """
+        Downloads a volume unless its file is already complete.
+
+        Args:
+            url (str): The URL of the volume.
+            path (str): The final file of the volume.
+
+        Returns:
+            VolumeResult: The outcome of the download.
+        """
+        if os.path.exists(path):
+            return VolumeResult(url, path, "skipped", os.path.getsize(path))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        part_file = path + ".part"
+        error = ""
+        # The host slot is taken first, so a download waiting for its host
+        # does not hold one of the workers
+        async with self._host_slots(host_of(url)), self._slots:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    RETRIES.inc(host=host_of(url))
+                    await asyncio.sleep(
+                        min(self.backoff * 2 ** (attempt - 1), 30))
+                try:
+                    with track_stage("volume", url):
+                        size, resumed = await self._fetch(url, part_file)
+                except VolumeDownloadError as e:
+                    error = str(e)
+                    logging.warning("[WARNING] - Volume %s: %s", url, e)
+                    if os.path.exists(part_file):
+                        os.remove(part_file)
+                    if e.permanent:
+                        break
+                except IncompleteDownload as e:
+                    error = str(e)
+                    logging.warning("[WARNING] - Volume %s interrupted: %s",
+                                    url, error)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = str(e) or "timed out"
+                    logging.warning("[WARNING] - Volume %s interrupted: %s",
+                                    url, error)
+                else:
+                    os.replace(part_file, path)
+                    logging.info("[INFO] - Saved volume %s (%s bytes)",
+                                 path, size)
+                    return VolumeResult(
+                        url, path, "resumed" if resumed else "downloaded",
+                        size)
+
+        logging.error("[ERROR] - Could not download volume %s: %s", url,
+                      error)
+        return VolumeResult(url, path, "failed", error=error)
+
+
+async def download_volumes(records: List[Dict[str, Any]], volumes_dir: str,
+                           workers: int = 8, per_host: int = 2,
+                           retries: int = 3,
+                           ids: Optional[List[int]] = None
+                           ) -> List[VolumeResult]:
+    """
+    Downloads the volumes of the novels of a crawl output.
+
+    Args:
+        records (List[Dict[str, Any]]): The records of the crawl output.
+        volumes_dir (str): The directory of the volume files.
+        workers (int): The maximum number of downloads at once.
+        per_host (int): The maximum number of downloads from one host.
+        retries (int): How often an interrupted download is continued.
+        ids (Optional[List[int]]): Only download the volumes of these
+        novels.
+
+    Returns:
+        List[VolumeResult]: The outcome of every volume download.
+    """
+    # Keyed by file, so a link listed twice is not downloaded into the
+    # same part file twice at once
+    jobs = {volume_path(volumes_dir, record, url): url
+            for record in records
+            if ids is None or record["id"] in ids
+            for url in record.get("volumes", [])}
+    logging.info("[INFO] - Downloading %s volumes to %s", len(jobs),
+                 volumes_dir)
+
+    # Large files must not hit the total timeout of a page request
+    timeout = aiohttp.ClientTimeout(sock_connect=TIMEOUTS.connect,
+                                    sock_read=TIMEOUTS.read)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        downloader = VolumeDownloader(session, workers, per_host, retries)
+        results = await asyncio.gather(*(downloader.download(url, path)
+                                         for path, url in jobs.items()))
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    logging.info("[INFO] - Volumes: %s", ", ".join(
+        f"{count} {status}" for status, count in sorted(counts.items())))
+    return list(results)
@@ -0,0 +1,166 @@
+"""
+Saved HTML pages used by the tests and the extractor benchmarks.
+
+Pages are stored in tests/data/html under the sanitized file name of their
+URL. Run ``python -m tests.fixtures`` to snapshot every URL listed in the
+tests/data/*.txt files into the corpus. By default the tests do not use
+the network and cases whose page is not saved are skipped; set
+NOVEL_TESTS_LIVE=1 to fetch those pages from the website instead. The
+synthetic sample_*.html and bugged_*.html pages reproduce the layouts of the
+website offline.
+"""
+import glob
+import logging
+import os
+import unittest
+from typing import Dict, List, Optional
+
+import requests
+
+from utils.url_utils import extract_filename_from_url, sanitize_filename
+
+FIXTURES_DIR = os.path.join("tests", "data", "html")
+URL_LISTS = sorted(glob.glob(os.path.join("tests", "data", "urls_*.txt")))
+LIVE_ENV = "NOVEL_TESTS_LIVE"
+
+
+def fixture_path(url: str) -> str:
+    """
+    Returns the corpus path of the page with the given URL.
+
+    Args:
+        url (str): The URL of the novel page.
+
+    Returns:
+        str: The path of the saved page.
+    """
+    name = sanitize_filename(extract_filename_from_url(url))
+    return os.path.join(FIXTURES_DIR, f"{name}.html")
+
+
+def read_urls(filename: str) -> List[str]:
+    """
+    Reads the URLs listed in a test data file, one per line.
+
+    Args:
+        filename (str): The path of the file.
+
+    Returns:
+        List[str]: The URLs, without blank lines.
+    """
+    with open(filename, "r") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def load_page(url: str) -> Optional[bytes]:
+    """
+    Returns the content of a page saved in the corpus.
+
+    Args:
+        url (str): The URL of the novel page.
+
+    Returns:
+        Optional[bytes]: The page content, or None if the page is not in
+        the corpus.
+    """
+    path = fixture_path(url)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def fetch_page(url: str) -> bytes:
+    """
+    Downloads a page from the website.
+
+    Args:
+        url (str): The URL of the novel page.
+
+    Returns:
+        bytes: The page content.
+
+    Raises:
+        requests.RequestException: If the request fails.
+    """
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def require_page(test: unittest.TestCase, url: str) -> bytes:
+    """
+    Returns the content of a page saved in the corpus. Pages that are not
+    saved are fetched from the website if NOVEL_TESTS_LIVE is set, else the
+    test is skipped.
+
+    Args:
+        test (unittest.TestCase): The running test, or subtest.
+        url (str): The URL of the novel page.
+
+    Returns:
+        bytes: The page content.
+
+    Raises:
+        unittest.SkipTest: If the page is not in the corpus and live
+        fetching is off.
+        requests.RequestException: If fetching the page fails.
+    """
+    page_content = load_page(url)
+    if page_content is not None:
+        return page_content
+    if os.environ.get(LIVE_ENV) != "1":
+        test.skipTest(f"{url} is not in the fixture corpus, run "
+                      f"`make fixtures` to save it or set {LIVE_ENV}=1 to "
+                      "fetch it")
+    return fetch_page(url)
+
+
+def load_corpus(prefix: str = "") -> Dict[str, bytes]:
+    """
+    Loads the pages saved in the corpus.
+
+    Args:
+        prefix (str): Only load the pages whose file name starts with it,
+        e.g. "bugged_title_".
+
+    Returns:
+        Dict[str, bytes]: The page contents keyed by file name.
+    """
+    corpus = {}
+    pattern = os.path.join(FIXTURES_DIR, f"{prefix}*.html")
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "rb") as file:
+            corpus[os.path.basename(path)] = file.read()
+    return corpus
+
+
+def save_fixtures(overwrite: bool = False) -> None:
+    """
+    Downloads every page listed in the URL files into the corpus.
+
+    Args:
+        overwrite (bool): Whether pages that are already saved should be
+        downloaded again.
+    """
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for filename in URL_LISTS:
+        for url in read_urls(filename):
+            path = fixture_path(url)
+            if os.path.exists(path) and not overwrite:
+                continue
+
+            try:
+                page_content = fetch_page(url)
+            except requests.RequestException as e:
+                logging.error("[ERROR] - Error fetching URL %s: %s", url, e)
+                continue
+
+            with open(path, "wb") as file:
+                file.write(page_content)
+            logging.info("[INFO] - Saved %s to %s", url, path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    save_fixtures()
@@ -1,91 +1,175 @@
+import os
+import tempfile
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import urlsplit, urlunsplit
 
 import aiohttp
-import requests
 from bs4 import BeautifulSoup
 
+from tests.fixtures import load_corpus, read_urls, require_page
 from utils.async_utils import \
     download_novel_image as async_download_novel_image
 from utils.novel_utils import download_novel_image, get_novel_image_url
 
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(64)
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """Answers every path with the same image."""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(IMAGE)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.do_HEAD()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
 
 class TestNovelImageExtraction(unittest.IsolatedAsyncioTestCase):
     @classmethod
     def setUpClass(cls):
-        """Set up class variables and read URLs from the input file."""
-        filename = "tests/data/urls_with_bugged_images.txt"
-        cls.urls = []
-        cls.novel_base_url = "https://animestuff.me/docs/assets/html/"
-        cls.media_dir = "static/media/"
-
-        try:
-            with open(filename, "r") as file:
-                for line in file:
-                    cls.urls.append(line.strip())
-        except IOError as e:
-            cls.fail(f"Error reading a file '{file}': {e}")
+        """
+        Set up class variables, read URLs from the input file and start
+        the local server that stands in for the image hosts.
+        """
+        cls.urls = read_urls("tests/data/urls_with_bugged_images.txt")
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+        threading.Thread(target=cls.server.serve_forever,
+                         daemon=True).start()
+        cls.novel_base_url = \
+            f"http://127.0.0.1:{cls.server.server_port}/docs/assets/html/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.media_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.media_dir.cleanup()
+
+    def local_image_url(self, image_url: str) -> str:
+        """Points an image URL of another website to the local server."""
+        if image_url.startswith("https"):
+            parts = urlsplit(image_url)
+            host = f"127.0.0.1:{self.server.server_port}"
+            return urlunsplit(("http", host, parts.path, parts.query, ""))
+        return image_url
+
+    def image_urls(self) -> Dict[str, str]:
+        """
+        Extracts the image URLs of the synthetic bugged_image_* pages.
+
+        Returns:
+            Dict[str, str]: The image URLs keyed by page name.
+        """
+        pages = load_corpus("bugged_image_")
+        self.assertTrue(pages)
+        return {name: get_novel_image_url(name,
+                                          BeautifulSoup(content, "lxml"))
+                for name, content in pages.items()}
+
+    def check_image(self, image_path: str, image_url: str) -> None:
+        """Checks that the image of image_url was saved to image_path."""
+        self.assertNotEqual(image_path, "Not found",
+                            f"Image not found for URL: {image_url}")
+        with open(image_path, "rb") as file:
+            self.assertEqual(file.read(), IMAGE)
 
     def test_novel_titles_from_urls(self):
         """
         Test synchronously fetching novel images from URLs.
 
-        This test iterates over each URL and verifies that the novel image
-        can be downloaded and saved successfully using synchronous requests.
+        This test iterates over each URL and verifies that the image URL
+        can be extracted from the saved page and the image downloaded and
+        saved using synchronous requests. The images are served by the
+        local server; URLs whose page is not in the fixture corpus are
+        skipped.
 
         Raises:
             AssertionError: If a novel image is not found for any URL.
         """
         for url in self.urls:
-            try:
-                response = requests.get(url, timeout=10)
-            except requests.RequestException as e:
-                self.fail(f"Error fetching URL {url}: {e}")
-                continue
-
-            page_content = response.content
-            soup = BeautifulSoup(page_content, "lxml")
-            novel_image_url = get_novel_image_url(url, soup)
-            image_path = download_novel_image(
-                self.novel_base_url, novel_image_url,
-                self.media_dir, "title"
-            )
-            msg = f"Image not found for URL: {novel_image_url}"
-
-            self.assertNotEqual(image_path, "Not found", msg)
+            with self.subTest(url=url):
+                page_content = require_page(self, url)
+                soup = BeautifulSoup(page_content, "lxml")
+                novel_image_url = get_novel_image_url(url, soup)
+                image_path = download_novel_image(
+                    self.novel_base_url,
+                    self.local_image_url(novel_image_url),
+                    self.media_dir.name, "title")
+
+                self.check_image(image_path, novel_image_url)
 
     async def test_async_novel_titles_from_urls(self):
         """
         Test asynchronously fetching novel images from URLs.
 
-        This test iterates over each URL and verifies that the novel image
-        can be downloaded and saved successfully using asynchronous requests.
+        This test iterates over each URL and verifies that the image can
+        be downloaded and saved successfully using asynchronous requests.
+        URLs whose page is not in the fixture corpus are skipped.
 
         Raises:
             AssertionError: If a novel image is not found for any URL.
         """
-        headers = {
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
-        }
-
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with aiohttp.ClientSession() as session:
             for url in self.urls:
-                try:
-                    async with session.get(url) as response:
-                        page_content = await response.text()
-                        soup = BeautifulSoup(page_content, "lxml")
-                        novel_image_url = get_novel_image_url(url, soup)
-                        image_path = await async_download_novel_image(
-                            session, self.novel_base_url, novel_image_url,
-                            self.media_dir, "title"
-                        )
-                        msg = f"Image not found for URL: {novel_image_url}"
-
-                        self.assertNotEqual(image_path, "Not found", msg)
-
-                except aiohttp.ClientError as e:
-                    self.fail(f"Error fetching URL {url}: {e}")
-                    continue
+                with self.subTest(url=url):
+                    page_content = require_page(self, url)
+                    soup = BeautifulSoup(page_content, "lxml")
+                    novel_image_url = get_novel_image_url(url, soup)
+                    image_path = await async_download_novel_image(
+                        session, self.novel_base_url,
+                        self.local_image_url(novel_image_url),
+                        self.media_dir.name, "title")
+
+                    self.check_image(image_path, novel_image_url)
+
+    def test_bugged_image_pages(self):
+        """
+        Test synchronously downloading the images of the synthetic
+        bugged_image_* pages, whose image is nested in other tags or
+        hosted on another website.
+
+        Raises:
+            AssertionError: If an image is not found or not saved.
+        """
+        for name, image_url in self.image_urls().items():
+            with self.subTest(page=name):
+                image_path = download_novel_image(
+                    self.novel_base_url, self.local_image_url(image_url),
+                    self.media_dir.name, os.path.splitext(name)[0])
+
+                self.check_image(image_path, image_url)
+
+    async def test_async_bugged_image_pages(self):
+        """
+        Test asynchronously downloading the images of the synthetic
+        bugged_image_* pages.
+
+        Raises:
+            AssertionError: If an image is not found or not saved.
+        """
+        async with aiohttp.ClientSession() as session:
+            for name, image_url in self.image_urls().items():
+                with self.subTest(page=name):
+                    image_path = await async_download_novel_image(
+                        session, self.novel_base_url,
+                        self.local_image_url(image_url),
+                        self.media_dir.name, os.path.splitext(name)[0])
+
+                    self.check_image(image_path, image_url)
 
 
 if __name__ == "__main__":
@@ -1,24 +1,27 @@
+import os
 import unittest
 
-import requests
 from bs4 import BeautifulSoup
 
+from tests.fixtures import load_corpus, read_urls, require_page
 from utils.novel_utils import get_novel_synopsis
 
+URL_LIST = "tests/data/urls_with_bugged_synopsises.txt"
+BUGGED_PAGES = {
+    "bugged_synopsis_inline_markup.html":
+        "The synopsis comes last, holds inline markup and is not followed "
+        "by another header.",
+    "bugged_synopsis_split.html":
+        "The synopsis is split over several paragraphs, and other tags "
+        "between them.",
+}
+
 
 class TestNovelSynopsisExtraction(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up class variables and read URLs from the input file."""
-        filename = "tests/data/urls_with_bugged_synopsises.txt"
-        cls.urls = []
-
-        try:
-            with open(filename, "r") as file:
-                for line in file:
-                    cls.urls.append(line.strip())
-        except IOError as e:
-            cls.fail(f"Error reading a file '{file}': {e}")
+        cls.urls = read_urls(URL_LIST) if os.path.exists(URL_LIST) else []
 
     def test_novel_synopsises_from_urls(self):
         """
@@ -26,28 +29,43 @@ class TestNovelSynopsisExtraction(unittest.TestCase):
         urls_with_bugged_synopsises.txt.
 
         This test iterates over each URL in the file and verifies
-        that the novel synopsis can be extracted successfully from the webpage.
-        Some URLs may have different HTML structures or formatting, and this
-        test ensures that these 'bugged' synopsises can be retrieved.
+        that the novel synopsis can be extracted successfully from the saved
+        page. Some URLs may have different HTML structures or formatting,
+        and this test ensures that these 'bugged' synopsises can be
+        retrieved. URLs whose page is not in the fixture corpus are skipped.
 
         Raises:
             AssertionError: If a novel synopsis is not found for any URL.
         """
+        if not self.urls:
+            self.skipTest(f"{URL_LIST} lists no URLs")
 
         for url in self.urls:
-            try:
-                response = requests.get(url, timeout=10)
-            except requests.RequestException as e:
-                self.fail(f"Error fetching URL {url}: {e}")
-                continue
-
-            page_content = response.content
-            soup = BeautifulSoup(page_content, "lxml")
-            synopsis = get_novel_synopsis(url, soup)
-            msg = f"Synopsis not found for URL: {url}"
-
-            self.assertNotEqual(synopsis, "Not found", msg)
-            self.assertNotEqual(synopsis, "", msg)
+            with self.subTest(url=url):
+                page_content = require_page(self, url)
+                soup = BeautifulSoup(page_content, "lxml")
+                synopsis = get_novel_synopsis(url, soup)
+                msg = f"Synopsis not found for URL: {url}"
+
+                self.assertNotEqual(synopsis, "Not found", msg)
+                self.assertNotEqual(synopsis, "", msg)
+
+    def test_bugged_synopsis_pages(self):
+        """
+        Test extracting the synopses of the synthetic bugged_synopsis_*
+        pages, which are split by other tags or hold inline markup.
+
+        Raises:
+            AssertionError: If a synopsis is not found or incomplete.
+        """
+        pages = load_corpus("bugged_synopsis_")
+        self.assertEqual(set(pages), set(BUGGED_PAGES))
+        for name, page_content in pages.items():
+            with self.subTest(page=name):
+                soup = BeautifulSoup(page_content, "lxml")
+                synopsis = get_novel_synopsis(name, soup)
+
+                self.assertEqual(synopsis, BUGGED_PAGES[name])
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 import unittest
 
-import requests
 from bs4 import BeautifulSoup
 
+from tests.fixtures import load_corpus, read_urls, require_page
 from utils.novel_utils import get_novel_title
 
 
@@ -10,41 +10,47 @@ class TestNovelTitleExtraction(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up class variables and read URLs from the input file."""
-        filename = "tests/data/urls_with_bugged_titles.txt"
-        cls.urls = []
-
-        try:
-            with open(filename, "r") as file:
-                for line in file:
-                    cls.urls.append(line.strip())
-        except IOError as e:
-            cls.fail(f"Error reading a file '{file}': {e}")
+        cls.urls = read_urls("tests/data/urls_with_bugged_titles.txt")
 
     def test_novel_titles_from_urls(self):
         """
         Test fetching novel titles from URLs in urls_with_bugged_titles.txt.
 
         This test iterates over each URL in the file and verifies
-        that the novel title can be extracted successfully from the webpage.
-        Some URLs may have different HTML structures or formatting, and this
-        test ensures that these 'bugged' titles can be retrieved.
+        that the novel title can be extracted successfully from the saved
+        page. Some URLs may have different HTML structures or formatting,
+        and this test ensures that these 'bugged' titles can be retrieved.
+        URLs whose page is not in the fixture corpus are skipped.
 
         Raises:
             AssertionError: If a novel title is not found for any URL.
         """
         for url in self.urls:
-            try:
-                response = requests.get(url, timeout=10)
-            except requests.RequestException as e:
-                self.fail(f"Error fetching URL {url}: {e}")
-                continue
-
-            page_content = response.content
-            soup = BeautifulSoup(page_content, "lxml")
-            title = get_novel_title(url, soup)
-            msg = f"Title not found for URL: {url}"
-
-            self.assertNotEqual(title, "Not found", msg)
+            with self.subTest(url=url):
+                page_content = require_page(self, url)
+                soup = BeautifulSoup(page_content, "lxml")
+                title = get_novel_title(url, soup)
+                msg = f"Title not found for URL: {url}"
+
+                self.assertNotEqual(title, "Not found", msg)
+
+    def test_bugged_title_pages(self):
+        """
+        Test extracting the titles of the synthetic bugged_title_* pages,
+        which have no title tag or an empty one.
+
+        Raises:
+            AssertionError: If a title is not found.
+        """
+        pages = load_corpus("bugged_title_")
+        self.assertTrue(pages)
+        for name, page_content in pages.items():
+            with self.subTest(page=name):
+                soup = BeautifulSoup(page_content, "lxml")
+                title = get_novel_title(name, soup)
+
+                self.assertNotEqual(title, "Not found")
+                self.assertTrue(title.startswith("Bugged "), title)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from cli import DEFAULT_CONFIG, build_parser, load_config
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        """Write a small data file and a config file."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp_dir.name, "novels.json")
+        with open(self.data_file, "w", encoding="utf-8") as file:
+            json.dump([
+                {"id": 1, "title": "Sample Complete", "status": "Completed",
+                 "genres": "Comedy, Romance", "url": "a"},
+                {"id": 2, "title": "Sample Ongoing", "status": "Ongoing",
+                 "genres": "Action", "url": "b"},
+            ], file)
+        self.config_file = os.path.join(self.tmp_dir.name, "config.json")
+        with open(self.config_file, "w", encoding="utf-8") as file:
+            json.dump({"data_file": self.data_file, "media_dir": "media"},
+                      file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_config_precedence(self):
+        """
+        Test that flags override the config file, which overrides defaults.
+
+        Raises:
+            AssertionError: If a value comes from the wrong source.
+        """
+        args = build_parser().parse_args([
+            "query", "--config", self.config_file, "--media-dir", "other"])
+        config = load_config(args)
+        self.assertEqual(config["data_file"], self.data_file)
+        self.assertEqual(config["media_dir"], "other")
+        self.assertEqual(config["website_base_url"],
+                         DEFAULT_CONFIG["website_base_url"])
+
+    def test_unknown_config_key(self):
+        """
+        Test that a misspelled config key is rejected.
+
+        Raises:
+            AssertionError: If the key is accepted.
+        """
+        with open(self.config_file, "w", encoding="utf-8") as file:
+            json.dump({"data_fle": self.data_file}, file)
+        args = build_parser().parse_args(
+            ["query", "--config", self.config_file])
+        with self.assertRaises(SystemExit):
+            load_config(args)
+
+    def test_query_skips_heavy_imports(self):
+        """
+        Test that the query command filters records without importing the
+        network and parsing libraries.
+
+        Raises:
+            AssertionError: If the output is wrong or a library is imported.
+        """
+        script = (
+            "import sys, cli\n"
+            "cli.main(sys.argv[1:])\n"
+            "heavy = {'aiohttp', 'bs4', 'lxml', 'requests'}\n"
+            "print(sorted(heavy & set(sys.modules)), file=sys.stderr)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script, "query", "--data-file",
+             self.data_file, "--genre", "comedy"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        records = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual([record["id"] for record in records], [1])
+        self.assertEqual(result.stderr.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
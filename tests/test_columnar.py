@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from modules.columnar import (ColumnarReader, DictionaryColumn,
+                              write_columnar)
+
+RECORDS = [
+    {"id": 1, "title": "Sample Complete Novel", "status": "Completed",
+     "synopsis": "Über ein Buch.", "genres": "Comedy, Romance",
+     "num_volumes": 3, "image": "static/media/a.png", "url": "a",
+     "volumes": ["a1.epub", "a2.epub", "a3.epub"]},
+    {"id": 2, "title": "Sample Ongoing Novel", "status": "Ongoing",
+     "synopsis": "", "genres": "Romance", "num_volumes": 1,
+     "image": "Not found", "url": "b", "volumes": ["b1.epub"]},
+    {"id": 3, "title": "Sample Broken Novel", "status": "Completed",
+     "synopsis": "Not found", "genres": "Not found", "num_volumes": 0,
+     "image": "Not found", "url": "c", "volumes": []},
+]
+
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, "novels.ncol")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        """
+        Test that the snapshot reads back the records it was written from.
+
+        Raises:
+            AssertionError: If a record differs.
+        """
+        write_columnar(RECORDS, self.file_name)
+        with ColumnarReader(self.file_name) as reader:
+            self.assertEqual(len(reader), 3)
+            self.assertEqual(list(reader), RECORDS)
+            self.assertEqual(reader.record(1), RECORDS[1])
+
+    def test_dictionary_columns(self):
+        """
+        Test that status and genres are dictionary-encoded.
+
+        Raises:
+            AssertionError: If a value is stored more than once.
+        """
+        write_columnar(RECORDS, self.file_name)
+        with ColumnarReader(self.file_name) as reader:
+            status = reader.column("status")
+            self.assertIsInstance(status, DictionaryColumn)
+            self.assertEqual(status.dictionary, ["Completed", "Ongoing"])
+            self.assertEqual(status.value_counts(),
+                             {"Completed": 2, "Ongoing": 1})
+
+            genres = reader.column("genres")
+            self.assertEqual(genres[0], ["Comedy", "Romance"])
+            self.assertEqual(genres.value_counts()["Romance"], 2)
+            self.assertEqual(list(reader.column("num_volumes")), [3, 1, 0])
+            self.assertEqual(reader.column("volumes")[1], ["b1.epub"])
+
+    def test_value_counts_count_rows(self):
+        """
+        Test that a genre listed twice for a novel is counted once.
+
+        Raises:
+            AssertionError: If a row is counted twice.
+        """
+        records = [dict(RECORDS[0], genres="Comedy, Romance, Comedy"),
+                   RECORDS[1]]
+        write_columnar(records, self.file_name)
+        with ColumnarReader(self.file_name) as reader:
+            self.assertEqual(reader.column("genres").value_counts(),
+                             {"Comedy": 1, "Romance": 2})
+
+    def test_genres_are_normalized(self):
+        """
+        Test that the genres are read back separated by ", " whatever the
+        spacing they were written with.
+
+        Raises:
+            AssertionError: If the genres are not normalized.
+        """
+        records = [dict(RECORDS[0], genres=genres)
+                   for genres in ("Comedy,Romance", "Comedy ,  Romance",
+                                  " Comedy, Romance, ")]
+        write_columnar(records, self.file_name)
+        with ColumnarReader(self.file_name) as reader:
+            self.assertEqual([record["genres"] for record in reader],
+                             ["Comedy, Romance"] * 3)
+
+    def test_empty_and_invalid_files(self):
+        """
+        Test an empty snapshot and a file of another format.
+
+        Raises:
+            AssertionError: If the files are not handled.
+        """
+        write_columnar([], self.file_name)
+        with ColumnarReader(self.file_name) as reader:
+            self.assertEqual(list(reader), [])
+
+        with open(self.file_name, "wb") as file:
+            file.write(b"[]" * 16)
+        with self.assertRaises(ValueError):
+            ColumnarReader(self.file_name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import unittest
+
+from modules.deadline import (STALE, PriorityScheduler, crawl_times_file,
+                              is_incomplete, merge_with_previous)
+
+COMPLETE = {"id": 1, "title": "Hyouka", "status": "Completed",
+            "synopsis": "A mystery.", "genres": "Mystery", "num_volumes": 1,
+            "image": "static/media/Hyouka.jpg", "url": "a", "volumes": []}
+
+
+def previous_record(url, **fields):
+    return {**COMPLETE, "url": url, **fields}
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, scheduler, urls, delay=None):
+        """Hand out the URLs discovered at once, or every delay seconds."""
+        async def discover():
+            for url in urls:
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                yield {"url": url}
+
+        discovery = asyncio.create_task(scheduler.discover(discover()))
+        if delay is None:
+            await discovery
+        novels = [novel["url"] async for novel in scheduler.novels()]
+        discovery.cancel()
+        return novels
+
+    def test_is_incomplete(self):
+        """
+        Test that records with a field not found, or without a field added
+        by a later version, are incomplete.
+
+        Raises:
+            AssertionError: If a record is classified wrongly.
+        """
+        self.assertFalse(is_incomplete(COMPLETE))
+        self.assertTrue(is_incomplete({**COMPLETE, "genres": "Not found"}))
+        record = dict(COMPLETE)
+        del record["volumes"]
+        self.assertTrue(is_incomplete(record))
+
+    async def test_priority_order(self):
+        """
+        Test that new novels come first in discovery order, then
+        incomplete and then complete novels, each oldest first.
+
+        Raises:
+            AssertionError: If the novels are handed out in another order.
+        """
+        previous = [
+            previous_record("stale-old"),
+            previous_record("stale-new"),
+            previous_record("incomplete", synopsis="Not found"),
+            previous_record("never-timed"),
+        ]
+        crawl_times = {"stale-old": 100.0, "stale-new": 200.0,
+                       "incomplete": 300.0}
+        scheduler = PriorityScheduler(
+            previous, crawl_times, asyncio.get_running_loop().time() + 10)
+
+        novels = await self.collect(scheduler, [
+            "stale-new", "new-1", "incomplete", "stale-old", "never-timed",
+            "new-2",
+        ])
+
+        self.assertEqual(novels, ["new-1", "new-2", "incomplete",
+                                  "never-timed", "stale-old", "stale-new"])
+        self.assertEqual(scheduler.summary(),
+                         "2/2 new, 1/1 incomplete, 3/3 stale")
+
+
+    async def test_stops_at_stop_time(self):
+        """
+        Test that no novel is handed out after the stop time, also while
+        the discovery is still running.
+
+        Raises:
+            AssertionError: If a novel is handed out too late.
+        """
+        loop = asyncio.get_running_loop()
+        scheduler = PriorityScheduler([], {}, loop.time() + 0.15)
+
+        start = loop.time()
+        novels = await self.collect(
+            scheduler, [f"new-{i}" for i in range(10)], delay=0.1)
+
+        self.assertEqual(novels, ["new-0"])
+        self.assertLess(loop.time() - start, 0.5)
+
+    async def test_previous_records_with_legacy_urls(self):
+        """
+        Test that previous records saved with raw URLs match the
+        canonical URLs of a new crawl.
+
+        Raises:
+            AssertionError: If a known novel is treated as new or kept
+            twice.
+        """
+        base = "https://animestuff.me/docs/assets/html/"
+        legacy = base + "Some Novel (EPUB).html"
+        canonical = base + "Some%20Novel%20(EPUB).html"
+        previous = [previous_record(legacy, id=1)]
+        scheduler = PriorityScheduler(previous, {legacy: 100.0},
+                                      asyncio.get_running_loop().time() + 10)
+
+        self.assertEqual(scheduler.priority(canonical), (STALE, 100.0))
+        merged = merge_with_previous(
+            previous, [{**COMPLETE, "id": 1, "url": canonical}])
+        self.assertEqual([r["url"] for r in merged], [canonical])
+
+    def test_merge_with_previous(self):
+        """
+        Test that fresh records replace the previous records of their URL
+        and all other previous records are kept, in ID order.
+
+        Raises:
+            AssertionError: If the merged records are wrong.
+        """
+        previous = [{"id": 3, "url": "c", "title": "old"},
+                    {"id": 1, "url": "a", "title": "old"}]
+        fresh = [{"id": 3, "url": "c", "title": "new"},
+                 {"id": 2, "url": "b", "title": "new"}]
+
+        self.assertEqual(
+            [(r["id"], r["title"]) for r in merge_with_previous(previous,
+                                                                fresh)],
+            [(1, "old"), (2, "new"), (3, "new")])
+        self.assertEqual(crawl_times_file("data/novels_data.json"),
+                         "data/novels_data.crawled.json")
+
+
+if __name__ == "__main__":
+    unittest.main()
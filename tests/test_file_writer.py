@@ -0,0 +1,96 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from utils import file_writer
+from utils.file_writer import AsyncFileWriter
+from utils.json_utils import read_json
+
+
+class TestAsyncFileWriter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    async def test_writes_run_in_the_pool(self):
+        """
+        Test that files are written by the writer threads, not by the
+        thread of the event loop.
+
+        Raises:
+            AssertionError: If a file is written on the event loop or its
+            content differs.
+        """
+        threads = []
+        write_file = file_writer.write_file
+
+        def record_thread(*args):
+            threads.append(threading.current_thread().name)
+            write_file(*args)
+
+        with mock.patch.object(file_writer, "write_file", record_thread):
+            async with AsyncFileWriter(workers=2) as writer:
+                await asyncio.gather(*(
+                    writer.write(self.path(f"{i}.png"), bytes([i]) * 10)
+                    for i in range(5)))
+                count = await writer.write_json_array(
+                    [{"id": 1}], self.path("data.json"))
+
+        self.assertEqual(count, 1)
+        self.assertEqual(read_json(self.path("data.json")), [{"id": 1}])
+        self.assertEqual(len(threads), 5)
+        self.assertTrue(all(name.startswith("writer") for name in threads))
+        with open(self.path("3.png"), "rb") as file:
+            self.assertEqual(file.read(), b"\x03" * 10)
+
+    async def test_small_writes_are_batched(self):
+        """
+        Test that small writes wait for the batch size or a flush, while
+        large writes are written at once.
+
+        Raises:
+            AssertionError: If a file is written at the wrong time.
+        """
+        async with AsyncFileWriter(batch_bytes=100) as writer:
+            await writer.write(self.path("a"), b"a" * 40)
+            await writer.write(self.path("large"), b"l" * 100)
+            self.assertFalse(os.path.exists(self.path("a")))
+            self.assertTrue(os.path.exists(self.path("large")))
+
+            await writer.write(self.path("b"), b"b" * 60)
+            self.assertTrue(os.path.exists(self.path("a")))
+            self.assertTrue(os.path.exists(self.path("b")))
+
+            await writer.write(self.path("c"), b"c")
+        self.assertTrue(os.path.exists(self.path("c")))
+
+    async def test_fsync_at_checkpoints(self):
+        """
+        Test that files are synced at checkpoints only, and only once.
+
+        Raises:
+            AssertionError: If a file is synced after a write or twice.
+        """
+        with mock.patch.object(file_writer.os, "fsync") as fsync:
+            writer = AsyncFileWriter(fsync=True)
+            await writer.write(self.path("a"), b"a")
+            await writer.write(self.path("b"), b"b")
+            fsync.assert_not_called()
+
+            await writer.checkpoint()
+            # The two files and their directory
+            self.assertEqual(fsync.call_count, 3)
+            await writer.close()
+            self.assertEqual(fsync.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from modules.frontier import BloomFilter, Frontier
+from utils.url_utils import canonicalize_url
+
+
+class TestFrontier(unittest.TestCase):
+    def setUp(self):
+        self.base_url = "https://animestuff.me/docs/assets/html/"
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.seen_file = os.path.join(self.tmp_dir.name, "seen_urls.txt")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_canonicalize_url(self):
+        """
+        Test that spelling variants of a URL are canonicalized the same way.
+
+        Raises:
+            AssertionError: If two variants differ.
+        """
+        expected = self.base_url + "A%20Novel.html"
+        for url in (self.base_url + "A Novel.html",
+                    self.base_url + "A%20Novel.html#volumes",
+                    "HTTPS://AnimeStuff.me:443/docs/assets/html/A%20Novel.html"):
+            self.assertEqual(canonicalize_url(url), expected)
+
+    def test_admit_deduplicates_urls(self):
+        """
+        Test that a novel linked under two spellings is admitted once.
+
+        Raises:
+            AssertionError: If the duplicate is admitted.
+        """
+        frontier = Frontier()
+        self.assertEqual(
+            frontier.admit(self.base_url + "A Novel.html", "A_Novel"),
+            (self.base_url + "A%20Novel.html", "A_Novel"))
+        self.assertIsNone(
+            frontier.admit(self.base_url + "A%20Novel.html", "A_Novel"))
+
+    def test_admit_resolves_key_collisions(self):
+        """
+        Test that two novels sanitized to the same key get distinct keys.
+
+        Raises:
+            AssertionError: If a key is reused.
+        """
+        frontier = Frontier()
+        _, first = frontier.admit(self.base_url + "Re-Zero.html", "Re_Zero")
+        with self.assertLogs(level="WARNING"):
+            _, second = frontier.admit(self.base_url + "Re:Zero.html",
+                                       "Re_Zero")
+        self.assertEqual(first, "Re_Zero")
+        self.assertNotEqual(second, first)
+        self.assertTrue(second.startswith("Re_Zero_"))
+
+    def test_seen_set_is_persisted(self):
+        """
+        Test that stored URLs are remembered by a resumed frontier, with
+        the exact seen-set and with a Bloom filter.
+
+        Raises:
+            AssertionError: If a stored URL is forgotten.
+        """
+        for capacity in (None, 1000):
+            frontier = Frontier(self.seen_file, capacity)
+            frontier.mark_stored(self.base_url + "A Novel.html")
+            frontier.save()
+
+            resumed = Frontier(self.seen_file, capacity, resume=True)
+            self.assertTrue(resumed.seen(self.base_url + "A%20Novel.html"))
+            self.assertFalse(resumed.seen(self.base_url + "Other.html"))
+
+            fresh = Frontier(self.seen_file, capacity)
+            self.assertFalse(fresh.seen(self.base_url + "A%20Novel.html"))
+
+    def test_bloom_filter_error_rate(self):
+        """
+        Test that the Bloom filter has no false negatives and few false
+        positives.
+
+        Raises:
+            AssertionError: If an item is missing or the error rate is high.
+        """
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"{self.base_url}Novel-{i}.html")
+
+        self.assertTrue(all(f"{self.base_url}Novel-{i}.html" in bloom
+                            for i in range(1000)))
+        false_positives = sum(f"{self.base_url}Other-{i}.html" in bloom
+                              for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from modules.html_archive import (CODEC_GZIP, CODEC_RAW, ArchiveReader,
+                                  ArchiveWriter, index_path)
+
+
+class TestHtmlArchive(unittest.TestCase):
+    def setUp(self):
+        """Create a temporary archive path for every test."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive_file = os.path.join(directory.name, "pages.archive")
+        self.pages = {
+            f"Novel_{i}": f"<html><title>Novel {i}</title></html>".encode()
+            * (i + 1)
+            for i in range(50)
+        }
+
+    def test_random_access_and_streaming(self):
+        """
+        Test that every page can be read back by key and streamed in
+        the order it was written.
+
+        Raises:
+            AssertionError: If a page is missing or differs.
+        """
+        with ArchiveWriter(self.archive_file, codec=CODEC_GZIP) as archive:
+            for key, content in self.pages.items():
+                archive.add(key, content)
+
+        with ArchiveReader(self.archive_file) as reader:
+            self.assertEqual(len(reader), len(self.pages))
+            for key, content in self.pages.items():
+                self.assertEqual(reader.get(key), content)
+            self.assertIsNone(reader.get("Missing_Novel"))
+            self.assertNotIn("Missing_Novel", reader)
+            self.assertEqual(list(reader.iter_pages()),
+                             list(self.pages.items()))
+
+    def test_appending_supersedes_older_records(self):
+        """
+        Test that a page added again replaces the older one, also across
+        writer sessions.
+
+        Raises:
+            AssertionError: If the older page is returned.
+        """
+        with ArchiveWriter(self.archive_file, codec=CODEC_RAW) as archive:
+            archive.add("Hyouka", b"old")
+            archive.add("Another", b"other")
+        with ArchiveWriter(self.archive_file) as archive:
+            archive.add("Hyouka", b"new")
+
+        with ArchiveReader(self.archive_file) as reader:
+            self.assertEqual(reader.get("Hyouka"), b"new")
+            self.assertEqual(dict(reader.iter_pages()),
+                             {"Another": b"other", "Hyouka": b"new"})
+
+    def test_index_is_recovered_after_a_crash(self):
+        """
+        Test that records written after the last index update, and a
+        truncated record at the end, are handled when reopening.
+
+        Raises:
+            AssertionError: If a complete page was lost.
+        """
+        archive = ArchiveWriter(self.archive_file)
+        archive.add("First", b"first page")
+        archive.flush()
+        archive.add("Second", b"second page")
+        # Simulate a crash in the middle of writing a third record
+        archive._file.write(b"\x00\x05\x00")
+        archive._file.flush()
+        archive._file.close()
+
+        ArchiveWriter(self.archive_file).close()
+
+        with ArchiveReader(self.archive_file) as reader:
+            self.assertEqual(reader.get("First"), b"first page")
+            self.assertEqual(reader.get("Second"), b"second page")
+        self.assertTrue(os.path.exists(index_path(self.archive_file)))
+
+
+if __name__ == "__main__":
+    unittest.main()
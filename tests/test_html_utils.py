@@ -0,0 +1,147 @@
+import logging
+import threading
+import unittest
+
+from tests.fixtures import load_corpus
+from utils.html_utils import (HOST_ENCODINGS, PARSE_MODE, UTF8_CHECK_BYTES,
+                              ParseMode, declared_encoding, is_utf8,
+                              parse_html)
+from utils.novel_utils import extract_novel_data
+
+PAGE = "<html><head><title>Привет (EPUB)</title></head><body></body></html>"
+
+
+class TestHtmlUtils(unittest.TestCase):
+    def setUp(self):
+        HOST_ENCODINGS.clear()
+
+    def test_declared_encoding(self):
+        """
+        Test reading the charset of Content-Type headers.
+
+        Raises:
+            AssertionError: If a charset is read incorrectly.
+        """
+        self.assertEqual(declared_encoding("text/html; charset=UTF-8"),
+                         "utf-8")
+        self.assertEqual(declared_encoding('text/html;charset="cp1251"'),
+                         "cp1251")
+        self.assertIsNone(declared_encoding("text/html"))
+        self.assertIsNone(declared_encoding(None))
+
+    def test_utf8_fast_path(self):
+        """
+        Test that undeclared UTF-8 pages are parsed as UTF-8 and the
+        guess is cached for the host.
+
+        Raises:
+            AssertionError: If the page is decoded incorrectly.
+        """
+        content = PAGE.encode("utf-8")
+        self.assertTrue(is_utf8(content))
+        soup = parse_html("https://example.com/a.html", content)
+        self.assertEqual(soup.title.text, "Привет (EPUB)")
+        self.assertEqual(HOST_ENCODINGS.get("example.com"), "utf-8")
+
+    def test_utf8_check_is_bounded(self):
+        """
+        Test that is_utf8 finds the first non-ASCII characters after a long
+        ASCII head, and accepts a character cut at the end of a block.
+
+        Raises:
+            AssertionError: If a page is classified incorrectly.
+        """
+        head = b"<!-- padding -->" * (UTF8_CHECK_BYTES // 4)
+        self.assertTrue(is_utf8(head))
+        self.assertFalse(is_utf8(head + PAGE.encode("cp1251")))
+        self.assertTrue(is_utf8(head + PAGE.encode("utf-8")))
+
+        cut = b"a" * (UTF8_CHECK_BYTES - 1) + "Привет".encode("utf-8")
+        self.assertTrue(is_utf8(cut))
+
+    def test_declared_and_cached_encoding(self):
+        """
+        Test that a declared charset is used and remembered for later
+        undeclared pages of the same host.
+
+        Raises:
+            AssertionError: If a page is decoded incorrectly.
+        """
+        content = PAGE.encode("cp1251")
+        self.assertFalse(is_utf8(content))
+
+        soup = parse_html("https://example.com/a.html", content, "cp1251")
+        self.assertEqual(soup.title.text, "Привет (EPUB)")
+
+        soup = parse_html("https://example.com/b.html", content)
+        self.assertEqual(soup.title.text, "Привет (EPUB)")
+
+    def test_text_content(self):
+        """
+        Test that already decoded pages are parsed as they are.
+
+        Raises:
+            AssertionError: If the page is parsed incorrectly.
+        """
+        soup = parse_html("https://example.com/a.html", PAGE)
+        self.assertEqual(soup.title.text, "Привет (EPUB)")
+
+
+class TestParseMode(unittest.TestCase):
+    def tearDown(self):
+        PARSE_MODE.configure()
+
+    def test_lean_mode_extracts_the_same_data(self):
+        """
+        Test that the lean parse mode extracts the same data as full
+        parse trees from every page of the corpus.
+
+        Raises:
+            AssertionError: If a field differs between the modes.
+        """
+        logging.disable(logging.WARNING)
+        try:
+            for name, content in load_corpus().items():
+                PARSE_MODE.configure()
+                full = extract_novel_data(name, content)
+                PARSE_MODE.configure(lean=True, max_trees=1)
+                self.assertEqual(extract_novel_data(name, content), full,
+                                 name)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_max_trees(self):
+        """
+        Test that no more than max_trees parse slots are held at once.
+
+        Raises:
+            AssertionError: If the limit is exceeded or not validated.
+        """
+        mode = ParseMode()
+        mode.configure(max_trees=2)
+        lock = threading.Lock()
+        alive = []
+        peak = []
+
+        def parse():
+            with mode.parse_slot():
+                with lock:
+                    alive.append(1)
+                    peak.append(len(alive))
+                threading.Event().wait(0.01)
+                with lock:
+                    alive.pop()
+
+        threads = [threading.Thread(target=parse) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(max(peak), 2)
+        with self.assertRaises(ValueError):
+            mode.configure(max_trees=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils.async_utils import run
+from utils.http_utils import (HEDGE_POLICY, POOL_PROFILES, TIMEOUTS,
+                              ConnectionPool, HedgePolicy, LatencyTracker,
+                              hedged_call, hedged_request, http_get)
+
+
+class SlowBodyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "10")
+        self.end_headers()
+        for _ in range(10):
+            self.wfile.write(b"x")
+            self.wfile.flush()
+            time.sleep(0.1)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpUtils(unittest.TestCase):
+    def setUp(self):
+        HEDGE_POLICY.__init__()
+        # Warm up the trackers so the p95 is 0.05s
+        for stage in ("page", "image"):
+            for _ in range(20):
+                HEDGE_POLICY.tracker(stage).observe(0.05)
+        HEDGE_POLICY.configure(enabled=True, budget=1.0)
+
+    def tearDown(self):
+        HEDGE_POLICY.__init__()
+
+    def test_latency_tracker(self):
+        """
+        Test the p95 estimate and the minimum number of samples.
+
+        Raises:
+            AssertionError: If the estimate is wrong.
+        """
+        tracker = LatencyTracker(min_samples=10)
+        for i in range(9):
+            tracker.observe(i)
+        self.assertIsNone(tracker.p95())
+        for i in range(9, 100):
+            tracker.observe(i)
+        self.assertEqual(tracker.p95(), 95)
+
+    def test_hedged_request_takes_the_first_response(self):
+        """
+        Test that a slow coroutine is hedged and the duplicate wins.
+
+        Raises:
+            AssertionError: If the slow result is returned.
+        """
+        calls = []
+
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+            return len(calls)
+
+        start = time.monotonic()
+        result = asyncio.run(hedged_request("page", "example.com", request))
+        self.assertEqual(result, 2)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_hedged_call_takes_the_first_response(self):
+        """
+        Test that a slow blocking call is hedged and the duplicate wins.
+
+        Raises:
+            AssertionError: If the slow result is returned.
+        """
+        lock = threading.Lock()
+        calls = []
+
+        def request():
+            with lock:
+                calls.append(1)
+                number = len(calls)
+            time.sleep(1.0 if number == 1 else 0.01)
+            return number
+
+        self.assertEqual(hedged_call("image", "example.com", request), 2)
+
+    def test_outstanding_blocking_hedges_are_capped(self):
+        """
+        Test that no blocking request is hedged while the losers of
+        max_outstanding earlier hedges are still running.
+
+        Raises:
+            AssertionError: If a request is hedged over the cap, or the cap
+            is not released.
+        """
+        HEDGE_POLICY.max_outstanding = 1
+        lock = threading.Lock()
+        calls = []
+
+        def request():
+            with lock:
+                calls.append(1)
+                number = len(calls)
+            time.sleep(0.5 if number != 2 else 0.01)
+            return number
+
+        # The first request loses to its duplicate and keeps running
+        self.assertEqual(hedged_call("page", "example.com", request), 2)
+        self.assertEqual(hedged_call("page", "example.com", request), 3)
+        self.assertEqual(len(calls), 3)
+
+        time.sleep(0.3)
+        self.assertTrue(HEDGE_POLICY.take_budget(blocking=True))
+        HEDGE_POLICY.release()
+
+    def test_budget(self):
+        """
+        Test that no duplicate is sent once the budget is used up.
+
+        Raises:
+            AssertionError: If the budget is exceeded or not validated.
+        """
+        policy = HedgePolicy()
+        policy.configure(enabled=True, budget=0.5)
+        policy.delay("page")
+        self.assertFalse(policy.take_budget())
+        policy.delay("page")
+        self.assertTrue(policy.take_budget())
+        self.assertFalse(policy.take_budget())
+        with self.assertRaises(ValueError):
+            policy.configure(budget=2)
+
+    def test_total_timeout(self):
+        """
+        Test that a response trickling in slower than the total timeout
+        is aborted, and read whole within it.
+
+        Raises:
+            AssertionError: If the request does not time out, or the body
+            is not read.
+        """
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowBodyHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        total = TIMEOUTS.total
+        TIMEOUTS.total = 0.3
+        try:
+            with self.assertRaises(requests.Timeout):
+                http_get(f"http://127.0.0.1:{server.server_port}/")
+            TIMEOUTS.total = 5
+            response = http_get(f"http://127.0.0.1:{server.server_port}/")
+            self.assertEqual((response.status_code, response.content),
+                             (200, b"x" * 10))
+            self.assertEqual(response.headers["content-length"], "10")
+        finally:
+            TIMEOUTS.total = total
+            server.shutdown()
+            server.server_close()
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    async def test_profiles(self):
+        """
+        Test that a profile sets up the connector and that unknown
+        profiles are rejected.
+
+        Raises:
+            AssertionError: If the connector does not use the profile.
+        """
+        pool = ConnectionPool()
+        pool.configure("polite")
+        self.assertEqual(pool, POOL_PROFILES["polite"])
+        connector = pool.connector()
+        try:
+            self.assertEqual(connector.limit, 16)
+            self.assertEqual(connector.limit_per_host, 8)
+            self.assertFalse(connector.force_close)
+        finally:
+            await connector.close()
+
+        pool.configure("no-keepalive")
+        connector = pool.connector()
+        try:
+            self.assertTrue(connector.force_close)
+        finally:
+            await connector.close()
+
+        with self.assertRaises(ValueError):
+            pool.configure("fastest")
+        self.assertEqual(pool.name, "no-keepalive")
+
+    def test_socket_buffers(self):
+        """
+        Test that the sockets of a profile get its buffer sizes.
+
+        Raises:
+            AssertionError: If a buffer is smaller than configured.
+        """
+        pool = ConnectionPool(send_buffer=64 * 1024, recv_buffer=128 * 1024)
+        addr_info = socket.getaddrinfo("127.0.0.1", 80,
+                                       type=socket.SOCK_STREAM)[0]
+        with pool.socket_factory(addr_info) as sock:
+            # Linux doubles the requested sizes for its bookkeeping
+            self.assertGreaterEqual(
+                sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+                64 * 1024)
+            self.assertGreaterEqual(
+                sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+                128 * 1024)
+
+    def test_run_without_uvloop(self):
+        """
+        Test that a crawl asked to run on uvloop still runs if uvloop is
+        not installed.
+
+        Raises:
+            AssertionError: If the coroutine does not run.
+        """
+        async def answer():
+            return 42
+
+        self.assertEqual(run(answer(), use_uvloop=True), 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
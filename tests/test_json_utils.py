@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import json_utils
+from utils.json_utils import (atomic_file, dumps, loads, read_json,
+                              write_json, write_json_array)
+
+RECORDS = [
+    {"id": 1, "title": "Sample Novel", "genres": "Comedy, Romance",
+     "synopsis": "Über „ein“ Buch\nmit zwei Zeilen."},
+    {"id": 2, "title": "Другая новелла", "genres": "Not found",
+     "synopsis": ""},
+]
+
+
+class TestJsonUtils(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, "data", "out.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_backends_agree(self):
+        """
+        Test that the installed backend and the stdlib fallback read and
+        write the same documents.
+
+        Raises:
+            AssertionError: If the backends differ.
+        """
+        for backend in {json_utils.BACKEND, "json"}:
+            with self.subTest(backend=backend), \
+                    mock.patch.object(json_utils, "BACKEND", backend):
+                compact = dumps(RECORDS)
+                self.assertNotIn(b"\n", compact)
+                self.assertIn("Über".encode("utf-8"), compact)
+                self.assertEqual(loads(compact), RECORDS)
+                self.assertEqual(loads(compact.decode("utf-8")), RECORDS)
+                self.assertEqual(json.loads(dumps(RECORDS, pretty=True)),
+                                 RECORDS)
+                with self.assertRaises(ValueError):
+                    loads(b"[1, 2")
+
+    def test_array_matches_document(self):
+        """
+        Test that incrementally written arrays decode like whole documents,
+        also when pretty, empty or written from a generator.
+
+        Raises:
+            AssertionError: If an array decodes differently.
+        """
+        for pretty in (False, True):
+            for records in (RECORDS, []):
+                with self.subTest(pretty=pretty, count=len(records)):
+                    count = write_json_array(iter(records), self.file_name,
+                                             pretty=pretty)
+                    self.assertEqual(count, len(records))
+                    self.assertEqual(read_json(self.file_name), records)
+
+        write_json_array(RECORDS, self.file_name, pretty=True)
+        with open(self.file_name, "rb") as file:
+            self.assertEqual(file.read(), dumps(RECORDS, pretty=True))
+
+    def test_failed_write_keeps_file(self):
+        """
+        Test that a write that fails leaves the previous file in place and
+        no temporary file behind.
+
+        Raises:
+            AssertionError: If the file is replaced or the temporary file
+            is left.
+        """
+        write_json({"complete": True}, self.file_name)
+
+        def records():
+            yield RECORDS[0]
+            raise RuntimeError("interrupted")
+
+        with self.assertRaises(RuntimeError):
+            write_json_array(records(), self.file_name)
+        with self.assertRaises(TypeError):
+            write_json({"unencodable": object()}, self.file_name)
+        with self.assertRaises(RuntimeError), \
+                atomic_file(self.file_name) as file:
+            file.write(b"[")
+            raise RuntimeError("interrupted")
+
+        self.assertEqual(read_json(self.file_name), {"complete": True})
+        self.assertEqual(os.listdir(os.path.dirname(self.file_name)),
+                         ["out.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import logging
+import queue
+import unittest
+from logging.handlers import QueueListener
+
+from modules.logging_config import DeferredQueueHandler, WarningAggregator
+
+
+class ListHandler(logging.Handler):
+    """Collect formatted messages in a list."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+class TestQueuedLogging(unittest.TestCase):
+    def setUp(self):
+        """Route a private logger through a queue to a list handler."""
+        self.aggregator = WarningAggregator(modules=("test_logging_config",))
+        self.target = ListHandler()
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        handler.addFilter(self.aggregator)
+        self.listener = QueueListener(log_queue, self.target)
+        self.listener.start()
+
+        self.logger = logging.getLogger("test_logging_config")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+
+    def test_records_are_formatted_by_the_listener(self):
+        """
+        Test that queued records keep their arguments until emitted.
+
+        Raises:
+            AssertionError: If the message was not formatted correctly.
+        """
+        self.logger.info("[INFO] - %s. Processed %s", 1, "Hyouka")
+        self.listener.stop()
+
+        self.assertEqual(self.target.messages, ["[INFO] - 1. Processed Hyouka"])
+
+    def test_extractor_warnings_are_aggregated(self):
+        """
+        Test that repeated warnings are rolled up into one summary line.
+
+        Raises:
+            AssertionError: If a warning was emitted or the summary is wrong.
+        """
+        for url in ("a.html", "b.html", "c.html"):
+            self.logger.warning(
+                "[WARNING] - Novel status wasn't found. URL: %s", url)
+        self.logger.error("[ERROR] - Error fetching URL %s", "d.html")
+        self.listener.stop()
+
+        self.assertEqual(self.target.messages,
+                         ["[ERROR] - Error fetching URL d.html"])
+        summary = self.aggregator.summary()
+        self.assertEqual(len(summary), 1)
+        self.assertIn("3 x", summary[0])
+        self.assertIn("a.html, b.html, c.html", summary[0])
+
+    def test_summary_examples_are_distinct(self):
+        """
+        Test that a URL warned about repeatedly is listed as one example.
+
+        Raises:
+            AssertionError: If an example is repeated in the summary.
+        """
+        for url in ("a.html", "a.html", "a.html", "b.html"):
+            self.logger.warning("[WARNING] - Image URL does not exist: %s",
+                                url)
+        self.listener.stop()
+
+        summary = self.aggregator.summary()
+        self.assertEqual(len(summary), 1)
+        self.assertIn("4 x", summary[0])
+        self.assertIn("(e.g. a.html, b.html)", summary[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import unittest
+
+from modules.loop_monitor import LoopMonitor, stage_of
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopMonitor(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.monitor = LoopMonitor()
+        self.monitor.configure(True, threshold=0.05, interval=0.01)
+
+    def test_stage_of(self):
+        """
+        Test that pipeline workers are mapped to their stage and other
+        tasks to "other".
+
+        Raises:
+            AssertionError: If a task is mapped to the wrong stage.
+        """
+        self.assertEqual(stage_of("fetch-3"), "fetch")
+        self.assertEqual(stage_of("image-fetch-12"), "image-fetch")
+        self.assertEqual(stage_of("source"), "source")
+        self.assertEqual(stage_of("Task-7"), "other")
+        self.assertEqual(stage_of(None), "other")
+
+    def test_configure_validates(self):
+        """
+        Test that a threshold or interval that is not positive is rejected.
+
+        Raises:
+            AssertionError: If no ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            self.monitor.configure(True, threshold=0)
+        with self.assertRaises(ValueError):
+            self.monitor.configure(True, interval=-1)
+
+    async def test_blocking_call_is_attributed(self):
+        """
+        Test that a blocking call in a pipeline worker is reported under
+        its stage with the stack of the blocking call, and that the lag
+        it causes is measured.
+
+        Raises:
+            AssertionError: If the call is not reported or the lag is
+            missing.
+        """
+        async def parse():
+            await asyncio.sleep(0.05)
+            block_the_loop(0.3)
+
+        loop = asyncio.get_running_loop()
+        loop.set_debug(False)
+        with self.assertNoLogs("asyncio", logging.WARNING):
+            async with self.monitor.watch():
+                await asyncio.create_task(parse(), name="parse-0")
+                await asyncio.sleep(0.05)
+
+        offenders = [offender for offender in self.monitor._offenders.values()
+                     if offender.stage == "parse"]
+        self.assertEqual(len(offenders), 1)
+        self.assertGreaterEqual(offenders[0].seconds, 0.3)
+        self.assertIn("block_the_loop", offenders[0].stack)
+        self.assertGreaterEqual(self.monitor.percentiles()["max"], 0.2)
+        self.assertIn("[parse]", self.monitor.summary())
+        self.assertFalse(loop.get_debug())
+
+    async def test_disabled_monitor_does_nothing(self):
+        """
+        Test that watch() leaves the loop alone and save() writes nothing
+        while the monitor is disabled.
+
+        Raises:
+            AssertionError: If the loop or the logs directory is touched.
+        """
+        monitor = LoopMonitor()
+        loop = asyncio.get_running_loop()
+        loop.set_debug(False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            async with monitor.watch():
+                self.assertFalse(loop.get_debug())
+            monitor.save(tmp_dir)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
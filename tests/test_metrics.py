@@ -0,0 +1,94 @@
+import unittest
+import urllib.request
+
+from utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        """Create a fresh registry for every test."""
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge_rendering(self):
+        """
+        Test that counters and gauges are rendered in the Prometheus
+        text format with their labels.
+
+        Raises:
+            AssertionError: If a sample is missing from the output.
+        """
+        counter = self.registry.counter(
+            "bytes_total", "Bytes received.", ("host",))
+        gauge = self.registry.gauge("in_flight", "In flight.", ("stage",))
+        counter.inc(100, host="animestuff.me")
+        counter.inc(28, host="animestuff.me")
+        gauge.inc(stage="page")
+        gauge.inc(stage="page")
+        gauge.dec(stage="page")
+
+        text = self.registry.render()
+
+        self.assertIn("# TYPE bytes_total counter", text)
+        self.assertIn('bytes_total{host="animestuff.me"} 128', text)
+        self.assertIn("# TYPE in_flight gauge", text)
+        self.assertIn('in_flight{stage="page"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """
+        Test that histogram buckets are cumulative and that the sum
+        and count samples are rendered.
+
+        Raises:
+            AssertionError: If a bucket, sum or count is wrong.
+        """
+        histogram = self.registry.histogram(
+            "latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, stage="parse")
+
+        text = self.registry.render()
+
+        self.assertIn('latency_seconds_bucket{stage="parse",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="parse",le="1"} 3', text)
+        self.assertIn(
+            'latency_seconds_bucket{stage="parse",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{stage="parse"} 4.05', text)
+        self.assertIn('latency_seconds_count{stage="parse"} 4', text)
+
+    def test_wrong_labels_are_rejected(self):
+        """
+        Test that using a metric with the wrong label names fails.
+
+        Raises:
+            AssertionError: If no ValueError is raised.
+        """
+        counter = self.registry.counter("requests_total", "Requests.",
+                                        ("host",))
+
+        with self.assertRaises(ValueError):
+            counter.inc(stage="page")
+
+    def test_serve_exposes_metrics(self):
+        """
+        Test that the registry can be scraped over HTTP.
+
+        Raises:
+            AssertionError: If the scraped text does not contain the metric.
+        """
+        counter = self.registry.counter("scrapes_total", "Scrapes.")
+        counter.inc()
+        server = self.registry.serve(0)
+        try:
+            port = server.server_address[1]
+            url = f"http://127.0.0.1:{port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn("scrapes_total 1", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+from modules.near_duplicates import (MinHasher, find_duplicates, normalize,
+                                     shingles, write_duplicates)
+from utils.json_utils import read_json
+
+SYNOPSIS = (
+    "After dying in an accident, a young man is reborn as a sword in a "
+    "world of monsters. Stuck in a forest and unable to move on his own, "
+    "he waits until a girl from a persecuted tribe pulls him out of the "
+    "ground, and the two set out together to become stronger."
+)
+OTHER_SYNOPSIS = (
+    "A private tutor is hired by a duke to teach his daughter, who cannot "
+    "use magic. He soon finds out that she has a talent nobody noticed "
+    "and decides to show the academy what she is capable of."
+)
+
+
+def record(novel_id, title, synopsis):
+    return {"id": novel_id, "title": title, "synopsis": synopsis}
+
+
+class TestNearDuplicates(unittest.TestCase):
+    def test_normalize(self):
+        """
+        Test that case, accents and punctuation do not change the
+        normalized text.
+
+        Raises:
+            AssertionError: If two spellings normalize differently.
+        """
+        self.assertEqual(normalize("Reincarnated as a Sword!"),
+                         normalize("reincarnated  as a sword"))
+        self.assertEqual(normalize("Pokémon – Ｂｅｓｔ_Of"), "pokemon best of")
+
+    def test_signature_estimates_similarity(self):
+        """
+        Test that the share of equal signature values is close to the
+        Jaccard similarity of the shingles.
+
+        Raises:
+            AssertionError: If the estimate is far off.
+        """
+        first = shingles(record(1, "Reincarnated as a Sword", SYNOPSIS))
+        second = shingles(record(2, "Reincarnated as a Sword (Light Novel)",
+                                 SYNOPSIS[:150]))
+        hasher = MinHasher(256)
+        a, b = hasher.signature(first), hasher.signature(second)
+        self.assertEqual(a, hasher.signature(first))
+        estimate = sum(x == y for x, y in zip(a, b)) / len(a)
+        exact = len(first & second) / len(first | second)
+        self.assertAlmostEqual(estimate, exact, delta=0.1)
+
+    def test_groups_near_duplicates(self):
+        """
+        Test that records listed under slightly different titles are
+        grouped, transitively, while different novels and records without
+        title and synopsis are not.
+
+        Raises:
+            AssertionError: If the groups are wrong.
+        """
+        records = [
+            record(1, "Reincarnated as a Sword", SYNOPSIS),
+            record(2, "Private Tutor to the Duke's Daughter", OTHER_SYNOPSIS),
+            record(3, "Reincarnated as a Sword (Light Novel)",
+                   SYNOPSIS.replace("stronger", "strong")),
+            record(4, "reincarnated as a sword", SYNOPSIS + " Volume 2."),
+            record(5, "Not found", "Not found"),
+            record(6, "Not found", "Not found"),
+        ]
+        groups = find_duplicates(records)
+
+        self.assertEqual([group.ids for group in groups], [[1, 3, 4]])
+        self.assertEqual(groups[0].titles[0], "Reincarnated as a Sword")
+        self.assertGreaterEqual(groups[0].similarity, 0.5)
+        self.assertEqual(find_duplicates(records, threshold=1.0), [])
+
+        with self.assertRaises(ValueError):
+            find_duplicates(records, threshold=0)
+        with self.assertRaises(ValueError):
+            find_duplicates(records, bands=0)
+
+    def test_write_duplicates(self):
+        """
+        Test that the duplicate groups are saved as a JSON array.
+
+        Raises:
+            AssertionError: If the file content differs.
+        """
+        records = [record(1, "Hyouka", SYNOPSIS),
+                   record(2, "Hyouka!", SYNOPSIS)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "novels_duplicates.json")
+            write_duplicates(records, file_name)
+            self.assertEqual(read_json(file_name), [
+                {"ids": [1, 2], "titles": ["Hyouka", "Hyouka!"],
+                 "similarity": 1.0}])
+
+
+if __name__ == "__main__":
+    unittest.main()
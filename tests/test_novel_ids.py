@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from modules.novel_ids import ID_SPACE, NovelIds, derive_id
+from utils.json_utils import read_json, write_json
+
+BASE_URL = "https://animestuff.me/docs/assets/html/"
+URLS = [BASE_URL + name for name in
+        ("Hyouka.html", "Sasaki-and-Peeps.html", "Aoharu-Devil.html")]
+
+
+class TestNovelIds(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ids_file = os.path.join(self.tmp_dir.name, "novel_ids.json")
+        self.data_file = os.path.join(self.tmp_dir.name, "novels_data.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ids_do_not_depend_on_order(self):
+        """
+        Test that novels get the same IDs in any processing order and
+        under any spelling of their URL.
+
+        Raises:
+            AssertionError: If an ID depends on the order or spelling.
+        """
+        forward = [NovelIds().id_for(url) for url in URLS]
+        ids = NovelIds()
+        backward = [ids.id_for(url) for url in reversed(URLS)]
+
+        self.assertEqual(forward, backward[::-1])
+        self.assertEqual(len(set(forward)), len(URLS))
+        self.assertTrue(all(0 < novel_id <= ID_SPACE for novel_id in forward))
+        self.assertEqual(ids.id_for(BASE_URL + "Hyouka.html#volumes"),
+                         forward[0])
+
+    def test_saved_ids_are_kept(self):
+        """
+        Test that saved IDs are reused, also when a novel saved later
+        derives an ID that was taken since.
+
+        Raises:
+            AssertionError: If a saved ID changes.
+        """
+        ids = NovelIds(self.ids_file)
+        # Another novel already holds the derived ID of URLS[0]
+        ids.adopt([{"id": derive_id(URLS[0]), "url": URLS[1]}])
+        first = ids.id_for(URLS[0])
+        self.assertNotEqual(first, derive_id(URLS[0]))
+        ids.save()
+
+        reloaded = NovelIds(self.ids_file)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.id_for(URLS[0]), first)
+        self.assertEqual(reloaded.id_for(URLS[1]), derive_id(URLS[0]))
+        self.assertEqual(list(read_json(self.ids_file)),
+                         sorted([URLS[0], URLS[1]]))
+
+    def test_ids_of_existing_output_are_adopted(self):
+        """
+        Test that the IDs of an existing output are kept when there is no
+        ID table yet, and that the table is not written without changes.
+
+        Raises:
+            AssertionError: If an existing ID changes.
+        """
+        write_json([{"id": 2, "url": URLS[0]}, {"id": 1, "url": URLS[1]}],
+                   self.data_file)
+        ids = NovelIds(self.ids_file, self.data_file)
+
+        self.assertEqual(ids.id_for(URLS[0]), 2)
+        self.assertEqual(ids.id_for(URLS[1]), 1)
+        self.assertEqual(ids.id_for(URLS[2]), derive_id(URLS[2]))
+        ids.save()
+        self.assertEqual(read_json(self.ids_file),
+                         {URLS[0]: 2, URLS[1]: 1, URLS[2]: derive_id(URLS[2])})
+
+        os.remove(self.ids_file)
+        NovelIds(self.ids_file).save()
+        self.assertFalse(os.path.exists(self.ids_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,9 @@
 import logging
 import unittest
 
-import requests
 from bs4 import BeautifulSoup
 
+from tests.fixtures import load_page
 from utils.novel_utils import (get_novel_genres, get_novel_status,
                                get_novel_synopsis, get_novel_title,
                                get_number_of_volumes)
@@ -35,13 +35,11 @@ class TestNovelUtils(unittest.TestCase):
 
     @staticmethod
     def fetch_page_content(url: str):
-        """Fetch the page content for a given URL."""
-        try:
-            response = requests.get(url, timeout=10)
-            return response.content
-        except requests.RequestException as e:
-            print(f"Error fetching URL {url}: {e}")
-            return None
+        """
+        Fetch the page content for a given URL, from the saved corpus
+        if the page is there.
+        """
+        return load_page(url)
 
     def test_get_novel_title(self):
         """
@@ -0,0 +1,97 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tests.fixtures import load_corpus
+from utils import novel_utils
+from utils.novel_utils import EXTRACTOR_VERSION, extract_novel_data
+from utils.parse_cache import PARSE_CACHE, ParseCache
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp_dir.name, "cache.jsonl")
+        self.corpus = load_corpus()
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        PARSE_CACHE.close()
+        logging.disable(logging.NOTSET)
+        self.tmp_dir.cleanup()
+
+    def test_unchanged_pages_skip_parsing(self):
+        """
+        Test that a second run returns the cached fields without parsing.
+
+        Raises:
+            AssertionError: If a page is parsed again or the fields differ.
+        """
+        PARSE_CACHE.open(self.cache_file, EXTRACTOR_VERSION)
+        first = {name: extract_novel_data(name, content)
+                 for name, content in self.corpus.items()}
+        PARSE_CACHE.close()
+
+        PARSE_CACHE.open(self.cache_file, EXTRACTOR_VERSION)
+        with mock.patch.object(novel_utils, "parse_html") as parse_html:
+            second = {name: extract_novel_data(name, content)
+                      for name, content in self.corpus.items()}
+        parse_html.assert_not_called()
+        self.assertEqual(second, first)
+
+    def test_cached_volume_links_are_resolved_per_url(self):
+        """
+        Test that a page cached under one URL has its volume links
+        resolved against another URL it is read under.
+
+        Raises:
+            AssertionError: If a volume URL is taken from the cache.
+        """
+        page = (b"<html><body><h2>Download</h2><a href='vol1.epub'>1</a>"
+                b"<a href='/'>Home</a></body></html>")
+        url = "https://animestuff.me/docs/assets/html/X.html"
+        PARSE_CACHE.open(self.cache_file, EXTRACTOR_VERSION)
+
+        unresolved = extract_novel_data("URL not found", page)
+        with mock.patch.object(novel_utils, "parse_html") as parse_html:
+            resolved = extract_novel_data(url, page)
+        parse_html.assert_not_called()
+
+        self.assertEqual(unresolved["volume_urls"], ["vol1.epub"])
+        self.assertEqual(resolved["volume_urls"],
+                         ["https://animestuff.me/docs/assets/html/vol1.epub"])
+
+    def test_version_and_content_changes_miss(self):
+        """
+        Test that a changed page or extractor version is not served from
+        the cache.
+
+        Raises:
+            AssertionError: If a stale entry is returned.
+        """
+        cache = ParseCache()
+        cache.open(self.cache_file, 1)
+        cache.put(b"<html>a</html>", {"title": "A"})
+        self.assertEqual(cache.get(b"<html>a</html>"), {"title": "A"})
+        self.assertIsNone(cache.get(b"<html>b</html>"))
+        cache.close()
+
+        cache.open(self.cache_file, 2)
+        self.assertIsNone(cache.get(b"<html>a</html>"))
+
+    def test_disabled_cache(self):
+        """
+        Test that a cache that was not opened stores nothing.
+
+        Raises:
+            AssertionError: If an entry is returned.
+        """
+        cache = ParseCache()
+        cache.put(b"<html>a</html>", {"title": "A"})
+        self.assertIsNone(cache.get(b"<html>a</html>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from modules.pipeline import Pipeline, Stage, parse_workers
+
+
+class TestPipeline(unittest.IsolatedAsyncioTestCase):
+    def build_stages(self, results, fetch):
+        """Build a fetch -> split -> sink pipeline collecting into results."""
+        def split(item):
+            if item % 5 == 0:
+                raise ValueError("bad item")
+            return [item, -item]
+
+        return [
+            Stage("fetch", fetch, workers=3, queue_size=2),
+            Stage("split", split, workers=2, queue_size=2, fan_out=True),
+            Stage("sink", results.append, queue_size=2),
+        ]
+
+    def test_run_threaded(self):
+        """
+        Test that every item passes all stages on threads, that None
+        drops an item and that a failing item does not stop the run.
+
+        Raises:
+            AssertionError: If the collected items are wrong.
+        """
+        results = []
+        stages = self.build_stages(
+            results, lambda item: None if item == 3 else item)
+
+        Pipeline(range(1, 11), stages).run_threaded()
+
+        expected = [i for i in range(1, 11) if i not in (3, 5, 10)]
+        self.assertEqual(sorted(results),
+                         sorted(expected + [-i for i in expected]))
+
+    async def test_run_async(self):
+        """
+        Test the same pipeline on the event loop with an async source,
+        a coroutine stage and a blocking stage.
+
+        Raises:
+            AssertionError: If the collected items are wrong.
+        """
+        async def source():
+            for item in range(1, 11):
+                yield item
+
+        async def fetch(item):
+            await asyncio.sleep(0)
+            return None if item == 3 else item
+
+        results = []
+        stages = self.build_stages(results, fetch)
+        stages[1].blocking = True
+
+        await Pipeline(source(), stages).run_async()
+
+        expected = [i for i in range(1, 11) if i not in (3, 5, 10)]
+        self.assertEqual(sorted(results),
+                         sorted(expected + [-i for i in expected]))
+
+    async def test_run_async_can_be_cancelled(self):
+        """
+        Test that a run with full queues stops at once when it is
+        cancelled, as it is at the deadline of a crawl, and leaves no task
+        behind.
+
+        Raises:
+            AssertionError: If the run does not stop in time or a task of
+            the run is still pending.
+        """
+        async def slow(item):
+            await asyncio.sleep(10)
+
+        pipeline = Pipeline(range(100), [
+            Stage("slow", slow, workers=2, queue_size=2),
+        ])
+        start = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.run_async(), 0.1)
+        self.assertLess(time.monotonic() - start, 1)
+
+        await asyncio.sleep(0.05)
+        self.assertEqual([task.get_name() for task in asyncio.all_tasks()
+                          if task is not asyncio.current_task()], [])
+
+    def test_slow_stage_applies_backpressure(self):
+        """
+        Test that a slow stage keeps the source from running ahead by
+        more than the queue capacities.
+
+        Raises:
+            AssertionError: If the source ran too far ahead.
+        """
+        produced = []
+        consumed = []
+        max_ahead = []
+        lock = threading.Lock()
+
+        def source():
+            for item in range(30):
+                with lock:
+                    produced.append(item)
+                    max_ahead.append(len(produced) - len(consumed))
+                yield item
+
+        def slow_sink(item):
+            time.sleep(0.002)
+            with lock:
+                consumed.append(item)
+
+        Pipeline(source(), [
+            Stage("pass", lambda item: item, queue_size=2),
+            Stage("sink", slow_sink, queue_size=2),
+        ]).run_threaded()
+
+        self.assertEqual(len(consumed), 30)
+        # Two queues of two, one item in each worker and one in the source
+        self.assertLessEqual(max(max_ahead), 7)
+
+    def test_parse_workers(self):
+        """
+        Test parsing worker counts from the command line.
+
+        Raises:
+            AssertionError: If a specification is parsed incorrectly.
+        """
+        self.assertEqual(parse_workers("fetch=8, media=4"),
+                         {"fetch": 8, "media": 4})
+        self.assertEqual(parse_workers(None), {})
+        with self.assertRaises(ValueError):
+            parse_workers("fetch=0")
+
+
+if __name__ == "__main__":
+    unittest.main()
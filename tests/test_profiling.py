@@ -0,0 +1,71 @@
+import glob
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from modules.profiling import Profiler
+
+
+def busy_parse():
+    """Burn some CPU so the parse stage has calls to record."""
+    return sum(i * i for i in range(20000))
+
+
+def busy_sink():
+    """Allocate some memory so the snapshot has something to show."""
+    return [str(i) for i in range(5000)]
+
+
+class TestProfiler(unittest.TestCase):
+    def test_disabled_profiler_records_nothing(self):
+        """
+        Test that stages are free when profiling is disabled.
+
+        Raises:
+            AssertionError: If a stage was recorded.
+        """
+        profiler = Profiler()
+        with profiler.stage("parse"):
+            busy_parse()
+
+        self.assertNotIn("parse", profiler.summary())
+
+    def test_nested_stages_and_saved_files(self):
+        """
+        Test that nested stages are attributed separately and that the
+        .pstats files and the summary are written.
+
+        Raises:
+            AssertionError: If a stage or an output file is missing.
+        """
+        profiler = Profiler()
+        profiler.enable()
+        self.addCleanup(tracemalloc.stop)
+        with profiler.stage("run"):
+            with profiler.stage("parse"):
+                busy_parse()
+            profiler.snapshot("parse")
+            with profiler.stage("sink"):
+                busy_sink()
+            profiler.snapshot("sink")
+
+        summary = profiler.summary()
+        self.assertIn("Stage 'parse'", summary)
+        self.assertIn("busy_parse", summary.split("Stage 'sink'")[0])
+        self.assertIn("Memory after 'sink'", summary)
+
+        with tempfile.TemporaryDirectory() as directory:
+            profiler.save(directory)
+            files = [os.path.basename(path)
+                     for path in glob.glob(os.path.join(directory, "*"))]
+
+        self.assertTrue(any(name.endswith("_profile.pstats")
+                            for name in files))
+        self.assertTrue(any(name.endswith("_profile_parse.pstats")
+                            for name in files))
+        self.assertTrue(any(name.endswith("_profile.txt") for name in files))
+
+
+if __name__ == "__main__":
+    unittest.main()
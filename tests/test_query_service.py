@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from modules.query_service import NovelIndex, QueryService
+
+RECORDS = [
+    {"id": 2, "title": "Sample Ongoing Novel", "status": "Ongoing",
+     "genres": "Action, Fantasy", "url": "b"},
+    {"id": 1, "title": "Sample Complete Novel", "status": "Completed",
+     "genres": "Comedy, Romance", "url": "a"},
+    {"id": 3, "title": "Another Story", "status": "Completed",
+     "genres": "Fantasy", "url": "c"},
+]
+
+
+class TestNovelIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NovelIndex(RECORDS)
+
+    def test_filter(self):
+        """
+        Test filtering by genre and status, case-insensitively.
+
+        Raises:
+            AssertionError: If the wrong IDs are returned.
+        """
+        self.assertEqual(self.index.filter(), [1, 2, 3])
+        self.assertEqual(self.index.filter(genre="fantasy"), [2, 3])
+        self.assertEqual(self.index.filter(genre="Fantasy",
+                                           status="completed"), [3])
+        self.assertEqual(self.index.filter(status="Dropped"), [])
+
+    def test_search(self):
+        """
+        Test that every word must match and the last may be a prefix.
+
+        Raises:
+            AssertionError: If the wrong IDs are returned.
+        """
+        self.assertEqual(self.index.search("sample novel"), [1, 2])
+        self.assertEqual(self.index.search("sample comp"), [1])
+        self.assertEqual(self.index.search("anoth"), [3])
+        self.assertEqual(self.index.search(""), [])
+
+
+class TestQueryService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp_dir.name, "novels.json")
+        self.write_records(RECORDS)
+
+        self.service = QueryService(self.data_file, reload_interval=60)
+        self.client = TestClient(TestServer(self.service.create_app()))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.tmp_dir.cleanup()
+
+    def write_records(self, records):
+        with open(self.data_file, "w", encoding="utf-8") as file:
+            json.dump(records, file)
+
+    async def test_endpoints(self):
+        """
+        Test the list, detail, filter and search endpoints.
+
+        Raises:
+            AssertionError: If a response does not match the records.
+        """
+        response = await self.client.get("/novels?per_page=2&page=2")
+        body = await response.json()
+        self.assertEqual((body["total"], [r["id"] for r in body["results"]]),
+                         (3, [3]))
+
+        response = await self.client.get("/novels/2")
+        self.assertEqual((await response.json())["title"],
+                         "Sample Ongoing Novel")
+        response = await self.client.get("/novels/9")
+        self.assertEqual(response.status, 404)
+
+        response = await self.client.get("/novels?genre=fantasy")
+        body = await response.json()
+        self.assertEqual([r["id"] for r in body["results"]], [2, 3])
+
+        response = await self.client.get("/search?q=sample+comp")
+        body = await response.json()
+        self.assertEqual([r["id"] for r in body["results"]], [1])
+
+        response = await self.client.get("/novels?page=x")
+        self.assertEqual(response.status, 400)
+
+    async def test_hot_reload(self):
+        """
+        Test that a new crawl output replaces the index and the cached
+        responses, and that a broken file keeps the old index.
+
+        Raises:
+            AssertionError: If stale or missing data is served.
+        """
+        response = await self.client.get("/novels")
+        self.assertEqual((await response.json())["total"], 3)
+
+        with open(self.data_file, "w", encoding="utf-8") as file:
+            file.write("[{")
+        self.assertFalse(await self.service.reload_if_changed())
+        response = await self.client.get("/novels")
+        self.assertEqual((await response.json())["total"], 3)
+
+        self.write_records(RECORDS[:1])
+        self.assertTrue(await self.service.reload_if_changed())
+        response = await self.client.get("/novels")
+        self.assertEqual((await response.json())["total"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import logging
+import unittest
+
+from bs4 import BeautifulSoup
+
+from tests.fixtures import load_corpus
+from utils.novel_utils import (get_novel_genres, get_novel_image_url,
+                               get_novel_status, get_novel_synopsis,
+                               get_novel_title, get_number_of_volumes,
+                               get_volume_urls)
+
+
+class TestSamplePages(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Parse the synthetic sample pages saved in the corpus."""
+        corpus = load_corpus()
+        cls.soups = {
+            name: BeautifulSoup(content, "lxml")
+            for name, content in corpus.items()
+            if name.startswith("sample_")
+        }
+
+        # Set logging level to ERROR to suppress warnings and
+        # info messages during tests
+        logging.basicConfig(level=logging.ERROR)
+
+    def test_complete_page(self):
+        """
+        Test that every field is extracted from a complete page.
+
+        Raises:
+            AssertionError: If a field does not match the page.
+        """
+        url = "sample_complete.html"
+        soup = self.soups[url]
+
+        self.assertEqual(get_novel_title(url, soup).strip(),
+                         "Sample Complete Novel")
+        self.assertEqual(get_novel_image_url(url, soup),
+                         "../images/sample-complete.jpg")
+        self.assertEqual(get_novel_status(url, soup), "Completed")
+        self.assertIn("synthetic page", get_novel_synopsis(url, soup))
+        self.assertEqual(get_novel_genres(url, soup),
+                         "Comedy, Romance, School Life")
+        self.assertEqual(get_number_of_volumes(url, soup), 3)
+        self.assertEqual(get_volume_urls(url, soup), [
+            f"https://example.com/sample-complete-v{volume}.epub"
+            for volume in (1, 2, 3)])
+
+    def test_page_without_title_tag(self):
+        """
+        Test that the title falls back to the EPUB header and that
+        headers are matched case-insensitively.
+
+        Raises:
+            AssertionError: If a field does not match the page.
+        """
+        url = "sample_no_title.html"
+        soup = self.soups[url]
+
+        self.assertEqual(get_novel_title(url, soup).strip(),
+                         "Sample Untitled Novel")
+        self.assertEqual(get_novel_status(url, soup), "Ongoing")
+        self.assertIn("skipped", get_novel_synopsis(url, soup))
+        self.assertEqual(get_novel_genres(url, soup), "Fantasy")
+        self.assertEqual(get_number_of_volumes(url, soup), 1)
+
+    def test_page_with_missing_sections(self):
+        """
+        Test that missing fields are reported as "Not found" or 0.
+
+        Raises:
+            AssertionError: If a missing field was extracted.
+        """
+        url = "sample_missing_sections.html"
+        soup = self.soups[url]
+
+        self.assertEqual(get_novel_image_url(url, soup), "Not found")
+        self.assertEqual(get_novel_status(url, soup), "Not found")
+        self.assertEqual(get_novel_synopsis(url, soup), "Not found")
+        self.assertEqual(get_novel_genres(url, soup), "Not found")
+        self.assertEqual(get_number_of_volumes(url, soup), 0)
+        self.assertEqual(get_volume_urls(url, soup), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import unittest
+
+from modules.sharding import (in_shard, merge_records, merge_shards,
+                              parse_shard, shard_file, shard_of)
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        """Build a list of novel URLs to split."""
+        base_url = "https://animestuff.me/docs/assets/html/"
+        self.urls = [f"{base_url}Novel-{i}.html" for i in range(200)]
+
+    def test_parse_shard(self):
+        """
+        Test parsing shard specifications.
+
+        Raises:
+            AssertionError: If a specification is parsed incorrectly.
+        """
+        self.assertEqual(parse_shard("1/4"), (1, 4))
+        for spec in ("4/4", "1", "a/b", "0/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_every_url_is_in_exactly_one_shard(self):
+        """
+        Test that the shards partition the URLs and are stable.
+
+        Raises:
+            AssertionError: If a URL is in no shard or in several shards.
+        """
+        for url in self.urls:
+            shards = [i for i in range(4) if in_shard(url, (i, 4))]
+            self.assertEqual(len(shards), 1)
+            self.assertEqual(shards[0], shard_of(url, 4))
+
+        sizes = [sum(in_shard(url, (i, 4)) for url in self.urls)
+                 for i in range(4)]
+        self.assertTrue(all(size > 20 for size in sizes), sizes)
+
+    def test_merge_keeps_ids_and_removes_duplicates(self):
+        """
+        Test that the partial outputs are merged in ID order.
+
+        Raises:
+            AssertionError: If the merged records are wrong.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, "novels_data.json")
+            partials = [
+                [{"id": 3, "url": "c"}, {"id": 1, "url": "a"}],
+                [{"id": 2, "url": "b"}, {"id": 1, "url": "a"}],
+            ]
+            for index, records in enumerate(partials):
+                with open(shard_file(data_file, (index, 2)), "w") as file:
+                    json.dump(records, file)
+
+            merge_shards(data_file, 2)
+            with open(data_file, "r") as file:
+                merged = json.load(file)
+
+        self.assertEqual([(r["id"], r["url"]) for r in merged],
+                         [(1, "a"), (2, "b"), (3, "c")])
+
+    def test_merge_reassigns_conflicting_ids(self):
+        """
+        Test that IDs are reassigned when shards disagree on them.
+
+        Raises:
+            AssertionError: If the IDs are not unique after merging.
+        """
+        merged = merge_records([
+            [{"id": 1, "url": "a"}, {"id": 2, "url": "c"}],
+            [{"id": 2, "url": "b"}],
+        ])
+
+        self.assertEqual([(r["id"], r["url"]) for r in merged],
+                         [(1, "a"), (2, "b"), (3, "c")])
+
+
+    def test_merge_matches_legacy_urls(self):
+        """
+        Test that a novel saved under a raw and a canonical URL is kept
+        once.
+
+        Raises:
+            AssertionError: If the novel is kept twice.
+        """
+        merged = merge_records([
+            [{"id": 1, "url": "https://a.com/Some Novel (EPUB).html"}],
+            [{"id": 1, "url": "https://a.com/Some%20Novel%20(EPUB).html"}],
+        ])
+
+        self.assertEqual(len(merged), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from modules.site_generator import build_site
+
+
+def make_records(count):
+    return [{"id": id, "title": f"Novel {id}", "status": "Ongoing",
+             "synopsis": f"Synopsis {id}", "genres": "Comedy",
+             "num_volumes": id, "image": "Not found",
+             "url": f"https://example.com/{id}.html"}
+            for id in range(1, count + 1)]
+
+
+class TestSiteGenerator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.site_dir = os.path.join(self.tmp_dir.name, "site")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self, path):
+        with open(os.path.join(self.site_dir, path), encoding="utf-8") as f:
+            return f.read()
+
+    def mtimes(self):
+        return {os.path.relpath(os.path.join(root, name), self.site_dir):
+                os.stat(os.path.join(root, name)).st_mtime_ns
+                for root, _, names in os.walk(self.site_dir)
+                for name in names if name.endswith(".html")}
+
+    def test_pages(self):
+        """
+        Test that the list pages are paginated and every novel gets a
+        detail page with its escaped fields.
+
+        Raises:
+            AssertionError: If a page is missing or its content is wrong.
+        """
+        records = make_records(5)
+        records[0]["title"] = "<b>Bold</b> & Co"
+        build = build_site(records, self.site_dir, per_page=2)
+
+        self.assertEqual(build.written, 5 + 3)
+        self.assertEqual(sorted(self.mtimes()), [
+            "index.html", "novels/1.html", "novels/2.html", "novels/3.html",
+            "novels/4.html", "novels/5.html", "page/2.html", "page/3.html"])
+        self.assertIn("&lt;b&gt;Bold&lt;/b&gt; &amp; Co",
+                      self.read("novels/1.html"))
+        self.assertIn('href="novels/2.html"', self.read("index.html"))
+        page = self.read("page/2.html")
+        self.assertIn('href="../novels/3.html"', page)
+        self.assertIn('href="../index.html" rel="prev"', page)
+        self.assertIn('href="../page/3.html" rel="next"', page)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.site_dir, "static", "css", "novels.css")))
+
+    def test_only_changed_pages_are_written(self):
+        """
+        Test that a rebuild only writes the pages of changed records and
+        removes the pages of records that no longer exist.
+
+        Raises:
+            AssertionError: If an unchanged page is written again or a
+            stale page is left.
+        """
+        records = make_records(5)
+        build_site(records, self.site_dir, per_page=2)
+        before = self.mtimes()
+
+        build = build_site(records, self.site_dir, per_page=2)
+        self.assertEqual((build.written, build.unchanged), (0, 8))
+
+        # A synopsis is only shown on the detail page
+        records[2]["synopsis"] = "New synopsis"
+        build = build_site(records, self.site_dir, per_page=2)
+        self.assertEqual(build.written, 1)
+        self.assertIn("New synopsis", self.read("novels/3.html"))
+
+        # A status is also shown on the list page of the novel
+        records[3]["status"] = "Completed"
+        build = build_site(records, self.site_dir, per_page=2)
+        self.assertEqual(build.written, 2)
+        after = self.mtimes()
+        self.assertEqual(
+            {path for path in after if after[path] != before[path]},
+            {"novels/3.html", "novels/4.html", "page/2.html"})
+
+        build = build_site(records[:4], self.site_dir, per_page=2)
+        self.assertEqual(build.removed, 2)
+        self.assertNotIn("novels/5.html", self.mtimes())
+        self.assertNotIn("page/3.html", self.mtimes())
+
+
+if __name__ == "__main__":
+    unittest.main()
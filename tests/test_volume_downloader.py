@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import tempfile
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from modules.volume_downloader import (VolumeDownloader, download_volumes,
+                                       volume_path)
+
+CONTENT = bytes(range(256)) * 1024
+
+
+class TestVolumeDownloader(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.requests = []
+        self.cut_next = False
+        logging.disable(logging.WARNING)
+
+        app = web.Application()
+        app.router.add_get("/ranged.epub", self.ranged)
+        app.router.add_get("/plain.epub", self.plain)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.close()
+        logging.disable(logging.NOTSET)
+        self.tmp_dir.cleanup()
+
+    async def ranged(self, request):
+        self.requests.append(request.headers.get("Range"))
+        start = int(request.http_range.start or 0)
+        if start >= len(CONTENT):
+            return web.Response(status=416, headers={
+                "Content-Range": f"bytes */{len(CONTENT)}"})
+
+        response = web.StreamResponse(status=206 if start else 200)
+        response.content_length = len(CONTENT) - start
+        if start:
+            response.headers["Content-Range"] = \
+                f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+        await response.prepare(request)
+        if self.cut_next:
+            # Drop the connection halfway through the body, once the
+            # client has read the first half
+            self.cut_next = False
+            await response.write(CONTENT[start:len(CONTENT) // 2])
+            await asyncio.sleep(0.1)
+            request.transport.close()
+            return response
+        await response.write(CONTENT[start:])
+        return response
+
+    async def plain(self, request):
+        self.requests.append(request.headers.get("Range"))
+        return web.Response(body=CONTENT)
+
+    def url(self, path):
+        return str(self.server.make_url(path))
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, "1_Novel", name)
+
+    def read(self, name):
+        with open(self.path(name), "rb") as file:
+            return file.read()
+
+    async def test_download_and_skip(self):
+        """
+        Test that a volume is downloaded once and skipped afterwards.
+
+        Raises:
+            AssertionError: If the file differs or is downloaded again.
+        """
+        downloader = VolumeDownloader(self.session)
+        result = await downloader.download(self.url("/ranged.epub"),
+                                           self.path("ranged.epub"))
+        self.assertEqual((result.status, result.size),
+                         ("downloaded", len(CONTENT)))
+        self.assertEqual(self.read("ranged.epub"), CONTENT)
+        self.assertFalse(os.path.exists(self.path("ranged.epub.part")))
+
+        result = await downloader.download(self.url("/ranged.epub"),
+                                           self.path("ranged.epub"))
+        self.assertEqual(result.status, "skipped")
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_resume_after_interruption(self):
+        """
+        Test that an interrupted download continues from the bytes on disk
+        with a Range request.
+
+        Raises:
+            AssertionError: If the download starts over or the file differs.
+        """
+        self.cut_next = True
+        downloader = VolumeDownloader(self.session, retries=1, backoff=0)
+        result = await downloader.download(self.url("/ranged.epub"),
+                                           self.path("ranged.epub"))
+
+        self.assertEqual(result.status, "resumed")
+        self.assertEqual(self.read("ranged.epub"), CONTENT)
+        self.assertEqual(self.requests[0], None)
+        self.assertTrue(self.requests[1].startswith("bytes="))
+        self.assertRegex(self.requests[1], r"^bytes=[1-9]\d*-$")
+
+    async def test_part_files(self):
+        """
+        Test a part file that is already complete, and a server that
+        ignores ranges.
+
+        Raises:
+            AssertionError: If a part file is not finished correctly.
+        """
+        os.makedirs(os.path.dirname(self.path("x")))
+        for name in ("ranged.epub", "plain.epub"):
+            with open(self.path(name + ".part"), "wb") as file:
+                file.write(CONTENT if name == "ranged.epub"
+                           else CONTENT[:5000])
+
+        downloader = VolumeDownloader(self.session)
+        for name in ("ranged.epub", "plain.epub"):
+            result = await downloader.download(self.url("/" + name),
+                                               self.path(name))
+            self.assertEqual(result.status,
+                             "resumed" if name == "ranged.epub"
+                             else "downloaded")
+            self.assertEqual(self.read(name), CONTENT)
+
+    async def test_missing_volume(self):
+        """
+        Test that a missing volume fails without retries.
+
+        Raises:
+            AssertionError: If the download is retried or reported as done.
+        """
+        downloader = VolumeDownloader(self.session, retries=3, backoff=0)
+        result = await downloader.download(self.url("/missing.epub"),
+                                           self.path("missing.epub"))
+        self.assertEqual((result.status, result.error),
+                         ("failed", "HTTP 404"))
+        self.assertFalse(os.path.exists(self.path("missing.epub")))
+
+    def test_volume_path(self):
+        """
+        Test that volumes are stored per novel under their URL names, and
+        that links sharing a name get different files.
+
+        Raises:
+            AssertionError: If the path is wrong or two links share a file.
+        """
+        record = {"id": 7, "title": "A Novel: Part 2"}
+        path = volume_path("volumes", record,
+                           "https://example.com/files/A%20Novel%20v1.epub")
+        self.assertEqual(os.path.dirname(path),
+                         os.path.join("volumes", "7_A_Novel__Part_2"))
+        self.assertRegex(os.path.basename(path),
+                         r"^A Novel v1_[0-9a-f]{8}\.epub$")
+
+        first = volume_path("volumes", record, "https://host.com/uc?id=A")
+        second = volume_path("volumes", record, "https://host.com/uc?id=B")
+        self.assertNotEqual(first, second)
+        self.assertEqual(
+            first, volume_path("volumes", record, "https://host.com/uc?id=A"))
+
+    async def test_links_sharing_a_name(self):
+        """
+        Test that two volumes whose links share a name are both saved,
+        and that a link listed twice is downloaded once.
+
+        Raises:
+            AssertionError: If a volume is missing or fetched twice.
+        """
+        record = {"id": 1, "title": "Novel", "volumes": [
+            self.url("/plain.epub?id=A"), self.url("/plain.epub?id=B"),
+            self.url("/plain.epub?id=A")]}
+        results = await download_volumes([record], self.tmp_dir.name)
+
+        self.assertEqual(sorted(result.status for result in results),
+                         ["downloaded", "downloaded"])
+        self.assertEqual(len({result.path for result in results}), 2)
+        self.assertEqual(len(self.requests), 2)
+        for result in results:
+            with open(result.path, "rb") as file:
+                self.assertEqual(file.read(), CONTENT)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,29 +1,93 @@
+import asyncio
 import logging
 import os
+from typing import Any, Coroutine, Optional, Tuple, TypeVar
 
 import aiohttp
 from aiohttp import ClientSession
 
+from utils.file_writer import AsyncFileWriter, write_file
+from utils.http_utils import hedged_request
+from utils.metrics import BYTES_RECEIVED, REQUESTS, host_of, track_stage
 
-async def fetch_html(session: ClientSession, url: str) -> str:
+T = TypeVar("T")
+
+
+def run(main: Coroutine[Any, Any, T], use_uvloop: bool = False) -> T:
+    """
+    Runs a coroutine in a new event loop, like asyncio.run().
+
+    Args:
+        main (Coroutine[Any, Any, T]): The coroutine to run.
+        use_uvloop (bool): Whether to run it on uvloop. Falls back to the
+        asyncio event loop with a warning if uvloop is not installed.
+
+    Returns:
+        T: The result of the coroutine.
+    """
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            logging.warning("[WARNING] - uvloop is not installed, using the "
+                            "asyncio event loop")
+        else:
+            logging.info("[INFO] - Running on uvloop %s", uvloop.__version__)
+            return uvloop.run(main)
+    return asyncio.run(main)
+
+
+async def get_content(session: ClientSession,
+                      url: str) -> Tuple[bytes, Optional[str]]:
+    """
+    Sends a GET request and reads the whole response body.
+
+    Args:
+        session (ClientSession): The aiohttp session to use for the request.
+        url (str): The URL to fetch.
+
+    Returns:
+        Tuple[bytes, Optional[str]]: The body and the declared charset.
+
+    Raises:
+        aiohttp.ClientError: If the request fails.
+        asyncio.TimeoutError: If the request exceeds the session timeouts.
+    """
+    async with session.get(url) as response:
+        REQUESTS.inc(method="GET", host=host_of(url),
+                     status=str(response.status))
+        content = await response.read()
+        BYTES_RECEIVED.inc(len(content), host=host_of(url))
+        return content, response.charset
+
+
+async def fetch_html(session: ClientSession,
+                     url: str) -> Tuple[bytes, Optional[str]]:
     """
     Fetches the HTML content of the given URL
     using the provided aiohttp ClientSession.
 
+    The body is not decoded here: lxml decodes the bytes while parsing,
+    so sniffing the charset and keeping a decoded copy is avoided. Slow
+    requests are hedged if hedging is enabled.
+
     Args:
         session (ClientSession): The aiohttp session to use for the request.
         url (str): The URL to fetch the HTML content from.
 
     Returns:
-        str: The HTML content of the URL, or an empty string
+        Tuple[bytes, Optional[str]]: The raw HTML content of the URL and
+        the charset declared by the server, or empty bytes and None
         if there was an error.
     """
     try:
-        async with session.get(url) as response:
-            return await response.text()
-    except aiohttp.ClientError as e:
-        logging.error(f"[ERROR] - Error fetching URL {url}: {e}")
-        return ""
+        with track_stage("page", url):
+            return await hedged_request(
+                "page", host_of(url), lambda: get_content(session, url))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error("[ERROR] - Error fetching URL %s: %s", url,
+                      str(e) or "timed out")
+        return b"", None
 
 
 async def fetch_binary(session: ClientSession, url: str) -> bytes:
@@ -40,10 +104,13 @@ async def fetch_binary(session: ClientSession, url: str) -> bytes:
         if there was an error.
     """
     try:
-        async with session.get(url) as response:
-            return await response.read()
-    except aiohttp.ClientError as e:
-        logging.error(f"[ERROR] - Error fetching URL {url}: {e}")
+        with track_stage("image", url):
+            content, _ = await hedged_request(
+                "image", host_of(url), lambda: get_content(session, url))
+            return content
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error("[ERROR] - Error fetching URL %s: %s", url,
+                      str(e) or "timed out")
         return b""
 
 
@@ -60,16 +127,22 @@ async def url_exists(session: ClientSession, url: str) -> bool:
         bool: True if the URL exists, False otherwise.
     """
     try:
-        async with session.head(url, allow_redirects=True) as response:
-            return response.status == 200
-    except aiohttp.ClientError as e:
-        logging.error(f"[ERROR] - Error checking URL {url}: {e}")
+        with track_stage("head", url):
+            async with session.head(url, allow_redirects=True) as response:
+                REQUESTS.inc(method="HEAD", host=host_of(url),
+                             status=str(response.status))
+                return response.status == 200
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error("[ERROR] - Error checking URL %s: %s", url,
+                      str(e) or "timed out")
         return False
 
 
 async def download_novel_image(session: ClientSession, novel_base_url: str,
                                novel_image_url: str, media_dir: str,
-                               sanitized_title: str) -> str:
+                               sanitized_title: str,
+                               writer: Optional[AsyncFileWriter] = None
+                               ) -> str:
     """
     Downloads a novel image from the given URL and
     saves it to the specified media directory.
@@ -81,6 +154,8 @@ async def download_novel_image(session: ClientSession, novel_base_url: str,
         media_dir (str): The directory to save the downloaded image.
         sanitized_title (str): The sanitized title of the novel
         used as the image file name.
+        writer (Optional[AsyncFileWriter]): The writer that saves the
+        image, or None to save it in a default worker thread.
 
     Returns:
         str: The path to the saved image, or "Not found"
@@ -92,7 +167,7 @@ async def download_novel_image(session: ClientSession, novel_base_url: str,
 
     if not await url_exists(session, novel_image_url):
         logging.warning(
-            f"[WARNING] - Image URL does not exist: {novel_image_url}")
+            "[WARNING] - Image URL does not exist: %s", novel_image_url)
         return "Not found"
 
     # Download the image
@@ -102,7 +177,9 @@ async def download_novel_image(session: ClientSession, novel_base_url: str,
 
     # Save the image to the media directory
     image_path = os.path.join(media_dir, f"{sanitized_title}.png")
-    with open(image_path, "wb") as image:
-        image.write(content)
+    if writer is not None:
+        await writer.write(image_path, content, stage="image")
+    else:
+        await asyncio.to_thread(write_file, image_path, content, "image")
 
     return image_path
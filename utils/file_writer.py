@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+from utils.json_utils import write_json_array
+from utils.metrics import BYTES_WRITTEN, track_stage
+
+
+def write_file(path: str, content: bytes, stage: str = "file") -> None:
+    """
+    Writes content to a file, replacing it, and counts the written bytes.
+
+    Args:
+        path (str): The file to write.
+        content (bytes): The file content.
+        stage (str): The stage label of the written bytes metric.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    with track_stage("write"), open(path, "wb") as file:
+        file.write(content)
+    BYTES_WRITTEN.inc(len(content), stage=stage)
+
+
+class AsyncFileWriter:
+    """
+    Writes files for the event loop in a dedicated thread pool.
+
+    Coroutines hand their writes to the pool and await the result, so the
+    event loop never waits on the disk. At most max_pending writes are
+    queued; further writers wait for a free slot, which bounds the memory
+    held by contents that are not written yet.
+
+    Writes smaller than batch_bytes are collected and written together by
+    one pool task once batch_bytes have been collected, or at the next
+    flush(). Errors of batched writes are logged instead of raised.
+
+    With fsync, the files written since the last checkpoint are flushed to
+    the disk by checkpoint() and close(), not after every write.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64,
+                 batch_bytes: int = 0, fsync: bool = False) -> None:
+        if workers < 1 or max_pending < 1:
+            raise ValueError("workers and max_pending must be positive")
+        self.batch_bytes = batch_bytes
+        self.fsync = fsync
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="writer")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._batch: List[Tuple[str, bytes, str]] = []
+        self._batch_size = 0
+        self._lock = threading.Lock()
+        self._written: Set[str] = set()
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def _written_file(self, path: str) -> None:
+        if self.fsync:
+            with self._lock:
+                self._written.add(path)
+
+    def _write_file(self, path: str, content: bytes, stage: str) -> None:
+        write_file(path, content, stage)
+        self._written_file(path)
+
+    def _write_json_array(self, items: Iterable[Any], path: str) -> int:
+        with track_stage("write"):
+            count = write_json_array(items, path)
+        self._written_file(path)
+        return count
+
+    def _write_batch(self, batch: List[Tuple[str, bytes, str]]) -> None:
+        for path, content, stage in batch:
+            try:
+                self._write_file(path, content, stage)
+            except OSError as e:
+                logging.error("[ERROR] - Error writing to file %s: %s",
+                              path, e)
+
+    def _sync(self, paths: Set[str]) -> None:
+        directories = {os.path.dirname(path) or "." for path in paths}
+        for path in sorted(paths) + sorted(directories):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                # Removed since, or a directory that cannot be opened
+                continue
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                logging.error("[ERROR] - Error syncing %s: %s", path, e)
+            finally:
+                os.close(fd)
+
+    async def write(self, path: str, content: bytes,
+                    stage: str = "file") -> None:
+        """
+        Writes content to a file, replacing it.
+
+        Args:
+            path (str): The file to write.
+            content (bytes): The file content.
+            stage (str): The stage label of the written bytes metric.
+
+        Raises:
+            OSError: If an unbatched write fails.
+        """
+        if len(content) >= self.batch_bytes:
+            await self._run(self._write_file, path, content, stage)
+            return
+
+        self._batch.append((path, content, stage))
+        self._batch_size += len(content)
+        if self._batch_size >= self.batch_bytes:
+            await self.flush()
+
+    async def write_json_array(self, items: Iterable[Any],
+                               path: str) -> int:
+        """
+        Writes items to a file as one JSON array, replacing it atomically.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        return await self._run(self._write_json_array, items, path)
+
+    async def flush(self) -> None:
+        """Writes the collected small writes."""
+        batch, self._batch, self._batch_size = self._batch, [], 0
+        if batch:
+            await self._run(self._write_batch, batch)
+
+    async def checkpoint(self) -> None:
+        """
+        Flushes the collected writes and, with fsync, syncs every file
+        written since the last checkpoint.
+        """
+        await self.flush()
+        if not self.fsync:
+            return
+        with self._lock:
+            paths, self._written = self._written, set()
+        if paths:
+            await self._run(self._sync, paths)
+
+    async def close(self) -> None:
+        """Runs a final checkpoint and stops the thread pool."""
+        await self.checkpoint()
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> "AsyncFileWriter":
+        return self
+
+    async def __aexit__(self, *exc_info: Optional[Any]) -> None:
+        await self.close()
@@ -0,0 +1,226 @@
+import codecs
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Union
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:  # Beautiful Soup < 4.13
+    ElementFilter = None
+
+from utils.metrics import host_of
+
+HEADER_TAG = re.compile(r"^h\d$")
+# Bytes decoded by is_utf8 around the first non-ASCII characters of a page
+UTF8_CHECK_BYTES = 4096
+
+
+def declared_encoding(content_type: Optional[str]) -> Optional[str]:
+    """
+    Returns the charset declared in a Content-Type header.
+
+    Unlike requests, this does not fall back to ISO-8859-1 for text types,
+    so a missing charset stays None and can be guessed per host instead.
+
+    Args:
+        content_type (Optional[str]): The Content-Type header value.
+
+    Returns:
+        Optional[str]: The declared charset in lowercase, or None.
+    """
+    if not content_type:
+        return None
+
+    for parameter in content_type.split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "charset" and value.strip(" \"'"):
+            return value.strip(" \"'").lower()
+    return None
+
+
+def is_utf8(content: bytes) -> bool:
+    """
+    Returns whether the content looks like UTF-8.
+
+    The page is decoded again while parsing, so only the UTF8_CHECK_BYTES
+    block with the first non-ASCII byte and the block after it are decoded
+    here: a page in another encoding fails on its first non-ASCII
+    characters.
+
+    Args:
+        content (bytes): The page content.
+
+    Returns:
+        bool: True if the content is ASCII or the checked bytes are UTF-8.
+    """
+    if content.isascii():
+        return True
+
+    for start in range(0, len(content), UTF8_CHECK_BYTES):
+        if content[start:start + UTF8_CHECK_BYTES].isascii():
+            continue
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            # Not final, so a character cut at the end of the block is fine
+            decoder.decode(content[start:start + 2 * UTF8_CHECK_BYTES])
+        except UnicodeDecodeError:
+            return False
+        break
+    return True
+
+
+class EncodingCache:
+    """
+    Remembers the encoding that worked for the pages of every host.
+
+    Pages of one site share an encoding, so once a page of a host has been
+    decoded, later pages skip the detection. Thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._encodings: Dict[str, str] = {}
+
+    def get(self, host: str) -> Optional[str]:
+        """Returns the encoding guessed for a host, if any."""
+        with self._lock:
+            return self._encodings.get(host)
+
+    def record(self, host: str, encoding: str) -> None:
+        """Saves the encoding a page of the host was decoded with."""
+        with self._lock:
+            self._encodings[host] = encoding.lower()
+
+    def clear(self) -> None:
+        """Forgets every guess."""
+        with self._lock:
+            self._encodings.clear()
+
+
+HOST_ENCODINGS = EncodingCache()
+
+
+def is_novel_element(name: str, attrs: Optional[Dict[str, Any]]) -> bool:
+    """
+    Returns whether the extractors need a top-level element of a page.
+
+    The extractors read the title, the headers and the paragraphs after
+    them, the image in the .ani block and the links of the download
+    section. Everything else, e.g. scripts and navigation, is skipped.
+
+    Args:
+        name (str): The tag name.
+        attrs (Optional[Dict[str, Any]]): The raw tag attributes.
+
+    Returns:
+        bool: Whether the element is kept with its subtree.
+    """
+    if name in ("title", "p", "a") or HEADER_TAG.match(name):
+        return True
+    classes = (attrs or {}).get("class") or ""
+    if not isinstance(classes, str):
+        classes = " ".join(classes)
+    return "ani" in classes.split()
+
+
+if ElementFilter is not None:
+    class NovelPageStrainer(ElementFilter):
+        """Builds only the elements accepted by is_novel_element."""
+
+        def allow_tag_creation(self, nsprefix: Optional[str], name: str,
+                               attrs: Optional[Dict[str, Any]]) -> bool:
+            return is_novel_element(name, attrs)
+
+        def allow_string_creation(self, string: str) -> bool:
+            return False
+
+    NOVEL_PAGE_STRAINER: Any = NovelPageStrainer()
+else:
+    NOVEL_PAGE_STRAINER = SoupStrainer(is_novel_element)
+
+
+class ParseMode:
+    """
+    Limits the memory used by parse trees.
+
+    In lean mode pages are parsed through NOVEL_PAGE_STRAINER, so only the
+    elements the extractors read become Python objects. max_trees caps the
+    number of parse trees alive at once across all threads; parse_slot()
+    blocks until a slot is free.
+    """
+
+    def __init__(self) -> None:
+        self.lean = False
+        self.max_trees: Optional[int] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+
+    def configure(self, lean: bool = False,
+                  max_trees: Optional[int] = None) -> None:
+        """
+        Sets the parse mode.
+
+        Args:
+            lean (bool): Whether only the needed elements are built.
+            max_trees (Optional[int]): The maximum number of parse trees
+            alive at once, or None for no limit.
+
+        Raises:
+            ValueError: If max_trees is not positive.
+        """
+        if max_trees is not None and max_trees < 1:
+            raise ValueError("max_trees must be positive")
+        self.lean = lean
+        self.max_trees = max_trees
+        self._slots = threading.BoundedSemaphore(max_trees) \
+            if max_trees else None
+
+    @contextmanager
+    def parse_slot(self) -> Iterator[None]:
+        """Holds one of the max_trees slots while a tree is alive."""
+        slots = self._slots
+        if slots is None:
+            yield
+            return
+        with slots:
+            yield
+
+
+PARSE_MODE = ParseMode()
+
+
+def parse_html(url: str, content: Union[str, bytes],
+               encoding: Optional[str] = None,
+               parse_only: Any = None) -> BeautifulSoup:
+    """
+    Parses a page with lxml, feeding it the raw bytes.
+
+    The bytes are decoded once, by lxml, with the first known encoding:
+    the declared charset, then the guess cached for the host, then UTF-8 if
+    the page looks like UTF-8. Only when none applies does BeautifulSoup sniff
+    the encoding, and the result is cached for the next pages of the host.
+
+    Args:
+        url (str): The URL of the page, used for the per-host guess.
+        content (Union[str, bytes]): The page content. Text is parsed as is.
+        encoding (Optional[str]): The charset declared by the server.
+        parse_only (Any): A strainer that limits the elements built.
+
+    Returns:
+        BeautifulSoup: The parsed page.
+    """
+    if isinstance(content, str):
+        return BeautifulSoup(content, "lxml", parse_only=parse_only)
+
+    host = host_of(url)
+    encoding = encoding or HOST_ENCODINGS.get(host)
+    if encoding is None and is_utf8(content):
+        encoding = "utf-8"
+
+    soup = BeautifulSoup(content, "lxml", from_encoding=encoding,
+                         parse_only=parse_only)
+    if soup.original_encoding:
+        HOST_ENCODINGS.record(host, soup.original_encoding)
+    return soup
@@ -0,0 +1,440 @@
+import asyncio
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, fields
+from typing import (Any, Awaitable, Callable, Deque, Dict, Mapping, Optional,
+                    Tuple, TypeVar)
+
+import requests
+
+from utils.metrics import HEDGES
+
+T = TypeVar("T")
+
+
+@dataclass
+class Timeouts:
+    """
+    The timeouts of every HTTP request, in seconds.
+
+    Args:
+        connect (float): The time allowed to open a connection.
+        read (float): The time allowed between two reads of the response.
+        total (float): The time allowed for the whole request, including
+        the body.
+    """
+
+    connect: float = 10.0
+    read: float = 30.0
+    total: float = 60.0
+
+    def for_requests(self):
+        """Returns the (connect, read) timeout tuple used by requests."""
+        return self.connect, self.read
+
+    def for_aiohttp(self):
+        """Returns the aiohttp.ClientTimeout of these timeouts."""
+        import aiohttp
+
+        return aiohttp.ClientTimeout(total=self.total,
+                                     sock_connect=self.connect,
+                                     sock_read=self.read)
+
+
+TIMEOUTS = Timeouts()
+
+
+@dataclass
+class ConnectionPool:
+    """
+    The connection pool settings of the async engine.
+
+    Args:
+        name (str): The name of the profile.
+        limit (int): The maximum number of open connections, 0 for no limit.
+        limit_per_host (int): The maximum number of open connections to
+        one host, 0 for no limit.
+        dns_ttl (Optional[int]): The seconds a resolved host name is
+        cached, 0 to resolve every connection and None to cache it for the
+        whole crawl.
+        keepalive (float): The seconds an idle connection is kept open for
+        the next request, 0 to close every connection after its request.
+        send_buffer (Optional[int]): The socket send buffer in bytes, or
+        None for the system default.
+        recv_buffer (Optional[int]): The socket receive buffer in bytes, or
+        None for the system default.
+    """
+
+    name: str = "default"
+    limit: int = 100
+    limit_per_host: int = 0
+    dns_ttl: Optional[int] = 10
+    keepalive: float = 15.0
+    send_buffer: Optional[int] = None
+    recv_buffer: Optional[int] = None
+
+    def configure(self, profile: str) -> None:
+        """
+        Applies one of the POOL_PROFILES.
+
+        Args:
+            profile (str): The name of the profile.
+
+        Raises:
+            ValueError: If there is no profile of that name.
+        """
+        if profile not in POOL_PROFILES:
+            raise ValueError(
+                f"Unknown connection pool profile {profile!r}, choose from "
+                f"{', '.join(POOL_PROFILES)}")
+        for field in fields(self):
+            setattr(self, field.name,
+                    getattr(POOL_PROFILES[profile], field.name))
+
+    def socket_factory(self, addr_info: Tuple[Any, ...]) -> socket.socket:
+        """
+        Creates the socket of a new connection with the buffer sizes.
+
+        The buffers are set before connecting, so the TCP window scale is
+        negotiated for the larger receive buffer.
+
+        Args:
+            addr_info (Tuple[Any, ...]): The address info of the host, as
+            returned by socket.getaddrinfo().
+
+        Returns:
+            socket.socket: The unconnected socket.
+        """
+        family, type_, proto, _, _ = addr_info
+        sock = socket.socket(family=family, type=type_, proto=proto)
+        if self.send_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                            self.send_buffer)
+        if self.recv_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            self.recv_buffer)
+        return sock
+
+    def connector(self):
+        """
+        Returns an aiohttp.TCPConnector with these settings.
+
+        Must be called with a running event loop.
+        """
+        import aiohttp
+
+        options: Dict[str, Any] = {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "use_dns_cache": self.dns_ttl != 0,
+            "ttl_dns_cache": self.dns_ttl or None,
+        }
+        if self.keepalive > 0:
+            options["keepalive_timeout"] = self.keepalive
+        else:
+            options["force_close"] = True
+        if self.send_buffer or self.recv_buffer:
+            options["socket_factory"] = self.socket_factory
+        return aiohttp.TCPConnector(**options)
+
+
+# Measure them on your hardware with `make bench_pool`
+POOL_PROFILES: Dict[str, ConnectionPool] = {
+    # The aiohttp defaults
+    "default": ConnectionPool(),
+    # Few connections, so the website is not loaded more than by a browser
+    "polite": ConnectionPool("polite", limit=16, limit_per_host=8,
+                             dns_ttl=300, keepalive=30.0),
+    # Many long-lived connections with large buffers for big images
+    "throughput": ConnectionPool("throughput", limit=200, dns_ttl=None,
+                                 keepalive=60.0, send_buffer=256 * 1024,
+                                 recv_buffer=4 * 1024 * 1024),
+    # A new connection for every request, for servers that drop idle ones
+    "no-keepalive": ConnectionPool("no-keepalive", dns_ttl=300,
+                                   keepalive=0.0),
+}
+
+POOL = ConnectionPool()
+
+
+@dataclass
+class HttpResponse:
+    """
+    A response fetched by http_get, with its whole body.
+
+    Args:
+        url (str): The final URL, after redirects.
+        status_code (int): The HTTP status code.
+        headers (Mapping[str, str]): The case-insensitive response headers.
+        content (bytes): The body.
+    """
+
+    url: str
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+
+
+def http_get(url: str, **kwargs: Any) -> HttpResponse:
+    """
+    Sends a GET request with requests and the configured timeouts.
+
+    requests only limits the connect time and the time between reads, so
+    the body is streamed and the request is aborted once it takes longer
+    than the total timeout.
+
+    Args:
+        url (str): The URL to fetch.
+        **kwargs: Further arguments of requests.get().
+
+    Returns:
+        HttpResponse: The response, with its body read.
+
+    Raises:
+        requests.RequestException: If the request fails or times out.
+    """
+    start = time.monotonic()
+    response = requests.get(url, timeout=TIMEOUTS.for_requests(),
+                            stream=True, **kwargs)
+    chunks = []
+    with response:
+        for chunk in response.iter_content(64 * 1024):
+            if time.monotonic() - start > TIMEOUTS.total:
+                raise requests.Timeout(
+                    f"Total timeout of {TIMEOUTS.total}s exceeded: {url}")
+            chunks.append(chunk)
+    return HttpResponse(response.url, response.status_code, response.headers,
+                        b"".join(chunks))
+
+
+class LatencyTracker:
+    """Keeps the latest request latencies of a stage to estimate the p95."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        """Returns the p95 latency, or None with too few samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+# The threads that run blocking requests while hedging is enabled
+HEDGE_THREADS = 16
+
+
+class HedgePolicy:
+    """
+    Decides when a duplicate of a slow request is sent.
+
+    A request that has not finished after the observed p95 latency of its
+    stage gets one duplicate, and the first response wins. budget caps the
+    duplicates at a fraction of all requests, so a slow server is not
+    flooded. Blocking requests cannot be cancelled, so at most
+    max_outstanding of them are hedged at a time. Disabled until
+    configured.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.budget = 0.05
+        self.max_outstanding = HEDGE_THREADS // 4
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+        self._outstanding = 0
+        self._trackers: Dict[str, LatencyTracker] = {}
+
+    def configure(self, enabled: bool = False, budget: float = 0.05) -> None:
+        """
+        Enables or disables hedging.
+
+        Args:
+            enabled (bool): Whether slow requests are hedged.
+            budget (float): The maximum ratio of hedged to all requests.
+
+        Raises:
+            ValueError: If the budget is not between 0 and 1.
+        """
+        if not 0 <= budget <= 1:
+            raise ValueError("The hedging budget must be between 0 and 1")
+        self.enabled = enabled
+        self.budget = budget
+
+    def tracker(self, stage: str) -> LatencyTracker:
+        """Returns the latency tracker of a stage."""
+        with self._lock:
+            return self._trackers.setdefault(stage, LatencyTracker())
+
+    def delay(self, stage: str) -> Optional[float]:
+        """
+        Counts a request and returns how long to wait before hedging it.
+
+        Returns:
+            Optional[float]: The p95 latency of the stage, or None if the
+            request is not hedged.
+        """
+        with self._lock:
+            self._requests += 1
+        if not self.enabled:
+            return None
+        return self.tracker(stage).p95()
+
+    def take_budget(self, blocking: bool = False) -> bool:
+        """
+        Reserves one duplicate request if the budget allows it.
+
+        Args:
+            blocking (bool): Whether the duplicate is of a blocking request.
+            It is then counted as outstanding until release() is called.
+
+        Returns:
+            bool: Whether the duplicate may be sent.
+        """
+        with self._lock:
+            if self._hedges + 1 > self.budget * self._requests:
+                return False
+            if blocking and self._outstanding >= self.max_outstanding:
+                return False
+            self._hedges += 1
+            if blocking:
+                self._outstanding += 1
+            return True
+
+    def release(self) -> None:
+        """Ends a blocking duplicate reserved by take_budget()."""
+        with self._lock:
+            self._outstanding -= 1
+
+
+HEDGE_POLICY = HedgePolicy()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_THREADS,
+                                           thread_name_prefix="hedge")
+        return _executor
+
+
+def hedged_call(stage: str, host: str, func: Callable[[], T]) -> T:
+    """
+    Calls a blocking request function, hedging it if it is slow.
+
+    With hedging enabled, the request and its duplicate run in a pool of
+    HEDGE_THREADS threads. A blocking request cannot be cancelled, so the
+    one that loses keeps its thread until it finishes or times out. At
+    most HEDGE_POLICY.max_outstanding requests are hedged at a time,
+    counted until both requests finished, so the losers cannot fill the
+    pool and delay new requests.
+
+    Args:
+        stage (str): The stage whose latencies decide the hedging delay.
+        host (str): The host, used for the metrics.
+        func (Callable[[], T]): Sends the request and returns its result.
+
+    Returns:
+        T: The result of the first request to finish.
+
+    Raises:
+        Exception: The error of the original request if every request
+        failed.
+    """
+    start = time.monotonic()
+    delay = HEDGE_POLICY.delay(stage)
+    if delay is None:
+        result = func()
+        HEDGE_POLICY.tracker(stage).observe(time.monotonic() - start)
+        return result
+
+    executor = _hedge_executor()
+    futures = [executor.submit(func)]
+    done, _ = wait(futures, timeout=delay)
+    if not done and HEDGE_POLICY.take_budget(blocking=True):
+        HEDGES.inc(host=host, result="sent")
+        logging.debug("[DEBUG] - Hedging a %s request to %s after %.2fs",
+                      stage, host, delay)
+        futures.append(executor.submit(func))
+        # Released once both requests finished, also after this returns
+        futures[0].add_done_callback(lambda _: futures[1].add_done_callback(
+            lambda _: HEDGE_POLICY.release()))
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is not futures[0]:
+                    HEDGES.inc(host=host, result="won")
+                HEDGE_POLICY.tracker(stage).observe(time.monotonic() - start)
+                return future.result()
+    return futures[0].result()
+
+
+async def hedged_request(stage: str, host: str,
+                         func: Callable[[], Awaitable[T]]) -> T:
+    """
+    Awaits a request coroutine, hedging it if it is slow.
+
+    Args:
+        stage (str): The stage whose latencies decide the hedging delay.
+        host (str): The host, used for the metrics.
+        func (Callable[[], Awaitable[T]]): Creates the request coroutine.
+
+    Returns:
+        T: The result of the first request to finish. The other request
+        is cancelled.
+
+    Raises:
+        Exception: The error of the original request if every request
+        failed.
+    """
+    start = time.monotonic()
+    delay = HEDGE_POLICY.delay(stage)
+    if delay is None:
+        result = await func()
+        HEDGE_POLICY.tracker(stage).observe(time.monotonic() - start)
+        return result
+
+    tasks = [asyncio.ensure_future(func())]
+    done, _ = await asyncio.wait(tasks, timeout=delay)
+    if not done and HEDGE_POLICY.take_budget():
+        HEDGES.inc(host=host, result="sent")
+        logging.debug("[DEBUG] - Hedging a %s request to %s after %.2fs",
+                      stage, host, delay)
+        tasks.append(asyncio.ensure_future(func()))
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        HEDGES.inc(host=host, result="won")
+                    HEDGE_POLICY.tracker(stage).observe(
+                        time.monotonic() - start)
+                    return task.result()
+        return tasks[0].result()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,172 @@
+import json
+import os
+from contextlib import contextmanager
+from typing import IO, Any, Iterable, Iterator, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# The fastest installed encoder; every backend writes UTF-8 without escaping
+# non-ASCII characters and indents pretty output by two spaces
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+
+def dumps(data: Any, pretty: bool = False) -> bytes:
+    """
+    Encodes data as JSON.
+
+    Args:
+        data (Any): The data to encode.
+        pretty (bool): Whether the output is indented. Compact by default.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+
+    Raises:
+        TypeError: If the data cannot be encoded.
+    """
+    if BACKEND == "orjson":
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if BACKEND == "msgspec":
+        try:
+            content = msgspec.json.encode(data)
+        except msgspec.EncodeError as e:
+            raise TypeError(str(e)) from e
+        return msgspec.json.format(content, indent=2) if pretty else content
+
+    if pretty:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+def loads(content: Union[str, bytes]) -> Any:
+    """
+    Decodes JSON.
+
+    Args:
+        content (Union[str, bytes]): The JSON text or its UTF-8 bytes.
+
+    Returns:
+        Any: The decoded data.
+
+    Raises:
+        ValueError: If the content is not valid JSON.
+    """
+    if BACKEND == "orjson":
+        return orjson.loads(content)
+    if BACKEND == "msgspec":
+        try:
+            return msgspec.json.decode(content)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(content)
+
+
+def read_json(file_name: str) -> Any:
+    """
+    Reads a JSON file.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not valid JSON.
+    """
+    with open(file_name, "rb") as file:
+        return loads(file.read())
+
+
+@contextmanager
+def atomic_file(file_name: str) -> Iterator[IO[bytes]]:
+    """
+    Opens a temporary file that replaces file_name once it is closed.
+
+    Readers see either the old or the complete new file, never a partial
+    one. If the block raises, the temporary file is removed and file_name
+    is left untouched.
+
+    Args:
+        file_name (str): The file to write.
+
+    Yields:
+        IO[bytes]: The temporary file, opened for binary writing.
+    """
+    directory = os.path.dirname(file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = file_name + ".tmp"
+    try:
+        with open(tmp_file, "wb") as file:
+            yield file
+        os.replace(tmp_file, file_name)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def write_json(data: Any, file_name: str, pretty: bool = False) -> None:
+    """
+    Writes data to a JSON file, replacing it atomically.
+
+    Args:
+        data (Any): The data to write.
+        file_name (str): The JSON file.
+        pretty (bool): Whether the output is indented.
+
+    Raises:
+        OSError: If the file cannot be written.
+        TypeError: If the data cannot be encoded.
+    """
+    content = dumps(data, pretty)
+    with atomic_file(file_name) as file:
+        file.write(content)
+
+
+def write_json_array(items: Iterable[Any], file_name: str,
+                     pretty: bool = False) -> int:
+    """
+    Writes items to a file as one JSON array, replacing it atomically.
+
+    The items are encoded one at a time, so the whole document is never
+    held in memory, and items may come from a generator.
+
+    Args:
+        items (Iterable[Any]): The items of the array.
+        file_name (str): The JSON file.
+        pretty (bool): Whether the output is indented.
+
+    Returns:
+        int: The number of items written.
+
+    Raises:
+        OSError: If the file cannot be written.
+        TypeError: If an item cannot be encoded.
+    """
+    # JSON strings cannot contain raw newlines, so indenting every line of
+    # an item nests it inside the array
+    separator, indent = (b",\n  ", b"\n  ") if pretty else (b",", b"")
+    count = 0
+    with atomic_file(file_name) as file:
+        file.write(b"[")
+        for item in items:
+            content = dumps(item, pretty)
+            if pretty:
+                content = content.replace(b"\n", b"\n  ")
+            file.write(separator if count else indent)
+            file.write(content)
+            count += 1
+        file.write(b"\n]" if pretty and count else b"]")
+    return count
@@ -0,0 +1,409 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    """
+    Formats label names and values in the Prometheus text format.
+
+    Args:
+        names (Sequence[str]): The label names.
+        values (Sequence[str]): The label values, in the same order.
+        extra (Optional[Tuple[str, str]]): An additional label pair,
+        used for the histogram "le" label.
+
+    Returns:
+        str: The formatted label set, or an empty string if there are
+        no labels.
+    """
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value, printing whole numbers without a fraction."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class holding the name, help text and labelled samples."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, "
+                f"got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing value, such as bytes or requests."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increments the counter for the given label values."""
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        """Returns the current value for the given label values."""
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} "
+            f"{_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, such as in-flight requests."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Sets the gauge to the given value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increments the gauge by the given amount."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        """Decrements the gauge by the given amount."""
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: str) -> float:
+        """Returns the current value for the given label values."""
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} "
+            f"{_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Counts observations, such as latencies, into cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Records a single observation for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        """Returns the number of observations for the given label values."""
+        return sum(self._counts.get(self._key(labels), []))
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, list(counts), self._sums[key])
+                for key, counts in self._counts.items()
+            )
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key,
+                                        ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """A collection of metrics that can be rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        """Creates or returns the counter registered under the given name."""
+        return self._register(  # type: ignore[return-value]
+            Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        """Creates or returns the gauge registered under the given name."""
+        return self._register(  # type: ignore[return-value]
+            Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Creates or returns the histogram registered under the given name."""
+        return self._register(  # type: ignore[return-value]
+            Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Renders all registered metrics in the Prometheus text format.
+
+        Returns:
+            str: The exposition text, terminated by a newline.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_name: str) -> None:
+        """
+        Writes the rendered metrics to a file.
+
+        Args:
+            file_name (str): The path of the Prometheus text file.
+        """
+        try:
+            with open(file_name, "w") as file:
+                file.write(self.render())
+                logging.info("[INFO] - Saved metrics to %s", file_name)
+        except IOError as e:
+            logging.error("[ERROR] - Error writing to file %s: %s", file_name, e)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serves the metrics on a local port from a background thread.
+
+        Args:
+            port (int): The port to listen on.
+            host (str): The interface to bind to.
+
+        Returns:
+            ThreadingHTTPServer: The running server. Call ``shutdown()``
+            on it to stop serving.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                # Keep scrapes out of the crawl log
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        logging.info(
+            "[INFO] - Serving metrics on http://%s:%s/metrics", host, port)
+        return server
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "novel_parser_stage_duration_seconds",
+    "Time spent in each crawl stage.",
+    ("stage", "host"),
+)
+STAGE_IN_FLIGHT = REGISTRY.gauge(
+    "novel_parser_stage_in_flight",
+    "Number of operations currently running in each stage.",
+    ("stage",),
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "novel_parser_stage_errors_total",
+    "Number of failed operations in each stage.",
+    ("stage", "host"),
+)
+REQUESTS = REGISTRY.counter(
+    "novel_parser_http_requests_total",
+    "Number of HTTP requests by method, host and status code.",
+    ("method", "host", "status"),
+)
+BYTES_RECEIVED = REGISTRY.counter(
+    "novel_parser_bytes_received_total",
+    "Number of response body bytes received from each host.",
+    ("host",),
+)
+BYTES_WRITTEN = REGISTRY.counter(
+    "novel_parser_bytes_written_total",
+    "Number of bytes written to disk by each stage.",
+    ("stage",),
+)
+RETRIES = REGISTRY.counter(
+    "novel_parser_retries_total",
+    "Number of retried requests for each host.",
+    ("host",),
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "novel_parser_queue_depth",
+    "Number of items waiting in each work queue.",
+    ("queue",),
+)
+HEDGES = REGISTRY.counter(
+    "novel_parser_hedged_requests_total",
+    "Number of duplicate requests sent for slow requests (sent) and how "
+    "many of them finished first (won).",
+    ("host", "result"),
+)
+PARSE_CACHE_LOOKUPS = REGISTRY.counter(
+    "novel_parser_parse_cache_lookups_total",
+    "Number of parse cache lookups by result (hit or miss).",
+    ("result",),
+)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "novel_parser_event_loop_lag_seconds",
+    "Delay of the event loop in waking up a sleeping task.",
+)
+EVENT_LOOP_BLOCKED = REGISTRY.counter(
+    "novel_parser_event_loop_blocked_seconds_total",
+    "Time callbacks blocked the event loop beyond the slow callback "
+    "threshold, by pipeline stage.",
+    ("stage",),
+)
+
+
+def host_of(url: str) -> str:
+    """
+    Returns the host part of a URL for use as a metric label.
+
+    Args:
+        url (str): The URL.
+
+    Returns:
+        str: The host, or an empty string for relative URLs.
+    """
+    return urlparse(url).netloc
+
+
+@contextmanager
+def track_stage(stage: str, url: str = "") -> Iterator[None]:
+    """
+    Times a block of work and records it under the given stage.
+
+    The in-flight gauge is raised for the duration of the block, and the
+    elapsed time is observed in the stage latency histogram. Exceptions
+    escaping the block are counted as stage errors and re-raised.
+
+    Args:
+        stage (str): The stage name, e.g. "head", "page" or "parse".
+        url (str): The URL being processed, used for the host label.
+    """
+    host = host_of(url)
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage, host=host)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start,
+                               stage=stage, host=host)
+        STAGE_IN_FLIGHT.dec(stage=stage)
@@ -1,13 +1,23 @@
 import logging
 import os
 import re
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urljoin
 
 import requests
 from bs4 import BeautifulSoup, Tag
 
+from utils.html_utils import NOVEL_PAGE_STRAINER, PARSE_MODE, parse_html
+from utils.http_utils import hedged_call, http_get
+from utils.metrics import (BYTES_RECEIVED, BYTES_WRITTEN, REQUESTS, host_of,
+                           track_stage)
+from utils.parse_cache import PARSE_CACHE
 from utils.url_utils import url_exists
 
+# Bump when an extractor changes what it returns, so cached fields of
+# unchanged pages are extracted again
+EXTRACTOR_VERSION = 3
+
 
 def find_header_by_partial_match(soup: BeautifulSoup,
                                  keyword: str) -> Optional[Tag]:
@@ -57,9 +67,9 @@ def get_novel_title(novel_url: str, soup: BeautifulSoup) -> str:
         if novel_title:
             return novel_title
         else:
-            logging.warning(f"[WARNING] - Novel title wasn't found. URL: {novel_url}")
+            logging.warning("[WARNING] - Novel title wasn't found. URL: %s", novel_url)
     else:
-        logging.warning(f"[WARNING] - Novel title header wasn't found. URL: {novel_url}")
+        logging.warning("[WARNING] - Novel title header wasn't found. URL: %s", novel_url)
 
     return "Not found"
 
@@ -78,17 +88,17 @@ def get_novel_image_url(novel_url: str, soup: BeautifulSoup) -> str:
     """
     div_tag = soup.find(class_="ani")
     if not div_tag:
-        logging.warning(f"[WARNING] - Div tag not found for URL: {novel_url}")
+        logging.warning("[WARNING] - Div tag not found for URL: %s", novel_url)
         return "Not found"
 
     image_tag = div_tag.find("img")
     if not isinstance(image_tag, Tag):
-        logging.warning(f"[WARNING] - Image tag not found for URL: {novel_url}")
+        logging.warning("[WARNING] - Image tag not found for URL: %s", novel_url)
         return "Not found"
 
     image_url = image_tag.get("src", "")
     if not image_url:
-        logging.warning(f"[WARNING] - Image URL not found for URL: {novel_url}")
+        logging.warning("[WARNING] - Image URL not found for URL: %s", novel_url)
         return "Not found"
 
     # Strip any leading or trailing whitespace or newlines
@@ -114,9 +124,9 @@ def get_novel_status(novel_url: str, soup: BeautifulSoup) -> str:
         if novel_status:
             return novel_status.text.strip()
         else:
-            logging.warning(f"[WARNING] - Novel status wasn't found. URL: {novel_url}")
+            logging.warning("[WARNING] - Novel status wasn't found. URL: %s", novel_url)
     else:
-        logging.warning(f"[WARNING] - Novel status header wasn't found. URL: {novel_url}")
+        logging.warning("[WARNING] - Novel status header wasn't found. URL: %s", novel_url)
 
     return "Not found"
 
@@ -149,10 +159,10 @@ def get_novel_synopsis(novel_url: str, soup: BeautifulSoup) -> str:
         if novel_synopsis_parts:
             return " ".join(novel_synopsis_parts)
         else:
-            logging.warning(f"[WARNING] - Novel synopsis wasn't found. URL: {novel_url}")
+            logging.warning("[WARNING] - Novel synopsis wasn't found. URL: %s", novel_url)
     else:
         logging.warning(
-            f"[WARNING] - Novel synopsis header wasn't found. URL: {novel_url}")
+            "[WARNING] - Novel synopsis header wasn't found. URL: %s", novel_url)
 
     return "Not found"
 
@@ -176,9 +186,9 @@ def get_novel_genres(novel_url: str, soup: BeautifulSoup) -> str:
         if novel_genres:
             return novel_genres.text.strip()
         else:
-            logging.warning(f"[WARNING] - Novel genres weren't found. URL: {novel_url}")
+            logging.warning("[WARNING] - Novel genres weren't found. URL: %s", novel_url)
     else:
-        logging.warning(f"[WARNING] - Novel genre header wasn't found. URL: {novel_url}")
+        logging.warning("[WARNING] - Novel genre header wasn't found. URL: %s", novel_url)
 
     return "Not found"
 
@@ -204,13 +214,152 @@ def get_number_of_volumes(novel_url: str, soup: BeautifulSoup) -> int:
         if novel_num_volumes > 0:
             return novel_num_volumes
         else:
-            logging.warning(f"[WARNING] - Novel volumes weren't found. URL: {novel_url}")
+            logging.warning("[WARNING] - Novel volumes weren't found. URL: %s", novel_url)
     else:
-        logging.warning(f"[WARNING] - Novel volumes weren't found. URL: {novel_url}")
+        logging.warning("[WARNING] - Novel volumes weren't found. URL: %s", novel_url)
 
     return 0
 
 
+def get_volume_links(novel_url: str, soup: BeautifulSoup) -> List[str]:
+    """
+    Retrieves the links to the volumes of a novel as written in the page.
+
+    The volumes are the links after the "download" header, except the last
+    one, as counted by get_number_of_volumes.
+
+    Args:
+        novel_url (str): The URL of the novel.
+        soup (BeautifulSoup): A BeautifulSoup object representing
+        the parsed HTML content.
+
+    Returns:
+        List[str]: The href of every volume link, which may be relative,
+        or an empty list if there are none.
+    """
+    volume_header = find_header_by_partial_match(soup, "download")
+    if not volume_header:
+        return []
+
+    links = volume_header.find_all_next("a")[:-1]
+    return [link["href"].strip()
+            for link in links if link.get("href", "").strip()]
+
+
+def get_volume_urls(novel_url: str, soup: BeautifulSoup) -> List[str]:
+    """
+    Retrieves the download URLs of the volumes of a novel.
+
+    Args:
+        novel_url (str): The URL of the novel, relative links are resolved
+        against it.
+        soup (BeautifulSoup): A BeautifulSoup object representing
+        the parsed HTML content.
+
+    Returns:
+        List[str]: The absolute volume URLs, or an empty list if there are
+        none.
+    """
+    return [urljoin(novel_url, href)
+            for href in get_volume_links(novel_url, soup)]
+
+
+def extract_novel_data(novel_url: str, page_content: Union[str, bytes],
+                       encoding: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extracts the fields of a novel from its page.
+
+    If the parse cache is open and has the fields of an identical page,
+    the page is not parsed at all. Relative volume links are resolved
+    against novel_url after the lookup.
+
+    Args:
+        novel_url (str): The URL of the novel.
+        page_content (Union[str, bytes]): The HTML content of the page.
+        Raw bytes are decoded by lxml, see parse_html.
+        encoding (Optional[str]): The charset declared by the server.
+
+    Returns:
+        Dict[str, Any]: The title, image_url, status, synopsis, genres,
+        num_volumes and volume_urls of the novel.
+    """
+    novel = PARSE_CACHE.get(page_content, encoding)
+    if novel is None:
+        novel = parse_novel_fields(novel_url, page_content, encoding)
+        PARSE_CACHE.put(page_content, novel, encoding)
+
+    # The cached fields must not depend on the URL, as the same page can
+    # be read under another URL, so the links are resolved afterwards
+    volume_links = novel.pop("volume_links")
+    novel["volume_urls"] = [urljoin(novel_url, href)
+                            for href in volume_links]
+    return novel
+
+
+def parse_novel_fields(novel_url: str, page_content: Union[str, bytes],
+                       encoding: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parses a novel page and runs every extractor on it.
+
+    The page is parsed as configured in PARSE_MODE, and the tree is freed
+    before the function returns.
+
+    Args:
+        novel_url (str): The URL of the novel, only used in warnings.
+        page_content (Union[str, bytes]): The HTML content of the page.
+        encoding (Optional[str]): The charset declared by the server.
+
+    Returns:
+        Dict[str, Any]: The fields cached by extract_novel_data, with the
+        volume_links as written in the page.
+    """
+    with track_stage("parse", novel_url), PARSE_MODE.parse_slot():
+        soup = parse_html(
+            novel_url, page_content, encoding,
+            NOVEL_PAGE_STRAINER if PARSE_MODE.lean else None)
+
+        try:
+            # Extract novel details using helper functions
+            novel = {
+                "title": get_novel_title(novel_url, soup),
+                "image_url": get_novel_image_url(novel_url, soup),
+                "status": get_novel_status(novel_url, soup),
+                "synopsis": get_novel_synopsis(novel_url, soup),
+                "genres": get_novel_genres(novel_url, soup),
+                "num_volumes": get_number_of_volumes(novel_url, soup),
+                "volume_links": get_volume_links(novel_url, soup),
+            }
+        finally:
+            # Free the tree now rather than when the GC finds the cycles
+            soup.decompose()
+    return novel
+
+
+def build_novel_record(id: int, novel: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds the record saved to the data file for a processed novel.
+
+    Args:
+        id (int): The ID of the novel.
+        novel (Dict[str, Any]): The extracted data of the novel, with its
+        "image" path and "url".
+
+    Returns:
+        Dict[str, Any]: The record with the keys in the data file order.
+    """
+    return {
+        "id": id,
+        "title": novel["title"],
+        "status": novel["status"],
+        "synopsis": novel["synopsis"],
+        "genres": novel["genres"],
+        "num_volumes": novel["num_volumes"],
+        "image": novel["image"],
+        "url": novel["url"],
+        "volumes": novel["volume_urls"]
+    }
+
+
 def download_novel_image(novel_base_url: str, novel_image_url: str,
                          media_dir: str, sanitized_title: str) -> str:
     """
@@ -232,17 +381,26 @@ def download_novel_image(novel_base_url: str, novel_image_url: str,
         novel_image_url = novel_base_url + novel_image_url
 
     if not url_exists(novel_image_url):
-        logging.warning(f"[WARNING] - Image URL does not exist: {novel_image_url}")
+        logging.warning("[WARNING] - Image URL does not exist: %s", novel_image_url)
         return "Not found"
 
     # Download and save the image
     try:
-        response = requests.get(novel_image_url)
+        host = host_of(novel_image_url)
+        with track_stage("image", novel_image_url):
+            response = hedged_call("image", host,
+                                   lambda: http_get(novel_image_url))
+        REQUESTS.inc(method="GET", host=host,
+                     status=str(response.status_code))
+        BYTES_RECEIVED.inc(len(response.content), host=host)
+
         image_path = os.path.join(media_dir, f"{sanitized_title}.png")
-        with open(image_path, "wb") as image:
-            image.write(response.content)
+        with track_stage("write"):
+            with open(image_path, "wb") as image:
+                image.write(response.content)
+        BYTES_WRITTEN.inc(len(response.content), stage="image")
         return image_path
     except requests.RequestException as e:
-        logging.error(f"[ERROR] - Error fetching URL {novel_image_url}: {e}")
+        logging.error("[ERROR] - Error fetching URL %s: %s", novel_image_url, e)
 
     return "Not found"
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Union
+
+from utils.json_utils import atomic_file, dumps, loads
+from utils.metrics import PARSE_CACHE_LOOKUPS
+
+
+def content_key(page_content: Union[str, bytes], version: int,
+                encoding: Optional[str] = None) -> str:
+    """
+    Returns the cache key of a page.
+
+    Args:
+        page_content (Union[str, bytes]): The HTML content of the page.
+        version (int): The extractor version the fields were made with.
+        encoding (Optional[str]): The charset declared by the server.
+
+    Returns:
+        str: A hex digest of the version, the encoding and the content.
+    """
+    if isinstance(page_content, str):
+        page_content = page_content.encode("utf-8")
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{version}:{encoding or ''}:".encode("ascii", "replace"))
+    digest.update(page_content)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    A persistent cache of the fields extracted from page contents.
+
+    Pages whose bytes did not change since an earlier run are looked up
+    by content hash and skip parsing. The extractor version is part of the
+    key, so bumping it makes every older entry miss. The cache is a JSON
+    lines file that is read by open() and rewritten by close() with the
+    entries of the current version only. Disabled until opened.
+    Thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self.cache_file: Optional[str] = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_file is not None
+
+    def open(self, cache_file: str, version: int) -> None:
+        """
+        Loads the entries of the given extractor version from a file.
+
+        Args:
+            cache_file (str): The JSON lines file of the cache.
+            version (int): The current extractor version.
+        """
+        self.cache_file = cache_file
+        self.version = version
+        self._entries = {}
+        if not os.path.exists(cache_file):
+            return
+
+        with open(cache_file, "rb") as file:
+            for line in file:
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    # The last line of an interrupted write
+                    continue
+                if entry.get("version") == version:
+                    self._entries[entry["key"]] = entry["fields"]
+        logging.info("[INFO] - Loaded %s parse cache entries from %s",
+                     len(self._entries), cache_file)
+
+    def get(self, page_content: Union[str, bytes],
+            encoding: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the fields extracted from an identical page, if any.
+
+        Args:
+            page_content (Union[str, bytes]): The HTML content of the page.
+            encoding (Optional[str]): The charset declared by the server.
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the cached fields, or None.
+        """
+        if not self.enabled:
+            return None
+
+        key = content_key(page_content, self.version, encoding)
+        with self._lock:
+            fields = self._entries.get(key)
+        PARSE_CACHE_LOOKUPS.inc(result="miss" if fields is None else "hit")
+        return dict(fields) if fields is not None else None
+
+    def put(self, page_content: Union[str, bytes], fields: Dict[str, Any],
+            encoding: Optional[str] = None) -> None:
+        """Saves the fields extracted from a page."""
+        if not self.enabled:
+            return
+
+        key = content_key(page_content, self.version, encoding)
+        with self._lock:
+            self._entries[key] = dict(fields)
+
+    def close(self) -> None:
+        """Writes the entries to the cache file, replacing it atomically."""
+        if not self.cache_file:
+            return
+
+        with self._lock, atomic_file(self.cache_file) as file:
+            for key, fields in self._entries.items():
+                file.write(dumps({"version": self.version, "key": key,
+                                  "fields": fields}) + b"\n")
+        logging.info("[INFO] - Saved %s parse cache entries to %s",
+                     len(self._entries), self.cache_file)
+        self.cache_file = None
+
+
+PARSE_CACHE = ParseCache()
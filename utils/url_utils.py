@@ -1,8 +1,12 @@
 import logging
 import re
+from urllib.parse import quote, unquote, urlsplit, urlunsplit
 
 import requests
 
+from utils.http_utils import TIMEOUTS
+from utils.metrics import REQUESTS, host_of, track_stage
+
 
 def url_exists(url: str) -> bool:
     """
@@ -15,13 +19,46 @@ def url_exists(url: str) -> bool:
         bool: True if the URL exists (status code 200), False otherwise.
     """
     try:
-        response = requests.head(url, allow_redirects=True)
+        with track_stage("head", url):
+            response = requests.head(url, allow_redirects=True,
+                                     timeout=TIMEOUTS.for_requests())
+        REQUESTS.inc(method="HEAD", host=host_of(url),
+                     status=str(response.status_code))
         return response.status_code == 200
     except requests.RequestException as e:
-        logging.error(f"[ERROR] - Error checking URL {url}: {e}")
+        logging.error("[ERROR] - Error checking URL %s: %s", url, e)
         return False
 
 
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a URL so every spelling of a page maps to the same string.
+
+    The scheme and host are lowercased, default ports and fragments are
+    dropped, and the path and query are percent-decoded and encoded again
+    the same way, so "A Novel.html", "A%20Novel.html" and "A%20Novel.html#x"
+    are one page.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80),
+                                                   ("https", 443)):
+        host = f"{host}:{parts.port}"
+
+    # Segments are handled one by one so an encoded slash stays encoded
+    path = "/".join(quote(unquote(segment), safe=":@!$&'()*+,;=-._~")
+                    for segment in parts.path.split("/")) or "/"
+    query = quote(unquote(parts.query), safe="=&/:@!$'()*+,;-._~")
+    return urlunsplit((scheme, host, path, query, ""))
+
+
 def extract_filename_from_url(url: str) -> str:
     """
     Extracts the filename from a URL.